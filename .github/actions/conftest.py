@@ -0,0 +1,5 @@
+import cli
+
+# Action modules are imported by name, the way cli.py runs them
+for action_dir in dict.fromkeys(action_dir for action_dir, _, _ in cli.COMMANDS.values()):
+    cli.add_paths(action_dir)
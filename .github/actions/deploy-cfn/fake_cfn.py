@@ -0,0 +1,178 @@
+import random
+import itertools
+import threading
+from collections import Counter
+import clock as clock_module
+from aws_errors import FakeClientError
+
+class FakeCloudFormation:
+    """
+    In-process stand-in for CloudFormation across regions, for testing smoke.py offline.
+    client(region) can be passed to smoke.run_deployments as the client factory.
+
+    A stack is CREATE_COMPLETE create_latency seconds (plus up to jitter) after
+    create_stack, and gone delete_latency seconds after delete_stack, measured on clock.
+    Failures can be injected:
+      - failure_rate:     chance of a stack rolling back instead of completing
+      - fail_regions:     regions where every stack rolls back
+      - throttle_rate:    chance of any call failing with Throttling
+
+    Calls are counted per (region, operation), and the most stacks alive at once is kept
+    in peak_stacks, so a concurrency cap can be checked.
+    """
+
+    def __init__(
+            self,
+            clock           = None,
+            create_latency  = 600,
+            delete_latency  = 300,
+            jitter          = 0,
+            call_latency    = 0,
+            failure_rate    = 0.0,
+            fail_regions    = (),
+            throttle_rate   = 0.0,
+            rng             = None
+        ):
+        """
+        Args:
+            create_latency: seconds, or { region: seconds } with a 'default' key for the rest
+            clock:          object with now() and sleep(seconds). Defaults to clock.SystemClock.
+            rng:            random.Random driving jitter and failure injection, for reproducible runs
+        """
+        self.clock          = clock or clock_module.SystemClock()
+        self.create_latency = create_latency
+        self.delete_latency = delete_latency
+        self.jitter         = jitter
+        self.call_latency   = call_latency
+        self.failure_rate   = failure_rate
+        self.fail_regions   = set(fail_regions)
+        self.throttle_rate  = throttle_rate
+        self.rng            = rng or random.Random()
+
+        self.calls          = Counter()  # { (region, operation): count }
+        self.throttled      = Counter()  # { (region, operation): injected throttling errors }
+        self.peak_stacks    = 0
+
+        # { region: { stack_name: stack } }; stacks carry private '_'-prefixed bookkeeping keys
+        self._stacks        = {}
+        self._ids           = itertools.count(1)
+        self._lock          = threading.RLock()
+
+    def client(self, region):
+        return FakeCloudFormationClient(self, region)
+
+    def live_stacks(self):
+        """
+        Stacks not yet deleted, across every region.
+        """
+        with self._lock:
+            return sum(1 for stacks in self._stacks.values() for stack in stacks.values() if not self._gone(stack))
+
+    def report(self):
+        print(f"Fake CloudFormation: {sum(self.calls.values())} call(s), {sum(self.throttled.values())} throttled, "
+              f"at most {self.peak_stacks} stack(s) at once")
+
+    # --- internals used by FakeCloudFormationClient ---
+
+    def _call(self, region, operation, handler, **kwargs):
+        if self.call_latency:
+            self.clock.sleep(self.call_latency)
+        with self._lock:
+            self.calls[(region, operation)] += 1
+            if self.throttle_rate and self.rng.random() < self.throttle_rate:
+                self.throttled[(region, operation)] += 1
+                raise FakeClientError('Throttling', 'Rate exceeded', operation)
+            return handler(region, **kwargs)
+
+    def _latency(self, region):
+        latency = self.create_latency
+        if isinstance(latency, dict):
+            latency = latency.get(region, latency.get('default', 0))
+        return latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+
+    def _gone(self, stack):
+        return stack['_deleted_at'] is not None and self.clock.now() >= stack['_deleted_at']
+
+    def _status(self, stack):
+        now = self.clock.now()
+        if stack['_delete_requested_at'] is not None:
+            return 'DELETE_IN_PROGRESS'
+        if now < stack['_ready_at']:
+            return 'CREATE_IN_PROGRESS'
+        if not stack['_fails']:
+            return 'CREATE_COMPLETE'
+        # A failed create rolls back for as long again as it ran
+        if now < stack['_ready_at'] + (stack['_ready_at'] - stack['_created_at']):
+            return 'ROLLBACK_IN_PROGRESS'
+        return 'ROLLBACK_COMPLETE'
+
+    def _find(self, region, StackName, operation):
+        stack = self._stacks.get(region, {}).get(StackName)
+        if stack is None or self._gone(stack):
+            raise FakeClientError('ValidationError', f"Stack with id {StackName} does not exist", operation)
+        return stack
+
+    def _create_stack(self, region, StackName, TemplateBody=None, Parameters=(), Capabilities=(), ClientRequestToken=None):
+        existing = self._stacks.get(region, {}).get(StackName)
+        if existing is not None and not self._gone(existing):
+            # Like CloudFormation, a repeated token is the same request
+            if ClientRequestToken and existing['_token'] == ClientRequestToken:
+                return {'StackId': existing['StackId']}
+            raise FakeClientError('AlreadyExistsException', f"Stack [{StackName}] already exists", 'CreateStack')
+
+        now = self.clock.now()
+        self._stacks.setdefault(region, {})[StackName] = {
+            'StackId': f"arn:aws:cloudformation:{region}:000000000000:stack/{StackName}/{next(self._ids):012x}",
+            'StackName': StackName,
+            'Parameters': [dict(p) for p in Parameters],
+            '_token': ClientRequestToken,
+            '_created_at': now,
+            '_ready_at': now + self._latency(region),
+            '_fails': region in self.fail_regions or bool(self.failure_rate and self.rng.random() < self.failure_rate),
+            '_delete_requested_at': None,
+            '_deleted_at': None,
+        }
+        self.peak_stacks = max(self.peak_stacks, self.live_stacks())
+        return {'StackId': self._stacks[region][StackName]['StackId']}
+
+    def _describe_stacks(self, region, StackName):
+        stack = self._find(region, StackName, 'DescribeStacks')
+        status = self._status(stack)
+        described = {k: v for k, v in stack.items() if not k.startswith('_')}
+        described['StackStatus'] = status
+        if status.startswith('ROLLBACK'):
+            described['StackStatusReason'] = 'Injected resource failure'
+        if status == 'CREATE_COMPLETE':
+            described['Outputs'] = [
+                {'OutputKey': 'ServerAddress', 'OutputValue': f"{StackName}.{region}.example.com"},
+                {'OutputKey': 'StackRegion', 'OutputValue': region},
+            ]
+        return {'Stacks': [described]}
+
+    def _delete_stack(self, region, StackName):
+        stack = self._stacks.get(region, {}).get(StackName)
+        # Like CloudFormation, deleting a stack that does not exist succeeds
+        if stack is None or self._gone(stack) or stack['_delete_requested_at'] is not None:
+            return {}
+        now = self.clock.now()
+        stack['_delete_requested_at'] = now
+        stack['_deleted_at'] = now + self.delete_latency
+        return {}
+
+class FakeCloudFormationClient:
+    """
+    CloudFormation client for one region of a FakeCloudFormation. Supports the calls smoke.py makes.
+    """
+
+    def __init__(self, cloudformation, region):
+        self._cfn       = cloudformation
+        self._region    = region
+
+    def create_stack(self, **kwargs):
+        return self._cfn._call(self._region, 'create_stack', self._cfn._create_stack, **kwargs)
+
+    def describe_stacks(self, **kwargs):
+        return self._cfn._call(self._region, 'describe_stacks', self._cfn._describe_stacks, **kwargs)
+
+    def delete_stack(self, **kwargs):
+        return self._cfn._call(self._region, 'delete_stack', self._cfn._delete_stack, **kwargs)
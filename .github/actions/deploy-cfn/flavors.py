@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import argparse
+from collections.abc import Mapping
+from typing import Dict, Iterable, List
+
+MAPPINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flavor-mappings.json')
+
+# Template parameter names every flavor has to map its deployment inputs to
+PARAM_FIELDS = ('key_param', 'vpc_param', 'subnet_param', 'client_ip_param')
+# Mapped only by flavors whose template takes a custom AMI
+OPTIONAL_PARAM_FIELDS = ('ami_param',)
+
+class FlavorError(ValueError):
+    pass
+
+class UnknownFlavorError(FlavorError, KeyError):
+    """
+    Raised by FlavorIndex lookups, so `in` and .get() work as on any Mapping.
+    """
+
+    # KeyError would print the message quoted
+    __str__ = FlavorError.__str__
+
+class Flavor:
+    """
+    One flavor of flavor-mappings.json: the template parameters its deployment inputs
+    map to, and the default parameters every stack of the flavor starts from.
+    """
+
+    def __init__(self, name: str, mapping: dict):
+        problems = validate_mapping(name, mapping)
+        if problems:
+            raise FlavorError("\n".join(problems))
+
+        self.name               = name
+        self.key_param          = mapping['key_param']
+        self.vpc_param          = mapping['vpc_param']
+        self.subnet_param       = mapping['subnet_param']
+        self.client_ip_param    = mapping['client_ip_param']
+        self.ami_param          = mapping.get('ami_param')
+        # { ParameterKey: ParameterValue }, in file order
+        self.defaults           = {p['ParameterKey']: p.get('ParameterValue', '') for p in mapping.get('defaults', [])}
+
+    def parameters(
+            self,
+            vpc_id      = None,
+            subnet_id   = None,
+            key_name    = None,
+            client_ip   = None,
+            ami_id      = None,
+            overrides   = None
+        ) -> List[Dict[str, str]]:
+        """
+        Builds the create-stack parameter list in one pass.
+
+        Defaults come first, then the inputs given (None leaves a parameter out), then
+        overrides ({ ParameterKey: value }). A later value replaces an earlier one for the
+        same key in place, so no key is ever listed twice.
+
+        Raises:
+            FlavorError: if ami_id is given but the flavor takes no custom AMI
+        """
+        if ami_id is not None and not self.ami_param:
+            raise FlavorError(f"Flavor '{self.name}' has no ami_param to pass {ami_id} in")
+
+        values = dict(self.defaults)
+        for param, value in (
+                (self.vpc_param,        vpc_id),
+                (self.subnet_param,     subnet_id),
+                (self.key_param,        key_name),
+                (self.client_ip_param,  client_ip),
+                (self.ami_param,        ami_id),
+            ):
+            if value is not None:
+                values[param] = value
+        values.update(overrides or {})
+
+        return [{'ParameterKey': key, 'ParameterValue': str(value)} for key, value in values.items()]
+
+class FlavorIndex(Mapping):
+    """
+    Every flavor of a flavor-mappings.json, as { name: Flavor }. All flavors are validated
+    when the index is built, and every problem found is reported in one FlavorError.
+    """
+
+    def __init__(self, mappings: dict, source: str = 'flavor mappings'):
+        if not isinstance(mappings, dict):
+            raise FlavorError(f"{source} must be a JSON object of {{ flavor: mapping }}")
+
+        self.source     = source
+        self._flavors   = {}
+        problems        = []
+        for name, mapping in mappings.items():
+            try:
+                self._flavors[name] = Flavor(name, mapping)
+            except FlavorError as e:
+                problems.append(str(e))
+        if problems:
+            raise FlavorError(f"{source} is invalid:\n   " + "\n   ".join(problems))
+
+    def __getitem__(self, name):
+        if name not in self._flavors:
+            raise UnknownFlavorError(f"Unknown flavor '{name}' (available: {', '.join(sorted(self._flavors))})")
+        return self._flavors[name]
+
+    def __iter__(self):
+        return iter(self._flavors)
+
+    def __len__(self):
+        return len(self._flavors)
+
+    def require(self, names: Iterable[str]) -> List[Flavor]:
+        """
+        Looks up names up front, raising one FlavorError that reports every unknown flavor.
+        """
+        names = list(names)
+        unknown = [name for name in names if name not in self._flavors]
+        if unknown:
+            raise FlavorError(
+                f"Unknown flavor(s) {', '.join(unknown)} "
+                f"(available: {', '.join(sorted(self._flavors))})"
+            )
+        if not names:
+            raise FlavorError("No flavor given")
+        return [self._flavors[name] for name in names]
+
+def validate_mapping(name, mapping) -> List[str]:
+    """
+    Returns:
+        list: problems with one flavor's mapping, empty if it can be deployed
+    """
+    if not isinstance(mapping, dict):
+        return [f"Mapping of '{name}' is not a JSON object"]
+
+    problems = [
+        f"'{name}' is missing {field}"
+        for field in PARAM_FIELDS
+        if not isinstance(mapping.get(field), str) or not mapping[field]
+    ]
+    for field in OPTIONAL_PARAM_FIELDS:
+        if field in mapping and (not isinstance(mapping[field], str) or not mapping[field]):
+            problems.append(f"'{name}' {field} must be a non-empty string")
+
+    defaults = mapping.get('defaults', [])
+    if not isinstance(defaults, list) or not all(
+            isinstance(p, dict) and isinstance(p.get('ParameterKey'), str) for p in defaults):
+        problems.append(f"'{name}' defaults must be a list of {{ ParameterKey, ParameterValue }} objects")
+    else:
+        keys = [p['ParameterKey'] for p in defaults]
+        duplicates = sorted({key for key in keys if keys.count(key) > 1})
+        if duplicates:
+            problems.append(f"'{name}' defaults list {', '.join(duplicates)} more than once")
+    return problems
+
+def load_index(path: str = MAPPINGS_FILE) -> FlavorIndex:
+    """
+    Builds the FlavorIndex of the flavor-mappings.json at path.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            mappings = json.load(f)
+        except json.JSONDecodeError as e:
+            raise FlavorError(f"{os.path.basename(path)} is not a valid JSON file. {e}")
+    return FlavorIndex(mappings, source=os.path.basename(path))
+
+def setup_args(argv=None):
+    parser = argparse.ArgumentParser(description='Check flavors against flavor-mappings.json')
+    parser.add_argument('--flavor',         required=True,  help='Flavor to check, or a comma separated list')
+    parser.add_argument('--mappings-file',  required=False, help='Flavor mappings to check against', default=MAPPINGS_FILE)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = setup_args(argv)
+
+    flavors = [f.strip() for f in args.flavor.split(',') if f.strip()]
+    try:
+        load_index(args.mappings_file).require(flavors)
+    except OSError as e:
+        print(f"::error::Could not read flavor mappings: {e}")
+        sys.exit(1)
+    except FlavorError as e:
+        print(f"::error::{e}")
+        sys.exit(1)
+
+    print(f"Valid flavor(s): {', '.join(flavors)}")
+
+if __name__ == "__main__":
+    main()
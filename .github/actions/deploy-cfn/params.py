@@ -0,0 +1,187 @@
+import sys
+import json
+import argparse
+from typing import Dict, List, Optional
+import flavors as flavor_index
+
+# Deployment inputs a flavor maps to template parameters, as accepted by flavors.Flavor.parameters
+INPUT_FIELDS = ('vpc_id', 'subnet_id', 'key_name', 'client_ip')
+
+def load_json_arg(value: str, what: str):
+    """
+    Parses value as inline JSON, or as the path of a JSON file when it is not an object or list.
+    """
+    text = value.strip()
+    try:
+        if text.startswith(('{', '[')):
+            return json.loads(text)
+        with open(text, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except OSError as e:
+        raise flavor_index.FlavorError(f"Could not read {what}: {e}")
+    except json.JSONDecodeError as e:
+        raise flavor_index.FlavorError(f"{what} is not valid JSON. {e}")
+
+def parse_region_maps(data) -> Dict[Optional[str], Dict[str, str]]:
+    """
+    Reads the region map output of distribute-ami: either { RegionMap: { region: { AMI: id } } },
+    which applies to every flavor, or the batch form { flavor: { RegionMap: ... } }.
+
+    Returns:
+        dict: { flavor, or None for every flavor: { region: ami_id } }
+    """
+    if not isinstance(data, dict):
+        raise flavor_index.FlavorError("Region map must be a JSON object")
+
+    wrapped = {None: data} if 'RegionMap' in data else data
+    region_maps = {}
+    for flavor, entry in wrapped.items():
+        region_map = entry.get('RegionMap') if isinstance(entry, dict) else None
+        if not isinstance(region_map, dict):
+            raise flavor_index.FlavorError(f"Region map of {flavor or 'every flavor'} has no RegionMap object")
+        region_maps[flavor] = {}
+        for region, value in region_map.items():
+            ami_id = value.get('AMI') if isinstance(value, dict) else None
+            if not isinstance(ami_id, str) or not ami_id:
+                raise flavor_index.FlavorError(f"RegionMap entry {region} of {flavor or 'every flavor'} has no AMI")
+            region_maps[flavor][region] = ami_id
+    return region_maps
+
+def ami_for(region_maps, flavor: str, region: str) -> Optional[str]:
+    region_map = region_maps.get(flavor, region_maps.get(None, {}))
+    return region_map.get(region)
+
+def build_parameter_sets(
+        index,
+        flavor_names,
+        regions,
+        inputs          = None,
+        region_inputs   = None,
+        region_maps     = None,
+        overrides       = None
+    ) -> Dict[str, Dict[str, List[Dict[str, str]]]]:
+    """
+    Builds the create-stack parameters of every (flavor, region) pair, e.g. for a smoke-test matrix.
+
+    Everything is validated before anything is built, and every problem is reported in one FlavorError.
+
+    Args:
+        index:          flavors.FlavorIndex
+        inputs:         { input field: value } used in every region
+        region_inputs:  { region: { input field: value } }, replacing inputs in that region
+        region_maps:    parse_region_maps() result. Flavors with an ami_param get the AMI of their region.
+        overrides:      { ParameterKey: value } applied last, to every stack
+
+    Returns:
+        dict: { flavor: { region: parameters } }
+    """
+    selected = index.require(flavor_names)
+    regions = list(regions)
+    problems = [] if regions else ["No region given"]
+
+    if not isinstance(region_inputs or {}, dict) or not all(isinstance(v, dict) for v in (region_inputs or {}).values()):
+        raise flavor_index.FlavorError("Region inputs must be a JSON object of { region: { input field: value } }")
+    if not isinstance(overrides or {}, dict):
+        raise flavor_index.FlavorError("Overrides must be a JSON object of { ParameterKey: value }")
+
+    for fields in [inputs or {}] + list((region_inputs or {}).values()):
+        unknown = sorted(set(fields) - set(INPUT_FIELDS))
+        if unknown:
+            problems.append(f"Unknown input(s) {', '.join(unknown)} (expected {', '.join(INPUT_FIELDS)})")
+
+    if region_maps is not None:
+        problems += [
+            f"Region map has no AMI for {flavor.name} in {region}"
+            for flavor in selected if flavor.ami_param
+            for region in regions if ami_for(region_maps, flavor.name, region) is None
+        ]
+    if problems:
+        raise flavor_index.FlavorError("\n".join(dict.fromkeys(problems)))
+
+    parameter_sets = {}
+    for flavor in selected:
+        for region in regions:
+            values = dict(inputs or {})
+            values.update((region_inputs or {}).get(region, {}))
+            if region_maps is not None and flavor.ami_param:
+                values['ami_id'] = ami_for(region_maps, flavor.name, region)
+            parameter_sets.setdefault(flavor.name, {})[region] = flavor.parameters(overrides=overrides, **values)
+    return parameter_sets
+
+def add_parameter_args(parser):
+    """
+    Adds the flags parameter_sets_from_args() reads, shared with smoke.py.
+    """
+    parser.add_argument('--flavor',         required=True,  help='Flavor, or a comma separated list')
+    parser.add_argument('--region',         required=True,  help='Region, or a comma separated list')
+    parser.add_argument('--vpc-id',         required=False, help='VPC the stacks are deployed in')
+    parser.add_argument('--subnet-id',      required=False, help='Subnet the stacks are deployed in')
+    parser.add_argument('--key-name',       required=False, help='EC2 key pair name')
+    parser.add_argument('--client-ip',      required=False, help='CIDR allowed to connect, e.g. 203.0.113.7/32')
+    parser.add_argument('--region-inputs',  required=False, help='JSON, or a JSON file, of { region: { vpc_id, subnet_id, key_name, client_ip } } used instead of the flags above in that region')
+    parser.add_argument('--region-map',     required=False, help='JSON, or a JSON file, of the distribute-ami region map; sets each flavor\'s ami_param')
+    parser.add_argument('--overrides',      required=False, help='JSON, or a JSON file, of { ParameterKey: value } applied to every stack')
+    parser.add_argument('--mappings-file',  required=False, help='Flavor mappings to build from', default=flavor_index.MAPPINGS_FILE)
+
+def parameter_sets_from_args(args):
+    """
+    Builds the parameter sets asked for by the flags of add_parameter_args().
+
+    Returns:
+        tuple: (flavor names, regions, { flavor: { region: parameters } })
+
+    Raises:
+        flavors.FlavorError: for invalid flavors, inputs or region maps
+        OSError: if the flavor mappings cannot be read
+    """
+    flavor_names = [f.strip() for f in args.flavor.split(',') if f.strip()]
+    regions = [r.strip() for r in args.region.split(',') if r.strip()]
+    inputs = {
+        field: getattr(args, field)
+        for field in INPUT_FIELDS
+        if getattr(args, field) is not None
+    }
+
+    parameter_sets = build_parameter_sets(
+        index           = flavor_index.load_index(args.mappings_file),
+        flavor_names    = flavor_names,
+        regions         = regions,
+        inputs          = inputs,
+        region_inputs   = load_json_arg(args.region_inputs, 'region inputs') if args.region_inputs else None,
+        region_maps     = parse_region_maps(load_json_arg(args.region_map, 'region map')) if args.region_map else None,
+        overrides       = load_json_arg(args.overrides, 'overrides') if args.overrides else None
+    )
+    return flavor_names, regions, parameter_sets
+
+def setup_args(argv=None):
+    parser = argparse.ArgumentParser(description='Build CloudFormation create-stack parameters from flavor-mappings.json')
+    add_parameter_args(parser)
+    parser.add_argument('--output',         required=False, help='Write here instead of stdout. One flavor and region gives the parameter list; more give { flavor: { region: list } }')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = setup_args(argv)
+
+    try:
+        flavor_names, regions, parameter_sets = parameter_sets_from_args(args)
+    except OSError as e:
+        print(f"::error::Could not read flavor mappings: {e}")
+        sys.exit(1)
+    except flavor_index.FlavorError as e:
+        print(f"::error::{e}")
+        sys.exit(1)
+
+    if len(flavor_names) == 1 and len(regions) == 1:
+        result = parameter_sets[flavor_names[0]][regions[0]]
+    else:
+        result = parameter_sets
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Parameters written to: {args.output}")
+    else:
+        print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+import os
+import re
+import sys
+import json
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+if __name__ == "__main__":
+    # The shared modules are only on sys.path when run through the shared CLI
+    sys.exit("Run this through the shared CLI: python .github/actions/shared/cli.py smoke-test --help")
+
+import clock as clock_module
+import aws_errors
+import instrumentation
+import flavors as flavor_index
+import params
+
+CAPABILITIES = ['CAPABILITY_NAMED_IAM', 'CAPABILITY_IAM', 'CAPABILITY_AUTO_EXPAND']
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Stack polling. The first poll comes after INITIAL_DELAY, or after EXPECTED_SHARE of the
+# median time earlier stacks of the same flavor took. Later polls back off by BACKOFF_FACTOR
+# up to MAX_DELAY, and start again from INITIAL_DELAY whenever the stack status changes.
+DEFAULT_INITIAL_DELAY   = 15
+DEFAULT_MAX_DELAY       = 60
+DEFAULT_BACKOFF_FACTOR  = 1.5
+DEFAULT_CREATE_TIMEOUT  = 3600
+DEFAULT_DELETE_TIMEOUT  = 1800
+EXPECTED_SHARE          = 0.8
+# Attempts of a create_stack or delete_stack call failing with a retryable error
+MAX_CALL_ATTEMPTS       = 5
+
+CREATE_DONE_STATES      = ('CREATE_COMPLETE',)
+# Terminal states of a failed create; a stack still rolling back is waited for, since it cannot be deleted yet
+CREATE_FAILED_STATES    = ('CREATE_FAILED', 'ROLLBACK_COMPLETE', 'ROLLBACK_FAILED', 'DELETE_COMPLETE', 'DELETE_FAILED')
+DELETE_DONE_STATES      = ('DELETE_COMPLETE',)
+DELETE_FAILED_STATES    = ('DELETE_FAILED',)
+
+STACK_NAME_PATTERN = re.compile(r'^[A-Za-z][A-Za-z0-9-]{0,127}$')
+
+def call_with_retries(call, clock, delay, max_delay, attempts=MAX_CALL_ATTEMPTS, **kwargs):
+    """
+    Calls call(**kwargs), retrying with doubling delays while it fails with a transient error.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return call(**kwargs)
+        except Exception as e:
+            if not aws_errors.is_retryable(e) or attempt == attempts:
+                raise
+        clock.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+def request_token(run_id, name):
+    """
+    ClientRequestToken of one stack's create_stack call in one run. A retried call sends the
+    same token, so CloudFormation treats it as the call that already went through.
+    """
+    return hashlib.sha256(f"{run_id}|{name}".encode('utf-8')).hexdigest()
+
+def stack_name(prefix, flavor, region):
+    return f"{prefix}-{flavor}-{region}"
+
+def plan_deployments(parameter_sets, templates, stack_prefix):
+    """
+    Lays out one stack per (flavor, region). Consecutive deployments are in different
+    regions where possible, so the concurrency cap is spread over regions rather than
+    filling one region first.
+
+    Args:
+        parameter_sets: { flavor: { region: parameters } }, e.g. from params.build_parameter_sets
+        templates:      { flavor: template file }, with a None key for every other flavor.
+                        None skips template checks, e.g. for teardown.
+
+    Returns:
+        list: { flavor, region, stack_name, template_file, parameters } per stack
+
+    Raises:
+        flavors.FlavorError: naming every flavor without a template and every invalid stack name
+    """
+    problems = []
+    per_region = {}
+    for flavor, region_parameters in parameter_sets.items():
+        template_file = None
+        if templates is not None:
+            template_file = templates.get(flavor, templates.get(None))
+            if template_file is None:
+                problems.append(f"No template given for {flavor}")
+            elif not os.path.isfile(template_file):
+                problems.append(f"Template of {flavor} not found at {template_file}")
+
+        for region, parameters in region_parameters.items():
+            name = stack_name(stack_prefix, flavor, region)
+            if not STACK_NAME_PATTERN.match(name):
+                problems.append(f"'{name}' is not a valid stack name (letters, digits and hyphens, starting with a letter, at most 128)")
+            per_region.setdefault(region, []).append({
+                'flavor': flavor,
+                'region': region,
+                'stack_name': name,
+                'template_file': template_file,
+                'parameters': parameters,
+            })
+    if problems:
+        raise flavor_index.FlavorError("\n".join(dict.fromkeys(problems)))
+
+    # Round-robin over regions
+    deployments = []
+    queues = list(per_region.values())
+    while queues:
+        deployments += [queue.pop(0) for queue in queues]
+        queues = [queue for queue in queues if queue]
+    return deployments
+
+def wait_for_stack(
+        cfn,
+        name,
+        done_states,
+        failed_states,
+        clock,
+        expected        = None,
+        initial_delay   = DEFAULT_INITIAL_DELAY,
+        max_delay       = DEFAULT_MAX_DELAY,
+        backoff_factor  = DEFAULT_BACKOFF_FACTOR,
+        timeout         = DEFAULT_CREATE_TIMEOUT
+    ):
+    """
+    Polls describe_stacks until the stack reaches one of done_states or failed_states.
+    A stack that no longer exists counts as DELETE_COMPLETE. Transient errors (see
+    aws_errors.is_retryable) are retried at the next poll; any other error is raised at once.
+
+    Args:
+        expected:   typical seconds to completion, if known; the first poll waits for most of it
+
+    Returns:
+        tuple: (final status, or 'TIMEOUT'; describe_stacks entry or None; number of polls)
+    """
+    start   = clock.now()
+    delay   = max(initial_delay, EXPECTED_SHARE * expected) if expected else initial_delay
+    last    = None
+    polls   = 0
+
+    while True:
+        remaining = timeout - (clock.now() - start)
+        if remaining <= 0:
+            return 'TIMEOUT', None, polls
+        clock.sleep(min(delay, remaining))
+        polls += 1
+
+        try:
+            stack = cfn.describe_stacks(StackName=name)['Stacks'][0]
+        except Exception as e:
+            if aws_errors.error_code(e) == 'ValidationError' and 'does not exist' in str(e):
+                return 'DELETE_COMPLETE', None, polls
+            if not aws_errors.is_retryable(e):
+                raise
+            if not aws_errors.is_throttling(e):
+                print(f"[{name}] Polling failed, will retry: {e}")
+            delay = min(delay * backoff_factor, max_delay)
+            continue
+
+        status = stack['StackStatus']
+        if status in done_states or status in failed_states:
+            return status, stack, polls
+
+        if last is None or status != last:
+            delay = initial_delay
+        else:
+            delay = min(delay * backoff_factor, max_delay)
+        last = status
+
+def run_deployments(
+        deployments,
+        client_factory,
+        max_concurrency = DEFAULT_MAX_CONCURRENCY,
+        clock           = None,
+        poll_config     = None,
+        keep_stacks     = False,
+        teardown_only   = False,
+        time_scale      = 1.0
+    ):
+    """
+    Creates every planned stack, collects its outputs and deletes it again, with at most
+    max_concurrency stacks in flight at once. A stack whose create fails is still deleted
+    once its rollback has finished, or straight away if waiting for it failed.
+
+    Args:
+        client_factory: callable(region) -> CloudFormation client. Clients are built up front,
+                        one per region, since boto3 sessions are not thread-safe.
+        poll_config:    keyword arguments for wait_for_stack (initial_delay, max_delay,
+                        backoff_factor, create_timeout, delete_timeout)
+        keep_stacks:    leave created stacks in place, e.g. for checks run after this
+        teardown_only:  only delete the planned stacks, e.g. after keep_stacks
+        time_scale:     clock seconds per reported second, e.g. a fake's time scale. Create and
+                        delete times in results and log lines are in reported seconds.
+
+    Returns:
+        list: a result per deployment, in plan order
+    """
+    clock           = clock or clock_module.SystemClock()
+    poll_config     = dict(poll_config or {})
+    create_timeout  = poll_config.pop('create_timeout', DEFAULT_CREATE_TIMEOUT)
+    delete_timeout  = poll_config.pop('delete_timeout', DEFAULT_DELETE_TIMEOUT)
+    # Throttled calls are retried sooner than stacks are polled
+    retry_delay     = poll_config.get('initial_delay', DEFAULT_INITIAL_DELAY) / 5
+    retry_max_delay = poll_config.get('max_delay', DEFAULT_MAX_DELAY)
+    clients         = {region: client_factory(region) for region in dict.fromkeys(d['region'] for d in deployments)}
+    run_id          = uuid.uuid4().hex
+
+    # { (flavor, phase): [seconds] } of finished stacks, to time the first poll of later ones
+    durations       = {}
+    durations_lock  = threading.Lock()
+    # { path: body }, read once however many stacks use a template
+    templates       = {}
+    templates_lock  = threading.Lock()
+
+    def expected(flavor, phase):
+        with durations_lock:
+            seen = durations.get((flavor, phase))
+            return statistics.median(seen) if seen else None
+
+    def record(flavor, phase, seconds):
+        with durations_lock:
+            durations.setdefault((flavor, phase), []).append(seconds)
+
+    def template_body(path):
+        with templates_lock:
+            if path not in templates:
+                with open(path, 'r', encoding='utf-8') as f:
+                    templates[path] = f.read()
+            return templates[path]
+
+    def create(cfn, deployment, result):
+        name = deployment['stack_name']
+        attempts = []
+
+        def create_stack(**kwargs):
+            attempts.append(1)
+            try:
+                return cfn.create_stack(**kwargs)
+            except Exception as e:
+                # An earlier attempt created the stack but its response was lost
+                if len(attempts) > 1 and aws_errors.error_code(e) == 'AlreadyExistsException':
+                    return {}
+                raise
+
+        call_with_retries(
+            create_stack, clock, retry_delay, retry_max_delay,
+            StackName           = name,
+            TemplateBody        = template_body(deployment['template_file']),
+            Parameters          = deployment['parameters'],
+            Capabilities        = CAPABILITIES,
+            ClientRequestToken  = request_token(run_id, name)
+        )
+        result['created'] = True
+        print(f"[{name}] Creating in {deployment['region']}")
+
+        started = clock.now()
+        status, stack, polls = wait_for_stack(
+            cfn, name, CREATE_DONE_STATES, CREATE_FAILED_STATES, clock,
+            expected    = expected(deployment['flavor'], 'create'),
+            timeout     = create_timeout,
+            **poll_config
+        )
+        elapsed                 = clock.now() - started
+        result['create_time']   = elapsed / time_scale
+        result['polls']        += polls
+        result['status']        = status
+
+        if status == 'CREATE_COMPLETE':
+            record(deployment['flavor'], 'create', elapsed)
+            result['outputs'] = {o['OutputKey']: o['OutputValue'] for o in stack.get('Outputs', [])}
+            print(f"[{name}] Created in {result['create_time']:.0f}s")
+        else:
+            reason = (stack or {}).get('StackStatusReason')
+            result['error'] = f"create ended in {status}" + (f": {reason}" if reason else '')
+            print(f"[{name}] Create failed: {result['error']}")
+
+    def delete(cfn, deployment, result):
+        name = deployment['stack_name']
+        call_with_retries(cfn.delete_stack, clock, retry_delay, retry_max_delay, StackName=name)
+        print(f"[{name}] Deleting")
+
+        started = clock.now()
+        status, _, polls = wait_for_stack(
+            cfn, name, DELETE_DONE_STATES, DELETE_FAILED_STATES, clock,
+            expected    = expected(deployment['flavor'], 'delete'),
+            timeout     = delete_timeout,
+            **poll_config
+        )
+        elapsed                 = clock.now() - started
+        result['delete_time']   = elapsed / time_scale
+        result['polls']        += polls
+        result['deleted']       = status == 'DELETE_COMPLETE'
+
+        if result['deleted']:
+            record(deployment['flavor'], 'delete', elapsed)
+            print(f"[{name}] Deleted in {result['delete_time']:.0f}s")
+        else:
+            error = f"delete ended in {status}"
+            result['error'] = f"{result['error']}; {error}" if result['error'] else error
+            print(f"::warning::[{name}] Stack left behind: {error}")
+
+    def run(deployment):
+        result = {
+            'flavor': deployment['flavor'],
+            'region': deployment['region'],
+            'stack_name': deployment['stack_name'],
+            'status': None,
+            'outputs': {},
+            'error': None,
+            'created': False,
+            'deleted': False,
+            'create_time': None,
+            'delete_time': None,
+            'polls': 0,
+        }
+        cfn = clients[deployment['region']]
+        span_args = {'flavor': deployment['flavor'], 'region': deployment['region']}
+
+        def fail(e):
+            result['error'] = f"{result['error']}; {e}" if result['error'] else str(e)
+            print(f"::error::[{deployment['stack_name']}] {e}")
+
+        if not teardown_only:
+            try:
+                with instrumentation.span(deployment['stack_name'], 'stack_create', **span_args):
+                    create(cfn, deployment, result)
+            except Exception as e:
+                fail(e)
+        # Only stacks this run created are deleted, never one that already existed
+        if teardown_only or (result['created'] and not keep_stacks):
+            try:
+                with instrumentation.span(deployment['stack_name'], 'stack_delete', **span_args):
+                    delete(cfn, deployment, result)
+            except Exception as e:
+                fail(e)
+
+        if teardown_only:
+            result['passed'] = result['deleted']
+        else:
+            result['passed'] = result['status'] == 'CREATE_COMPLETE' and (keep_stacks or result['deleted'])
+        instrumentation.count('stacks', passed=result['passed'], region=deployment['region'])
+        instrumentation.count('stack_polls', result['polls'], region=deployment['region'])
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        return list(pool.map(run, deployments))
+
+def aggregate(results):
+    """
+    Returns:
+        dict: { flavor: { region: { stack_name, passed, status, outputs, error, create_time, delete_time } } }
+    """
+    aggregated = {}
+    for result in results:
+        aggregated.setdefault(result['flavor'], {})[result['region']] = {
+            key: result[key]
+            for key in ('stack_name', 'passed', 'status', 'outputs', 'error', 'create_time', 'delete_time')
+        }
+    return aggregated
+
+def report(results):
+    print(f"{'Stack':<48} {'Result':<7} {'Status':<20} {'Create':>7} {'Delete':>7} {'Polls':>6}")
+    for r in results:
+        create_time = f"{r['create_time']:.0f}s" if r['create_time'] is not None else '-'
+        delete_time = f"{r['delete_time']:.0f}s" if r['delete_time'] is not None else '-'
+        print(f"{r['stack_name']:<48} {'pass' if r['passed'] else 'FAIL':<7} {r['status'] or '-':<20} "
+              f"{create_time:>7} {delete_time:>7} {r['polls']:>6}")
+
+def parse_templates(values):
+    """
+    Reads --template values: FLAVOR=PATH for one flavor, or PATH for every other flavor.
+
+    Returns:
+        dict: { flavor, or None for every other flavor: path }
+    """
+    templates = {}
+    for value in values or []:
+        flavor, separator, path = value.partition('=')
+        if separator:
+            templates[flavor.strip()] = path
+        else:
+            templates[None] = value
+    return templates
+
+def boto3_factory():
+    import boto3
+    session = boto3.session.Session()
+    return lambda region: session.client('cloudformation', region_name=region)
+
+def setup_args(argv=None):
+    parser = argparse.ArgumentParser(description='Deploy and tear down smoke-test stacks for every flavor and region, in parallel')
+    params.add_parameter_args(parser)
+    parser.add_argument('--template',           action='append', help='Template file for every flavor, or FLAVOR=PATH for one; may be repeated')
+    parser.add_argument('--stack-prefix',       required=True,  help='Stacks are named <prefix>-<flavor>-<region>')
+    parser.add_argument('--max-concurrency',    type=int,   default=DEFAULT_MAX_CONCURRENCY, help='Stacks in flight at once')
+    parser.add_argument('--initial-delay',      type=float, default=DEFAULT_INITIAL_DELAY,  help='Seconds before the first poll of a stack without a typical duration yet')
+    parser.add_argument('--max-delay',          type=float, default=DEFAULT_MAX_DELAY,      help='Longest gap between polls of one stack')
+    parser.add_argument('--create-timeout',     type=float, default=DEFAULT_CREATE_TIMEOUT, help='Seconds a stack may take to create')
+    parser.add_argument('--delete-timeout',     type=float, default=DEFAULT_DELETE_TIMEOUT, help='Seconds a stack may take to delete')
+    parser.add_argument('--keep-stacks',        action='store_true', help='Leave created stacks in place; delete them later with --teardown')
+    parser.add_argument('--teardown',           action='store_true', help='Only delete the planned stacks')
+    parser.add_argument('--output',             required=False, help='Write { flavor: { region: result } } here as JSON')
+    parser.add_argument('--trace-file',         required=False, help='Write spans and counters of the run here')
+    parser.add_argument('--trace-format',       choices=['json', 'chrome'], default='json', help='Trace file format')
+    parser.add_argument('--fake',               action='store_true', help='Run against an in-process fake CloudFormation instead of AWS')
+    parser.add_argument('--fake-time-scale',    type=float, default=0.01, help='With --fake: real seconds per simulated second')
+    args = parser.parse_args(argv)
+
+    if args.keep_stacks and args.teardown:
+        parser.error("--keep-stacks and --teardown cannot be combined")
+    if not args.template and not (args.teardown or args.fake):
+        parser.error("--template is required unless --teardown or --fake is set")
+
+    return args
+
+def main(argv=None):
+    args = setup_args(argv)
+
+    try:
+        _, _, parameter_sets = params.parameter_sets_from_args(args)
+        # Templates are not needed to delete stacks, and the fake ignores them
+        templates = parse_templates(args.template) if args.template else None
+        deployments = plan_deployments(parameter_sets, templates, args.stack_prefix)
+    except OSError as e:
+        print(f"::error::Could not read flavor mappings: {e}")
+        sys.exit(1)
+    except flavor_index.FlavorError as e:
+        print(f"::error::{e}")
+        sys.exit(1)
+
+    poll_config = {
+        'initial_delay': args.initial_delay,
+        'max_delay': args.max_delay,
+        'create_timeout': args.create_timeout,
+        'delete_timeout': args.delete_timeout,
+    }
+    clock = clock_module.SystemClock()
+    time_scale = 1.0
+
+    fake = None
+    if args.fake:
+        import fake_cfn
+
+        time_scale = args.fake_time_scale
+        print(f"::notice::Running against a fake CloudFormation. No resources will be created.")
+        fake = fake_cfn.FakeCloudFormation(clock=clock, create_latency=600 * time_scale, delete_latency=300 * time_scale,
+                                           jitter=120 * time_scale, rng=random.Random(0))
+        client_factory = fake.client
+        poll_config = {key: value * time_scale for key, value in poll_config.items()}
+        # Template bodies are not read by the fake
+        for deployment in deployments:
+            deployment['template_file'] = deployment['template_file'] or os.devnull
+    else:
+        client_factory = boto3_factory()
+
+    mode = 'Deleting' if args.teardown else 'Deploying'
+    print(f"{mode} {len(deployments)} stack(s), at most {args.max_concurrency} at once")
+    results = run_deployments(
+        deployments     = deployments,
+        client_factory  = client_factory,
+        max_concurrency = args.max_concurrency,
+        clock           = clock,
+        poll_config     = poll_config,
+        keep_stacks     = args.keep_stacks,
+        teardown_only   = args.teardown,
+        # With --fake, times are reported in simulated seconds, comparable with real runs
+        time_scale      = time_scale
+    )
+
+    report(results)
+    if fake:
+        fake.report()
+
+    tracer = instrumentation.get_tracer()
+    if args.trace_file:
+        tracer.write(args.trace_file, args.trace_format)
+    tracer.write_step_summary("Smoke test stacks")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(aggregate(results), f, indent=2)
+        print(f"Results written to: {args.output}")
+
+    failed = [r for r in results if not r['passed']]
+    for r in failed:
+        print(f"::error::{r['stack_name']} failed: {r['error'] or r['status']}")
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,37 @@
+import pytest
+import flavors
+
+MAPPING = {
+    'key_param': 'KeyName',
+    'vpc_param': 'VPC',
+    'subnet_param': 'Subnet',
+    'client_ip_param': 'ClientIPAddress',
+    'defaults': [{'ParameterKey': 'InstanceType', 'ParameterValue': 'm5.xlarge'}],
+}
+
+def test_index_behaves_as_a_mapping():
+    index = flavors.FlavorIndex({'linux': MAPPING})
+
+    assert 'linux' in index
+    assert 'windows' not in index
+    assert index.get('windows') is None
+    with pytest.raises(KeyError):
+        index['windows']
+
+def test_require_names_every_unknown_flavor():
+    index = flavors.FlavorIndex({'linux': MAPPING})
+
+    with pytest.raises(flavors.FlavorError, match=r"Unknown flavor\(s\) windows, mac \(available: linux\)"):
+        index.require(['linux', 'windows', 'mac'])
+
+def test_parameters_replace_in_place():
+    flavor = flavors.FlavorIndex({'linux': MAPPING})['linux']
+
+    parameters = flavor.parameters(key_name='key', overrides={'InstanceType': 'm5.large'})
+    assert parameters == [
+        {'ParameterKey': 'InstanceType', 'ParameterValue': 'm5.large'},
+        {'ParameterKey': 'KeyName', 'ParameterValue': 'key'},
+    ]
+
+def test_shipped_mappings_are_valid():
+    assert len(flavors.load_index()) > 0
@@ -0,0 +1,124 @@
+import json
+import pytest
+import flavors
+import params
+
+MAPPING = {
+    'key_param': 'KeyName',
+    'vpc_param': 'VPC',
+    'subnet_param': 'Subnet',
+    'client_ip_param': 'ClientIPAddress',
+    'defaults': [{'ParameterKey': 'InstanceType', 'ParameterValue': 'm5.xlarge'}],
+}
+
+INDEX = flavors.FlavorIndex({'ami': {**MAPPING, 'ami_param': 'AMI'}, 'marketplace': MAPPING})
+
+REGION_MAP = {'RegionMap': {'us-east-1': {'AMI': 'ami-east'}, 'eu-west-1': {'AMI': 'ami-west'}}}
+
+def parameter_value(parameters, key):
+    return {p['ParameterKey']: p['ParameterValue'] for p in parameters}.get(key)
+
+def test_single_region_map_applies_to_every_flavor():
+    assert params.parse_region_maps(REGION_MAP) == {None: {'us-east-1': 'ami-east', 'eu-west-1': 'ami-west'}}
+
+def test_batch_region_map_is_per_flavor():
+    region_maps = params.parse_region_maps({'ami': REGION_MAP, 'other': {'RegionMap': {}}})
+
+    assert region_maps == {'ami': {'us-east-1': 'ami-east', 'eu-west-1': 'ami-west'}, 'other': {}}
+    assert params.ami_for(region_maps, 'ami', 'eu-west-1') == 'ami-west'
+    assert params.ami_for(region_maps, 'missing', 'eu-west-1') is None
+
+@pytest.mark.parametrize('data, message', [
+    ([], r"Region map must be a JSON object"),
+    ({'ami': {'Regions': {}}}, r"Region map of ami has no RegionMap object"),
+    ({'RegionMap': {'us-east-1': {'ImageId': 'ami-east'}}}, r"RegionMap entry us-east-1 of every flavor has no AMI"),
+    ({'RegionMap': {'us-east-1': {'AMI': ''}}}, r"RegionMap entry us-east-1 of every flavor has no AMI"),
+])
+def test_malformed_region_map_is_rejected(data, message):
+    with pytest.raises(flavors.FlavorError, match=message):
+        params.parse_region_maps(data)
+
+def test_region_map_sets_the_ami_of_each_region():
+    parameter_sets = params.build_parameter_sets(
+        INDEX, ['ami'], ['us-east-1', 'eu-west-1'],
+        inputs      = {'key_name': 'key'},
+        region_maps = params.parse_region_maps(REGION_MAP)
+    )
+
+    assert parameter_value(parameter_sets['ami']['us-east-1'], 'AMI') == 'ami-east'
+    assert parameter_value(parameter_sets['ami']['eu-west-1'], 'AMI') == 'ami-west'
+    assert parameter_value(parameter_sets['ami']['eu-west-1'], 'KeyName') == 'key'
+
+def test_region_missing_from_the_map_is_reported_for_every_pair():
+    region_maps = params.parse_region_maps({'RegionMap': {'us-east-1': {'AMI': 'ami-east'}}})
+
+    with pytest.raises(flavors.FlavorError) as excinfo:
+        params.build_parameter_sets(INDEX, ['ami'], ['us-east-1', 'eu-west-1', 'ap-south-1'], region_maps=region_maps)
+
+    assert str(excinfo.value).splitlines() == [
+        "Region map has no AMI for ami in eu-west-1",
+        "Region map has no AMI for ami in ap-south-1",
+    ]
+
+def test_flavor_without_ami_param_ignores_the_region_map():
+    # Even a region the map does not cover, since the flavor takes no AMI
+    parameter_sets = params.build_parameter_sets(
+        INDEX, ['marketplace'], ['ap-south-1'],
+        region_maps = params.parse_region_maps(REGION_MAP)
+    )
+
+    assert parameter_sets == {'marketplace': {'ap-south-1': [{'ParameterKey': 'InstanceType', 'ParameterValue': 'm5.xlarge'}]}}
+
+def test_flavor_without_ami_param_rejects_an_ami():
+    with pytest.raises(flavors.FlavorError, match=r"Flavor 'marketplace' has no ami_param to pass ami-east in"):
+        INDEX['marketplace'].parameters(ami_id='ami-east')
+
+def test_region_inputs_replace_inputs_and_overrides_apply_last():
+    parameter_sets = params.build_parameter_sets(
+        INDEX, ['marketplace'], ['us-east-1', 'eu-west-1'],
+        inputs          = {'vpc_id': 'vpc-default'},
+        region_inputs   = {'eu-west-1': {'vpc_id': 'vpc-west'}},
+        overrides       = {'InstanceType': 'm5.large'}
+    )
+
+    assert parameter_value(parameter_sets['marketplace']['us-east-1'], 'VPC') == 'vpc-default'
+    assert parameter_value(parameter_sets['marketplace']['eu-west-1'], 'VPC') == 'vpc-west'
+    assert parameter_value(parameter_sets['marketplace']['eu-west-1'], 'InstanceType') == 'm5.large'
+
+def test_every_problem_is_reported_before_building():
+    with pytest.raises(flavors.FlavorError) as excinfo:
+        params.build_parameter_sets(INDEX, ['ami'], [], inputs={'vpc': 'vpc-1'}, region_maps={})
+
+    assert str(excinfo.value).splitlines() == [
+        "No region given",
+        "Unknown input(s) vpc (expected vpc_id, subnet_id, key_name, client_ip)",
+    ]
+
+def test_json_arg_reads_inline_json_and_files(tmp_path):
+    path = tmp_path / 'region-map.json'
+    path.write_text(json.dumps(REGION_MAP))
+
+    assert params.load_json_arg(' {"a": 1} ', 'overrides') == {'a': 1}
+    assert params.load_json_arg(str(path), 'region map') == REGION_MAP
+
+@pytest.mark.parametrize('write', [False, True])
+def test_malformed_json_arg_is_a_flavor_error(tmp_path, write):
+    value = '{"RegionMap": '
+    if write:
+        path = tmp_path / 'region-map.json'
+        path.write_text(value)
+        value = str(path)
+
+    with pytest.raises(flavors.FlavorError, match=r"region map is not valid JSON"):
+        params.load_json_arg(value, 'region map')
+
+def test_missing_json_file_is_a_flavor_error(tmp_path):
+    with pytest.raises(flavors.FlavorError, match=r"Could not read region map"):
+        params.load_json_arg(str(tmp_path / 'missing.json'), 'region map')
+
+def test_main_reports_a_malformed_region_map(capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        params.main(['--flavor', 'linux', '--region', 'us-east-1', '--region-map', '{"RegionMap": '])
+
+    assert excinfo.value.code == 1
+    assert "::error::region map is not valid JSON" in capsys.readouterr().out
@@ -0,0 +1,145 @@
+import os
+import random
+import pytest
+import clock as clock_module
+import fake_cfn
+import flavors
+import smoke
+
+REGIONS = ['us-east-1', 'eu-west-1', 'ap-south-1']
+
+def make_deployments(flavor_names=('linux', 'windows'), regions=REGIONS, prefix='smk'):
+    parameter_sets = {
+        flavor: {region: [{'ParameterKey': 'KeyName', 'ParameterValue': 'key'}] for region in regions}
+        for flavor in flavor_names
+    }
+    return smoke.plan_deployments(parameter_sets, None, prefix)
+
+def run(deployments, cfn, **kwargs):
+    for deployment in deployments:
+        deployment['template_file'] = os.devnull
+    return smoke.run_deployments(deployments, cfn.client, clock=cfn.clock, **kwargs)
+
+@pytest.fixture
+def cfn():
+    return fake_cfn.FakeCloudFormation(clock=clock_module.SimulatedClock(), rng=random.Random(0))
+
+def test_plan_deployments_alternates_regions():
+    deployments = make_deployments()
+
+    assert [(d['flavor'], d['region']) for d in deployments] == [
+        ('linux', 'us-east-1'), ('linux', 'eu-west-1'), ('linux', 'ap-south-1'),
+        ('windows', 'us-east-1'), ('windows', 'eu-west-1'), ('windows', 'ap-south-1'),
+    ]
+    assert deployments[0]['stack_name'] == 'smk-linux-us-east-1'
+
+def test_plan_deployments_reports_every_problem(tmp_path):
+    parameter_sets = {'linux': {'us-east-1': []}, 'windows': {'us-east-1': []}}
+    with pytest.raises(flavors.FlavorError) as e:
+        smoke.plan_deployments(parameter_sets, {'linux': str(tmp_path / 'missing.yml')}, '1bad')
+
+    message = str(e.value)
+    assert 'Template of linux not found' in message
+    assert 'No template given for windows' in message
+    assert "'1bad-linux-us-east-1' is not a valid stack name" in message
+
+def test_stacks_are_created_and_deleted(cfn):
+    results = run(make_deployments(), cfn)
+
+    assert all(r['passed'] and r['created'] and r['deleted'] for r in results)
+    assert results[0]['outputs']['StackRegion'] == 'us-east-1'
+    assert cfn.live_stacks() == 0
+
+def test_rolled_back_stack_is_deleted(cfn):
+    cfn.fail_regions = {'eu-west-1'}
+    results = {r['region']: r for r in run(make_deployments(flavor_names=('linux',)), cfn)}
+
+    failed = results['eu-west-1']
+    assert not failed['passed']
+    assert failed['status'] == 'ROLLBACK_COMPLETE'
+    assert failed['deleted']
+    assert 'Injected resource failure' in failed['error']
+    assert results['us-east-1']['passed']
+    assert cfn.live_stacks() == 0
+
+def test_existing_stack_is_never_deleted(cfn):
+    cfn.client('us-east-1').create_stack(StackName='smk-linux-us-east-1')
+    results = run(make_deployments(flavor_names=('linux',), regions=['us-east-1']), cfn)
+
+    assert not results[0]['passed']
+    assert not results[0]['created']
+    assert 'AlreadyExistsException' in results[0]['error']
+    assert cfn.calls[('us-east-1', 'delete_stack')] == 0
+    assert cfn.client('us-east-1').describe_stacks(StackName='smk-linux-us-east-1')['Stacks']
+
+def test_concurrency_cap(cfn):
+    results = run(make_deployments(), cfn, max_concurrency=2)
+
+    assert all(r['passed'] for r in results)
+    assert cfn.peak_stacks == 2
+
+def test_throttled_calls_are_retried(cfn):
+    cfn.throttle_rate = 0.3
+    results = run(make_deployments(), cfn)
+
+    assert sum(cfn.throttled.values()) > 0
+    assert all(r['passed'] for r in results)
+
+def test_wait_fails_fast_on_other_errors(cfn):
+    cfn.client('us-east-1').create_stack(StackName='smk')
+    client = cfn.client('us-east-1')
+
+    def describe_stacks(**kwargs):
+        raise fake_cfn.FakeClientError('AccessDenied', 'Not authorized', 'DescribeStacks')
+    client.describe_stacks = describe_stacks
+
+    with pytest.raises(fake_cfn.FakeClientError):
+        smoke.wait_for_stack(client, 'smk', smoke.CREATE_DONE_STATES, smoke.CREATE_FAILED_STATES, cfn.clock)
+    # One poll, not a retry loop until the timeout
+    assert cfn.clock.now() == smoke.DEFAULT_INITIAL_DELAY
+
+def test_times_are_reported_in_time_scale_units(cfn):
+    cfn.create_latency = 6
+    cfn.delete_latency = 3
+    results = run(
+        make_deployments(flavor_names=('linux',), regions=['us-east-1']), cfn,
+        poll_config = {'initial_delay': 1, 'max_delay': 1},
+        time_scale  = 0.01
+    )
+
+    assert results[0]['create_time'] == pytest.approx(600, abs=100)
+    assert results[0]['delete_time'] == pytest.approx(300, abs=100)
+
+def lose_first_create_response(cfn, strip_token=False):
+    """
+    Client factory whose first create_stack reaches CloudFormation but times out on the way back.
+    """
+    lost = []
+
+    def factory(region):
+        client = cfn.client(region)
+        create_stack = client.create_stack
+
+        def flaky_create_stack(**kwargs):
+            if strip_token:
+                kwargs.pop('ClientRequestToken')
+            response = create_stack(**kwargs)
+            if not lost:
+                lost.append(kwargs['StackName'])
+                raise TimeoutError('Read timed out')
+            return response
+        client.create_stack = flaky_create_stack
+        return client
+    return factory
+
+@pytest.mark.parametrize('strip_token', [False, True])
+def test_retried_create_still_deletes_the_stack(cfn, strip_token):
+    deployments = make_deployments(flavor_names=('linux',), regions=['us-east-1'])
+    for deployment in deployments:
+        deployment['template_file'] = os.devnull
+    results = smoke.run_deployments(deployments, lose_first_create_response(cfn, strip_token), clock=cfn.clock)
+
+    assert results[0]['created']
+    assert results[0]['passed']
+    assert results[0]['deleted']
+    assert cfn.live_stacks() == 0
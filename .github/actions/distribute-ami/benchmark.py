@@ -0,0 +1,194 @@
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import contextlib
+from collections import Counter
+
+if __name__ == "__main__":
+    # The shared modules are only on sys.path when run through the shared CLI
+    sys.exit("Run this through the shared CLI: python .github/actions/shared/cli.py bench-distribute --help")
+
+import clients
+import discovery
+import engine
+import fake_ec2
+import instrumentation
+import scheduler
+import throttle
+
+SOURCE_REGION = 'us-east-1'
+
+# Destination regions used first; larger counts are padded with synthetic names
+AWS_REGIONS = [
+    'us-east-2', 'us-west-1', 'us-west-2', 'ca-central-1', 'eu-west-1', 'eu-west-2', 'eu-west-3',
+    'eu-central-1', 'eu-north-1', 'eu-south-1', 'ap-south-1', 'ap-northeast-1', 'ap-northeast-2',
+    'ap-northeast-3', 'ap-southeast-1', 'ap-southeast-2', 'sa-east-1', 'me-south-1', 'af-south-1',
+]
+
+def dest_region_names(count):
+    extra = (f"sim-region-{i}" for i in itertools.count(1))
+    return (AWS_REGIONS + list(itertools.islice(extra, max(0, count - len(AWS_REGIONS)))))[:count]
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+def run_scenario(region_count, max_workers, args):
+    """
+    Runs the real distribution engine once against a fake_ec2.FakeAWS.
+
+    Durations in args are in simulated seconds. The run happens on the real clock with
+    every duration multiplied by args.time_scale, so threads genuinely overlap; results
+    are converted back to simulated seconds.
+
+    Returns:
+        dict: metrics of the run
+    """
+    scale   = args.time_scale
+    clock   = scheduler.SystemClock()
+    regions = dest_region_names(region_count)
+    rng     = random.Random(args.seed)
+
+    aws = fake_ec2.FakeAWS(
+        clock               = clock,
+        copy_latency        = args.copy_latency * scale,
+        copy_jitter         = args.copy_jitter * scale,
+        call_latency        = args.call_latency * scale,
+        max_page_size       = args.page_size,
+        throttle_rate       = args.throttle_rate,
+        copy_failure_rate   = args.copy_failure_rate,
+        fail_copy_regions   = regions[:args.failed_regions],
+        visibility_delay    = args.visibility_delay * scale,
+        rng                 = rng
+    )
+
+    jobs = []
+    for i in range(args.sources):
+        src_ami = aws.add_image(SOURCE_REGION, name=f"source-{i}")
+        jobs.append(engine.new_job(src_ami, SOURCE_REGION, f"flavor-{i}", f"benchmark-{i}"))
+
+    # Images discovery has to page past, plus copies an earlier run already made
+    for region in regions:
+        for i in range(args.other_images):
+            aws.add_image(region, description=f"Unrelated image {i}")
+    for job, region in itertools.islice(itertools.product(jobs, regions), args.existing_copies):
+        aws.add_image(region, description=discovery.copy_description(job['src_ami'], SOURCE_REGION))
+
+    api_throttle = throttle.Throttle(
+        default_rate    = args.api_rate / scale,
+        rates           = {op: (rate / scale, burst) for op, (rate, burst) in throttle.DEFAULT_RATES.items()},
+        retry_budget    = args.retry_budget,
+        base_delay      = throttle.DEFAULT_BASE_DELAY * scale,
+        max_delay       = throttle.DEFAULT_MAX_DELAY * scale,
+        clock           = clock,
+        rng             = random.Random(args.seed)
+    )
+    poll_config = {
+        'initial_delay': scheduler.DEFAULT_INITIAL_DELAY * scale,
+        'max_delay': scheduler.DEFAULT_MAX_DELAY * scale,
+        'timeout': scheduler.DEFAULT_TIMEOUT * scale,
+    }
+
+    # Spans and counters of earlier runs would only pile up
+    instrumentation.reset()
+
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        results = engine.distribute_batch(
+            clients         = clients.ClientPool(factory=aws.client, throttle=api_throttle),
+            jobs            = jobs,
+            dest_regions    = regions,
+            max_workers     = max_workers,
+            clock           = clock,
+            poll_config     = poll_config
+        )
+    elapsed = (time.perf_counter() - start) / scale
+
+    states = [state for _, job_states in results for state in job_states]
+    calls_per_region = Counter()
+    for (region, _), count in aws.calls.items():
+        calls_per_region[region] += count
+    calls_per_operation = Counter()
+    for (_, operation), count in aws.calls.items():
+        calls_per_operation[operation] += count
+
+    copies = [
+        image
+        for region in regions
+        for image in aws._images.get(region, {}).values()
+        if image['_ready_at'] is not None
+    ]
+    lags = list(aws.publish_lag.values())
+
+    return {
+        'regions': region_count,
+        'max_workers': max_workers,
+        'end_to_end': elapsed,
+        'done': sum(1 for s in states if s['stage'] == engine.STAGE_DONE),
+        'failed': sum(1 for s in states if s['stage'] == engine.STAGE_FAILED),
+        'api_calls': sum(aws.calls.values()),
+        'calls_per_region': dict(sorted(calls_per_region.items())),
+        'calls_per_operation': dict(sorted(calls_per_operation.items())),
+        # Working: time threads spent inside API calls
+        'api_time': sum(aws.call_time.values()) / scale,
+        # Waiting: on EC2 to finish copies, on polling to notice, and on the client-side rate limiter
+        'copy_time': sum(image['_ready_at'] - image['_created_at'] for image in copies) / scale,
+        'publish_lag_mean': (sum(lags) / len(lags) / scale) if lags else 0.0,
+        'publish_lag_max': (max(lags) / scale) if lags else 0.0,
+        'rate_limit_wait': sum(api_throttle.wait_time.values()) / scale,
+        'throttle_events': sum(api_throttle.throttle_events.values()),
+        'retries': sum(api_throttle.retries.values()),
+    }
+
+def report(runs):
+    print(f"{'Regions':>7} {'Workers':>7} {'End to end':>11} {'Done':>5} {'Failed':>6} {'Calls':>6} "
+          f"{'API time':>9} {'Copy time':>10} {'Lag mean':>9} {'Lag max':>8} {'RL wait':>8} {'Throttled':>9}")
+    for run in runs:
+        print(f"{run['regions']:>7} {run['max_workers']:>7} {run['end_to_end']:>10.0f}s {run['done']:>5} {run['failed']:>6} "
+              f"{run['api_calls']:>6} {run['api_time']:>8.0f}s {run['copy_time']:>9.0f}s {run['publish_lag_mean']:>8.0f}s "
+              f"{run['publish_lag_max']:>7.0f}s {run['rate_limit_wait']:>7.0f}s {run['throttle_events']:>9}")
+
+def setup_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the AMI distribution engine against a simulated EC2. Runs offline.')
+    parser.add_argument('--region-counts',      type=parse_int_list, default=[4, 8, 16],  help='Comma separated destination region counts to try')
+    parser.add_argument('--max-workers',        type=parse_int_list, default=[1, 4, 8],   help='Comma separated worker counts to try')
+    parser.add_argument('--sources',            type=int,   default=1,      help='Source AMIs distributed in one batch')
+    parser.add_argument('--copy-latency',       type=float, default=600,    help='Simulated seconds for a copy to become available')
+    parser.add_argument('--copy-jitter',        type=float, default=120,    help='Extra random copy time, up to this many simulated seconds')
+    parser.add_argument('--call-latency',       type=float, default=0.3,    help='Simulated seconds per API call')
+    parser.add_argument('--page-size',          type=int,   default=1000,   help='Largest DescribeImages page the fake returns')
+    parser.add_argument('--other-images',       type=int,   default=0,      help='Unrelated images per region that discovery pages past')
+    parser.add_argument('--existing-copies',    type=int,   default=0,      help='(source, region) pairs that already hold a copy')
+    parser.add_argument('--throttle-rate',      type=float, default=0.0,    help='Chance of any call being throttled')
+    parser.add_argument('--copy-failure-rate',  type=float, default=0.0,    help='Chance of a copy failing')
+    parser.add_argument('--failed-regions',     type=int,   default=0,      help='Regions where copy_image is refused')
+    parser.add_argument('--visibility-delay',   type=float, default=0,      help='Simulated seconds a new copy is unknown to DescribeImages')
+    parser.add_argument('--api-rate',           type=float, default=throttle.DEFAULT_RATE, help='Client-side calls per simulated second per region and operation')
+    parser.add_argument('--retry-budget',       type=int,   default=throttle.DEFAULT_RETRY_BUDGET)
+    parser.add_argument('--time-scale',         type=float, default=0.002,  help='Real seconds per simulated second')
+    parser.add_argument('--seed',               type=int,   default=0)
+    parser.add_argument('--output',             required=False, help='Write every run\'s metrics here as JSON')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = setup_args(argv)
+
+    runs = []
+    for region_count, max_workers in itertools.product(args.region_counts, args.max_workers):
+        runs.append(run_scenario(region_count, max_workers, args))
+
+    print("Times are simulated seconds.")
+    report(runs)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'runs': runs}, f, indent=2)
+        print(f"Results written to: {args.output}")
+
+    if any(run['failed'] for run in runs) and not (args.copy_failure_rate or args.failed_regions or args.throttle_rate):
+        print("::error::Regions failed without any failure being injected")
+        sys.exit(1)
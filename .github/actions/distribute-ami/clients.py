@@ -0,0 +1,81 @@
+import threading
+import aws_errors
+import instrumentation
+import throttle as throttle_module
+
+class ClientPool:
+    """
+    One EC2 client per region, created on first use from a single shared session.
+
+    boto3 sessions are not thread-safe, so creation is serialised behind a lock;
+    the clients themselves are safe to share between threads once built.
+    """
+
+    def __init__(self, max_connections=10, factory=None, session=None, throttle=None):
+        """
+        Args:
+            max_connections:    HTTP connections per regional client. Should match the
+                                number of threads that may call one region at once.
+            factory:            callable(region) -> client. Replaces boto3, e.g. with a fake client.
+            session:            boto3 Session to build clients from. Defaults to a new one.
+            throttle:           throttle.Throttle every client is wrapped in. botocore's own
+                                retries are then turned off so the throttle's budget governs them;
+                                the throttle retries connection errors, read timeouts and 5xx too.
+        """
+        self.max_connections    = max_connections
+        self._factory           = factory
+        self._session           = session
+        self._throttle          = throttle
+        self._clients           = {}
+        self._lock              = threading.Lock()
+
+    def get(self, region):
+        with self._lock:
+            if region not in self._clients:
+                client = InstrumentedClient(self._create(region), region)
+                if self._throttle:
+                    client = self._throttle.wrap(client, region)
+                self._clients[region] = client
+            return self._clients[region]
+
+    def _create(self, region):
+        if self._factory:
+            return self._factory(region)
+
+        from botocore.config import Config
+
+        config = Config(max_pool_connections=self.max_connections)
+        if self._throttle:
+            config = config.merge(Config(retries={'mode': 'standard', 'total_max_attempts': 1}))
+
+        return self._get_session().client('ec2', region_name=region, config=config)
+
+    def _get_session(self):
+        if self._session is None:
+            import boto3
+            self._session = boto3.session.Session()
+        return self._session
+
+class InstrumentedClient:
+    """
+    Wraps an EC2 client so every API call, and every error by code, is counted by instrumentation.
+    Sits inside any throttle, so retried attempts count as calls too.
+    """
+
+    def __init__(self, client, region):
+        self._client    = client
+        self._region    = region
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name in throttle_module.PASSTHROUGH or name.startswith('_') or not callable(attr):
+            return attr
+
+        def call(**kwargs):
+            instrumentation.count('api_calls', operation=name, region=self._region)
+            try:
+                return attr(**kwargs)
+            except Exception as e:
+                instrumentation.count('api_errors', operation=name, code=aws_errors.error_code(e) or type(e).__name__)
+                raise
+        return call
@@ -0,0 +1,108 @@
+import re
+import hashlib
+import threading
+
+# DescribeImages accepts between 6 and 1000 results per page
+DEFAULT_PAGE_SIZE = 1000
+
+COPY_DESCRIPTION_RE = re.compile(r"\[Copied (\S+) from ([^\s\]]+)\]")
+
+def copy_description(src_ami, src_region):
+    """
+    Description stamped on every copy. Used to recognise copies on later runs.
+    """
+    return f"[Copied {src_ami} from {src_region}]"
+
+def copy_token(src_ami, dest_region, image_name):
+    """
+    CopyImage ClientToken of one copy. It is the same on every attempt, so a retried call
+    whose first attempt did reach EC2 returns that copy instead of starting another.
+    image_name is unique per run, so a later run still copies afresh.
+    """
+    return hashlib.sha256(f"{src_ami}|{dest_region}|{image_name}".encode('utf-8')).hexdigest()[:64]
+
+def build_filters(descriptions=None, names=None, tags=None):
+    """
+    Builds a DescribeImages Filters list. Values may use the EC2 wildcards '*' and '?'.
+    Values within one filter are OR'd together; separate filters are AND'd.
+
+    Args:
+        descriptions:   list of description patterns
+        names:          list of name patterns
+        tags:           dict of { tag_key: value or [values] }
+    """
+    filters = []
+    if descriptions:
+        filters.append({'Name': 'description', 'Values': list(descriptions)})
+    if names:
+        filters.append({'Name': 'name', 'Values': list(names)})
+    for key, values in (tags or {}).items():
+        if isinstance(values, str):
+            values = [values]
+        filters.append({'Name': f"tag:{key}", 'Values': list(values)})
+    return filters
+
+def iter_images(ec2, filters, owners=('self',), page_size=DEFAULT_PAGE_SIZE):
+    """
+    Yields images matching the filters, fetching the next page only when the previous one is used up.
+    """
+    kwargs = {
+        'Owners': list(owners),
+        'Filters': filters,
+        'MaxResults': page_size,
+    }
+    while True:
+        page = ec2.describe_images(**kwargs)
+        yield from page.get('Images', [])
+
+        token = page.get('NextToken')
+        if not token:
+            return
+        kwargs['NextToken'] = token
+
+class CopyIndex:
+    """
+    Source -> copy index for a single region.
+
+    All sources are matched with one server-side filtered query, so one index can
+    answer lookups for many source AMIs. Pages are pulled lazily: a lookup stops
+    reading as soon as the copy it asks for has been seen. Lookups are thread-safe.
+    """
+
+    def __init__(self, ec2, sources, page_size=DEFAULT_PAGE_SIZE):
+        """
+        Args:
+            ec2:        EC2 client for the region being indexed
+            sources:    iterable of (src_ami, src_region) tuples this index answers for
+        """
+        self._sources   = set(sources)
+        self._index     = {}
+        self._lock      = threading.Lock()
+        self._images    = iter_images(
+            ec2,
+            build_filters(descriptions=[f"*{copy_description(a, r)}*" for a, r in sorted(self._sources)]),
+            page_size=page_size
+        ) if self._sources else iter([])
+
+    def lookup(self, src_ami, src_region):
+        """
+        Returns the image dict of an existing copy of src_ami, or None.
+        """
+        key = (src_ami, src_region)
+        if key not in self._sources:
+            raise ValueError(f"{src_ami} from {src_region} was not registered with this index")
+
+        with self._lock:
+            while key not in self._index:
+                image = next(self._images, None)
+                if image is None:
+                    return None
+                self._add(image)
+
+            return self._index[key]
+
+    def _add(self, image):
+        # A description can in principle carry several markers; index the image under each one
+        for match in COPY_DESCRIPTION_RE.finditer(image.get('Description', '')):
+            # Keep the first copy seen, as the old full scan did
+            self._index.setdefault((match.group(1), match.group(2)), image)
@@ -1,138 +1,196 @@
 import os
 import json
-import boto3
-import time
 import argparse
 import sys
 
-def get_args():
+if __name__ == "__main__":
+    # The shared modules are only on sys.path when run through the shared CLI
+    sys.exit("Run this through the shared CLI: python .github/actions/shared/cli.py distribute --help")
+
+import instrumentation
+import clients
+import engine
+import state
+import throttle
+
+def get_args(argv=None):
     parser = argparse.ArgumentParser()
-    parser.add_argument('--ami-id', required=True)
+    parser.add_argument('--ami-id', required=False)
     parser.add_argument('--src-region', required=True)
     parser.add_argument('--dest-regions', required=True, help="Comma separated list")
-    parser.add_argument('--version', required=True, help="Matlab version for naming")
-    parser.add_argument('--flavor', required=True, help="Refarch flavor for naming")
+    parser.add_argument('--version', required=False, help="Matlab version for naming")
+    parser.add_argument('--flavor', required=False, help="Refarch flavor for naming")
+    parser.add_argument('--manifest', required=False, help="JSON file listing {ami_id, version, flavor} entries to distribute in one run")
+    parser.add_argument('--output-dir', required=False, help="Batch mode: also write one <flavor>-region-map.json per flavor here")
+    parser.add_argument('--max-workers', type=int, default=engine.DEFAULT_MAX_WORKERS, help="Regions processed concurrently")
+    parser.add_argument('--api-rate', type=float, default=throttle.DEFAULT_RATE, help="Calls per second per region for each EC2 operation without its own default")
+    parser.add_argument('--retry-budget', type=int, default=throttle.DEFAULT_RETRY_BUDGET, help="Throttling retries allowed across the whole run")
+    parser.add_argument('--state-file', required=False, help="JSON file recording progress, so reruns skip finished regions")
+    parser.add_argument('--state-ttl', type=int, required=False, help="Seconds cached state is trusted before it is revalidated against EC2")
+    parser.add_argument('--invalidate-state', action='store_true', help="Discard cached state for this AMI and flavor before running")
+    parser.add_argument('--trace-file', required=False, help="Write spans and API call counters of the run here")
+    parser.add_argument('--trace-format', choices=['json', 'chrome'], default='json', help="Trace file format")
     parser.add_argument('--test-mode', action='store_true')
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+
+    if not args.manifest and not (args.ami_id and args.version and args.flavor):
+        parser.error("either --manifest or all of --ami-id, --version and --flavor are required")
+
+    return args
+
+def load_manifest(manifest_path, default_src_region):
+    """
+    Reads a batch manifest: a JSON list of
+        { "ami_id": str, "version": str, "flavor": str, "source_region": str (optional) }
+
+    Flavors must be unique, since the output holds one region map per flavor, and so must
+    AMI IDs, since each entry copies its AMI to every region on its own.
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"::error::Could not read manifest {manifest_path}: {e}")
+        sys.exit(1)
+
+    if not isinstance(entries, list) or not entries:
+        print(f"::error::Manifest {manifest_path} must be a non-empty JSON list")
+        sys.exit(1)
+
+    seen_flavors = set()
+    seen_amis = {}  # { ami_id: flavor }
+    for i, entry in enumerate(entries):
+        missing = [k for k in ('ami_id', 'version', 'flavor') if not entry.get(k)]
+        if missing:
+            print(f"::error::Manifest entry {i} is missing {', '.join(missing)}")
+            sys.exit(1)
+        if entry['flavor'] in seen_flavors:
+            print(f"::error::Manifest lists flavor '{entry['flavor']}' more than once")
+            sys.exit(1)
+        seen_flavors.add(entry['flavor'])
+        if entry['ami_id'] in seen_amis:
+            print(f"::error::Manifest lists AMI {entry['ami_id']} for both '{seen_amis[entry['ami_id']]}' "
+                  f"and '{entry['flavor']}'; each source AMI may appear only once")
+            sys.exit(1)
+        seen_amis[entry['ami_id']] = entry['flavor']
+        entry.setdefault('source_region', default_src_region)
+
+    return entries
+
+def write_github_output(name, value):
+    # Handling new GITHUB_OUTPUT environment file format
+    with open(os.environ['GITHUB_OUTPUT'], 'a') as fh:
+        fh.write(f"{name}={value}\n")
+
+def write_batch_outputs(region_maps, output_dir):
+    """
+    region_maps: { flavor: { region: { "AMI": id } } }
+    """
+    combined = {flavor: {'RegionMap': region_map} for flavor, region_map in region_maps.items()}
+    final_json = json.dumps(combined)
+    print(f"Final Region Maps: {final_json}")
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        for flavor, wrapped in combined.items():
+            path = os.path.join(output_dir, f"{flavor}-region-map.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(wrapped, f, indent=2)
+            print(f"   Created: {path}")
+
+    write_github_output('region_maps_json', final_json)
+
+def main(argv=None):
+    args = get_args(argv)
 
-def main():
-    args = get_args()
-    
-    src_ami = args.ami_id
     src_region = args.src_region
     dest_regions = [r.strip() for r in args.dest_regions.split(',') if r.strip()]
-    
-    # Initialize RegionMap with the source
-    region_map = {
-        src_region: {"AMI": src_ami}
-    }
+
+    if args.manifest:
+        entries = load_manifest(args.manifest, src_region)
+    else:
+        entries = [{
+            'ami_id': args.ami_id,
+            'version': args.version,
+            'flavor': args.flavor,
+            'source_region': src_region,
+        }]
 
     # --- TEST MODE ---
     if args.test_mode:
         print(f"::notice::Running in TEST MODE. No resources will be created.")
-        for region in dest_regions:
-            if region == src_region: continue
-            # Return a mock or the source AMI for all regions to validate template generation
-            region_map[region] = {"AMI": f"ami-test-{region}"}
-        
-        # Print output and exit
-        print(f"::set-output name=region_map_json::{json.dumps({'RegionMap': region_map})}")
+        region_maps = {}
+        for entry in entries:
+            # Initialize RegionMap with the source
+            region_map = {entry['source_region']: {"AMI": entry['ami_id']}}
+            for region in dest_regions:
+                if region == entry['source_region']: continue
+                # Return a mock or the source AMI for all regions to validate template generation
+                region_map[region] = {"AMI": f"ami-test-{region}"}
+            region_maps[entry['flavor']] = region_map
+
+        if args.manifest:
+            write_batch_outputs(region_maps, args.output_dir)
+        else:
+            # Print output and exit
+            print(f"::set-output name=region_map_json::{json.dumps({'RegionMap': region_maps[args.flavor]})}")
         return
 
     # --- REAL MODE ---
-    # Setup source session to read details if needed, though mostly we work in dest
     # We rely on env vars set by configure-aws-credentials
-    
-    pending_regions = []
-
-    for dest_region in dest_regions:
-        if dest_region == src_region:
-            continue
-
-        print(f"Processing region: {dest_region}...")
-        
-        # Create a client for the specific destination region
-        ec2 = boto3.client('ec2', region_name=dest_region)
-        account_id = boto3.client('sts').get_caller_identity().get('Account')
-
-        # 1. Check if copy exists
-        # Fetch images owned by self with description checking
-        all_amis = ec2.describe_images(Owners=['self'])
-        
-        dest_ami_id = None
-        
-        for image in all_amis['Images']:
-            if 'Description' in image and f"[Copied {src_ami} from {src_region}]" in image['Description']:
-                dest_ami_id = image['ImageId']
-                print(f"Found existing copy in {dest_region}: {dest_ami_id}")
-                
-                # Check Public permissions
-                if not image.get('Public', False):
-                    print(f"Making existing AMI {dest_ami_id} public...")
-                    ec2.modify_image_attribute(
-                        ImageId=dest_ami_id,
-                        LaunchPermission={"Add": [{"Group": "all"}]}
-                    )
-                break
-        
-        # 2. Copy if not exists
-        if not dest_ami_id:
-            print(f"Copying {src_ami} to {dest_region}...")
-            response = ec2.copy_image(
-                Description=f"[Copied {src_ami} from {src_region}]",
-                Name=f"{args.version}-{args.flavor}-{int(time.time())}", # Unique name to prevent collision
-                SourceImageId=src_ami,
-                SourceRegion=src_region
-            )
-            dest_ami_id = response['ImageId']
-            pending_regions.append((dest_region, dest_ami_id))
-        
-        # Add to map
-        region_map[dest_region] = {"AMI": dest_ami_id}
-
-    # 3. Wait for new copies
-    if pending_regions:
-        print(f"Waiting for AMIs to become available in: {[x[0] for x in pending_regions]}")
-        
-    for dest_region, dest_ami in pending_regions:
-        print(f"Waiting for {dest_ami} in {dest_region}...")
-        ec2 = boto3.client('ec2', region_name=dest_region)
-        
-        waiter = ec2.get_waiter('image_available')
-        # Wait up to 30 mins (45 attempts * 40s)
-        waiter.wait(
-            ImageIds=[dest_ami],
-            WaiterConfig={'Delay': 40, 'MaxAttempts': 45}
+    cache = state.StateCache(args.state_file, ttl=args.state_ttl)
+    if args.invalidate_state:
+        removed = sum(cache.invalidate(src_ami=e['ami_id'], flavor=e['flavor']) for e in entries)
+        print(f"Discarded {removed} cached region record(s)")
+
+    jobs = [
+        engine.new_job(
+            src_ami     = entry['ami_id'],
+            src_region  = entry['source_region'],
+            flavor      = entry['flavor'],
+            image_name  = engine.unique_image_name(entry['version'], entry['flavor'])
         )
+        for entry in entries
+    ]
+
+    api_throttle = throttle.Throttle(default_rate=args.api_rate, retry_budget=args.retry_budget)
+
+    results = engine.distribute_batch(
+        clients         = clients.ClientPool(max_connections=max(10, args.max_workers), throttle=api_throttle),
+        jobs            = jobs,
+        dest_regions    = dest_regions,
+        max_workers     = args.max_workers,
+        cache           = cache
+    )
+    api_throttle.report()
+
+    tracer = instrumentation.get_tracer()
+    if args.trace_file:
+        tracer.write(args.trace_file, args.trace_format)
+    tracer.write_step_summary("AMI distribution")
 
-        print(f"AMI {dest_ami} is available. Setting permissions...")
-        
-        # Make AMI Public
-        ec2.modify_image_attribute(
-            ImageId=dest_ami, 
-            LaunchPermission={"Add": [{"Group": "all"}]}
+    failed = [
+        (job, s)
+        for job, (_, states) in zip(jobs, results)
+        for s in states
+        if s['stage'] == engine.STAGE_FAILED
+    ]
+    if failed:
+        for job, failure in failed:
+            print(f"::error::Distribution of {job['src_ami']} ({job['flavor']}) to {failure['region']} failed at {failure['error']}")
+        sys.exit(1)
+
+    # Final Output
+    if args.manifest:
+        write_batch_outputs(
+            {job['flavor']: region_map for job, (region_map, _) in zip(jobs, results)},
+            args.output_dir
         )
+        return
 
-        # Make Snapshot Public
-        ami_details = ec2.describe_images(ImageIds=[dest_ami])
-        if ami_details['Images']:
-            block_mappings = ami_details['Images'][0].get('BlockDeviceMappings', [])
-            for mapping in block_mappings:
-                if 'Ebs' in mapping and 'SnapshotId' in mapping['Ebs']:
-                    snap_id = mapping['Ebs']['SnapshotId']
-                    ec2.modify_snapshot_attribute(
-                        SnapshotId=snap_id,
-                        CreateVolumePermission={"Add": [{"Group": "all"}]}
-                    )
-
-    # 4. Final Output
+    region_map = results[0][0]
     final_json = json.dumps({'RegionMap': region_map})
     print(f"Final Region Map: {final_json}")
-    
-    # Write to GitHub Output
-    # Handling new GITHUB_OUTPUT environment file format
-    with open(os.environ['GITHUB_OUTPUT'], 'a') as fh:
-        fh.write(f"region_map_json={final_json}\n")
 
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Write to GitHub Output
+    write_github_output('region_map_json', final_json)
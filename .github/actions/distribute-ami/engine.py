@@ -0,0 +1,395 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import aws_errors
+import discovery
+import instrumentation
+import publish
+import scheduler
+
+# Stages a destination region moves through, in order.
+# A region that already holds an available copy skips straight from discovery to publishing.
+STAGE_DISCOVER          = 'discover'
+STAGE_COPY              = 'copy'
+STAGE_WAIT              = 'wait'
+STAGE_PUBLISH_AMI       = 'publish_ami'
+STAGE_PUBLISH_SNAPSHOTS = 'publish_snapshots'
+STAGE_DONE              = 'done'
+STAGE_FAILED            = 'failed'
+
+DEFAULT_MAX_WORKERS = 8
+
+def new_region_state(dest_region):
+    return {
+        'region': dest_region,
+        'stage': STAGE_DISCOVER,
+        'ami_id': None,
+        'copied': False,
+        'available': False,
+        'ami_public': False,
+        'snapshots_public': False,
+        'copy_duration': None,
+        'error': None,
+    }
+
+def checkpoint(state, cache, src_ami, flavor, **fields):
+    """
+    Applies fields to a region's state and records them in the cache, if any.
+    """
+    state.update(fields)
+    if cache:
+        cache.update(src_ami, state['region'], flavor, state)
+
+def revalidate(ec2, record):
+    """
+    Checks a stale cached record against EC2.
+
+    Returns:
+        dict: the record with availability and publish status refreshed,
+              or None if the image is gone and the region must start over.
+    """
+    try:
+        images = ec2.describe_images(ImageIds=[record['ami_id']])['Images']
+    except Exception as e:
+        if (aws_errors.error_code(e) or '').startswith('InvalidAMIID'):
+            images = []
+        else:
+            raise
+
+    if not images or images[0].get('State') in scheduler.FAILED_STATES:
+        return None
+
+    image = images[0]
+    record['available']  = image.get('State') == 'available'
+    record['ami_public'] = image.get('Public', False)
+
+    if not record['available']:
+        record['stage'] = STAGE_WAIT
+    elif record['stage'] == STAGE_DONE and not record['ami_public']:
+        record['stage'] = STAGE_PUBLISH_AMI
+
+    return record
+
+def fail(state, e):
+    # The cache keeps the last completed stage, so a rerun resumes from here
+    print(f"[{state['region']}] Failed during '{state['stage']}': {e}")
+    state['error'] = f"{state['stage']}: {e}"
+    state['stage'] = STAGE_FAILED
+
+def prepare_region(ec2, index, dest_region, src_ami, src_region, image_name, cache=None, flavor=None):
+    """
+    Runs the first half of a region's pipeline: resume -> discover -> copy.
+
+    index is the discovery.CopyIndex for dest_region. If a state.StateCache is given,
+    the region resumes from its last recorded stage and every completed stage is recorded.
+
+    Returns:
+        dict: {
+            'region': str,
+            'stage': str,               # next stage to run, STAGE_DONE, or STAGE_FAILED
+            'ami_id': str,
+            'copied': bool,             # True if the copy was made by this tool rather than found
+            'available': bool,
+            'ami_public': bool,
+            'snapshots_public': bool,
+            'copy_duration': float,     # seconds from copy to available, if waited on in this run
+            'error': str,
+            'image': dict,              # describe_images entry of a found copy; consumed by publish_region
+        }
+    """
+    state = new_region_state(dest_region)
+
+    try:
+        # Pick up where an earlier run stopped
+        record = cache.get(src_ami, dest_region, flavor) if cache else None
+        if record and not cache.is_fresh(record):
+            print(f"[{dest_region}] Revalidating cached state for {record['ami_id']}...")
+            record = revalidate(ec2, record)
+            if record:
+                cache.update(src_ami, dest_region, flavor, record)
+            else:
+                print(f"[{dest_region}] Cached AMI no longer exists. Starting over.")
+                cache.invalidate(src_ami, dest_region, flavor)
+
+        if record:
+            state.update({k: record[k] for k in record if k in state})
+            if state['stage'] == STAGE_DONE:
+                print(f"[{dest_region}] Already distributed: {state['ami_id']}")
+                return state
+            print(f"[{dest_region}] Resuming {state['ami_id']} at '{state['stage']}'")
+
+        # Check if copy exists
+        if state['stage'] == STAGE_DISCOVER:
+            existing = index.lookup(src_ami, src_region)
+
+            if existing:
+                print(f"[{dest_region}] Found existing copy: {existing['ImageId']}")
+                state['image'] = existing
+                available = existing.get('State', 'available') == 'available'
+                checkpoint(
+                    state, cache, src_ami, flavor,
+                    stage       = STAGE_PUBLISH_AMI if available else STAGE_WAIT,
+                    ami_id      = existing['ImageId'],
+                    available   = available,
+                    ami_public  = existing.get('Public', False)
+                )
+            else:
+                state['stage'] = STAGE_COPY
+
+        # Copy
+        if state['stage'] == STAGE_COPY:
+            print(f"[{dest_region}] Copying {src_ami}...")
+            response = ec2.copy_image(
+                Description=discovery.copy_description(src_ami, src_region),
+                Name=image_name,
+                SourceImageId=src_ami,
+                SourceRegion=src_region,
+                # Throttle retries resend the call, so it has to be idempotent
+                ClientToken=discovery.copy_token(src_ami, dest_region, image_name)
+            )
+            checkpoint(state, cache, src_ami, flavor, stage=STAGE_WAIT, ami_id=response['ImageId'], copied=True)
+
+    except Exception as e:
+        fail(state, e)
+
+    return state
+
+def publish_region(publisher, state, src_ami, cache=None, flavor=None):
+    """
+    Runs the last half of a region's pipeline once its image is available:
+    publish AMI -> publish snapshots. Updates and returns state.
+    """
+    region = state['region']
+    try:
+        # Reuse the image fetched by discovery or polling; resumed regions need one describe
+        image = state.pop('image', None) or publisher.describe_image(region, state['ami_id'])
+
+        if state['stage'] == STAGE_PUBLISH_AMI:
+            if publisher.publish_image(region, state['ami_id'], image):
+                print(f"[{region}] Made AMI {state['ami_id']} public")
+            checkpoint(state, cache, src_ami, flavor, stage=STAGE_PUBLISH_SNAPSHOTS, ami_public=True)
+
+        if state['stage'] == STAGE_PUBLISH_SNAPSHOTS:
+            changed = publisher.publish_snapshots(region, state['ami_id'], image)
+            if changed:
+                print(f"[{region}] Made snapshot(s) public: {', '.join(changed)}")
+            checkpoint(state, cache, src_ami, flavor, stage=STAGE_DONE, snapshots_public=True)
+
+    except Exception as e:
+        fail(state, e)
+
+    return state
+
+def new_job(src_ami, src_region, flavor, image_name):
+    """
+    One source AMI to distribute. A batch run is a list of these.
+    """
+    return {
+        'src_ami': src_ami,
+        'src_region': src_region,
+        'flavor': flavor,
+        'image_name': image_name,
+    }
+
+def distribute_batch(
+        clients,
+        jobs,
+        dest_regions,
+        max_workers     = DEFAULT_MAX_WORKERS,
+        cache           = None,
+        clock           = None,
+        poll_config     = None
+    ):
+    """
+    Distributes several source AMIs (see new_job) to every destination region in one pass.
+
+    Each destination region is searched once for copies of all sources. Discovery,
+    copies and publishing for every (job, region) pair share a pool of at most
+    max_workers threads; permission changes fan out on a publish.Publisher of the same size. Waiting is done by a single scheduler.PollScheduler, which
+    hands each region back to the pool for publishing as soon as its image is available.
+
+    Args:
+        clients:        a clients.ClientPool (or anything with get(region) -> EC2 client)
+        cache:          a state.StateCache; lets a rerun skip regions that are already done
+        clock:          passed to the scheduler; a scheduler.SimulatedClock makes waits instant
+        poll_config:    extra keyword arguments for the scheduler (initial_delay, max_delay, ...)
+
+    Returns:
+        list: one (region_map, states) tuple per job, in job order
+            region_map - { region: { "AMI": id } } ordered as the job's source region then dest_regions,
+                         regardless of the order in which regions finished. Failed regions are omitted.
+            states     - list of per-region state dicts in the same order.
+    """
+    # De-duplicate while keeping the caller's order, so the output maps are deterministic
+    regions = list(dict.fromkeys(dest_regions))
+    tasks   = [
+        (job, region)
+        for job in jobs
+        for region in regions
+        if region != job['src_region']
+    ]
+
+    # One index per region answers for every source in the batch
+    sources = [(job['src_ami'], job['src_region']) for job in jobs]
+    indexes = {}
+    indexes_lock = threading.Lock()
+
+    def get_index(region):
+        with indexes_lock:
+            if region not in indexes:
+                indexes[region] = discovery.CopyIndex(clients.get(region), sources)
+            return indexes[region]
+
+    states  = {}
+    # { (region, ami_id): [(job, state), ...] } - two jobs can share one copy
+    waiting = {}
+    waiting_lock = threading.Lock()
+    # Tracer times: { (id(job), region): started } and { (region, ami_id): wait started }
+    started_at      = {}
+    wait_started_at = {}
+
+    def finish_region(job, state):
+        instrumentation.record_span(
+            state['region'], started_at[(id(job), state['region'])], instrumentation.now(), 'region',
+            src_ami=job['src_ami'], flavor=job['flavor'], result=state['stage']
+        )
+
+    if tasks:
+        workers = max(1, min(max_workers, len(tasks)))
+        print(f"Distributing {len(jobs)} AMI(s) to {len(regions)} region(s) with {workers} worker(s)...")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+
+            def hand_off(job, state):
+                if state['stage'] == STAGE_WAIT:
+                    print(f"[{state['region']}] Waiting for {state['ami_id']}...")
+                    with waiting_lock:
+                        waiting.setdefault((state['region'], state['ami_id']), []).append((job, state))
+                        wait_started_at.setdefault((state['region'], state['ami_id']), instrumentation.now())
+                    poller.add(state['region'], state['ami_id'])
+                elif state['stage'] in (STAGE_PUBLISH_AMI, STAGE_PUBLISH_SNAPSHOTS):
+                    pool.submit(publish_task, job, state)
+                else:
+                    finish_region(job, state)
+
+            def prepare(job, region):
+                started_at[(id(job), region)] = instrumentation.now()
+                with instrumentation.span(f"{region} prepare", 'region_stage', src_ami=job['src_ami']):
+                    state = prepare_region(
+                        clients.get(region),
+                        get_index(region),
+                        region,
+                        job['src_ami'],
+                        job['src_region'],
+                        job['image_name'],
+                        cache,
+                        job['flavor']
+                    )
+                states[(id(job), region)] = state
+                hand_off(job, state)
+
+            def publish_task(job, state):
+                with instrumentation.span(f"{state['region']} publish", 'region_stage', src_ami=job['src_ami']):
+                    publish_region(publisher, state, job['src_ami'], cache, job['flavor'])
+                finish_region(job, state)
+
+            def record_wait(region, ami_id, result):
+                with waiting_lock:
+                    wait_start = wait_started_at.pop((region, ami_id), None)
+                if wait_start is not None:
+                    instrumentation.record_span(f"{region} wait", wait_start, instrumentation.now(), 'region_stage',
+                                                ami_id=ami_id, result=result)
+
+            def on_ready(region, ami_id, image):
+                print(f"[{region}] AMI {ami_id} is available.")
+                record_wait(region, ami_id, 'available')
+                with waiting_lock:
+                    waiters = waiting.pop((region, ami_id), [])
+                for job, state in waiters:
+                    state['image'] = image
+                    checkpoint(
+                        state, cache, job['src_ami'], job['flavor'],
+                        stage           = STAGE_PUBLISH_AMI,
+                        available       = True,
+                        copy_duration   = poller.metrics[region][ami_id]['duration']
+                    )
+                    hand_off(job, state)
+
+            def on_failed(region, ami_id, reason):
+                record_wait(region, ami_id, poller.metrics[region][ami_id]['result'])
+                with waiting_lock:
+                    waiters = waiting.pop((region, ami_id), [])
+                for job, state in waiters:
+                    # A failed copy can never become available; forget it so a rerun copies again
+                    if cache and poller.metrics[region][ami_id]['result'] == 'failed':
+                        cache.invalidate(job['src_ami'], region, job['flavor'])
+                    fail(state, f"{ami_id} {reason}")
+                    finish_region(job, state)
+
+            poller = scheduler.PollScheduler(clients, on_ready, on_failed, clock=clock, **(poll_config or {}))
+            publisher = publish.Publisher(clients, max_concurrency=max_workers)
+
+            futures = [pool.submit(prepare, job, region) for job, region in tasks]
+            for f in futures:
+                # So the scheduler notices the last producer finishing without waiting out its idle timeout
+                f.add_done_callback(lambda _: poller.wake())
+            poller.run(producers_done=lambda: all(f.done() for f in futures))
+
+            # Surface unexpected errors raised outside a region's own error handling
+            for f in futures:
+                f.result()
+
+        # Only after the pool has drained, since publishing tasks use the publisher
+        publisher.close()
+
+        poller.report()
+        publisher.report()
+
+    results = []
+    for job in jobs:
+        job_states = [
+            states[(id(job), region)]
+            for region in regions
+            if region != job['src_region']
+        ]
+        region_map = {job['src_region']: {"AMI": job['src_ami']}}
+        for state in job_states:
+            if state['stage'] == STAGE_DONE:
+                region_map[state['region']] = {"AMI": state['ami_id']}
+        results.append((region_map, job_states))
+
+    return results
+
+def distribute(
+        clients,
+        src_ami,
+        src_region,
+        dest_regions,
+        image_name,
+        max_workers     = DEFAULT_MAX_WORKERS,
+        cache           = None,
+        flavor          = None,
+        clock           = None,
+        poll_config     = None
+    ):
+    """
+    Distributes a single src_ami to every destination region. See distribute_batch.
+
+    Returns:
+        tuple: (region_map, states)
+    """
+    return distribute_batch(
+        clients         = clients,
+        jobs            = [new_job(src_ami, src_region, flavor, image_name)],
+        dest_regions    = dest_regions,
+        max_workers     = max_workers,
+        cache           = cache,
+        clock           = clock,
+        poll_config     = poll_config
+    )[0]
+
+def unique_image_name(version, flavor):
+    """
+    Name shared by every copy made in this run. Timestamped to prevent collisions with earlier runs.
+    """
+    return f"{version}-{flavor}-{int(time.time())}"
@@ -0,0 +1,262 @@
+import random
+import fnmatch
+import itertools
+import threading
+from collections import Counter
+import scheduler
+from aws_errors import FakeClientError
+
+# Largest page DescribeImages returns, whatever MaxResults asks for
+DEFAULT_MAX_PAGE_SIZE = 1000
+
+class FakeAWS:
+    """
+    In-process stand-in for EC2 across regions, for benchmarks and offline runs of the
+    distribution engine. client(region) can be used as a clients.ClientPool factory.
+
+    Copies become available copy_latency seconds (plus up to copy_jitter) after
+    copy_image, measured on clock. Every API call takes call_latency seconds.
+    Failures can be injected:
+      - throttle_rate:        chance of any call failing with RequestLimitExceeded
+      - copy_failure_rate:    chance of a copy ending up 'failed' instead of available
+      - fail_copy_regions:    regions where copy_image itself is refused
+      - visibility_delay:     seconds a new copy is unknown to DescribeImages by ID
+
+    Calls and the time spent in them are counted per (region, operation).
+    """
+
+    def __init__(
+            self,
+            clock               = None,
+            copy_latency        = 300,
+            copy_jitter         = 0,
+            call_latency        = 0,
+            max_page_size       = DEFAULT_MAX_PAGE_SIZE,
+            throttle_rate       = 0.0,
+            copy_failure_rate   = 0.0,
+            fail_copy_regions   = (),
+            visibility_delay    = 0,
+            snapshots_per_image = 1,
+            rng                 = None
+        ):
+        """
+        Args:
+            copy_latency:   seconds, or { region: seconds } with a 'default' key for the rest
+            clock:          object with now() and sleep(seconds). Defaults to scheduler.SystemClock.
+            rng:            random.Random driving jitter and failure injection, for reproducible runs
+        """
+        self.clock              = clock or scheduler.SystemClock()
+        self.copy_latency       = copy_latency
+        self.copy_jitter        = copy_jitter
+        self.call_latency       = call_latency
+        self.max_page_size      = max_page_size
+        self.throttle_rate      = throttle_rate
+        self.copy_failure_rate  = copy_failure_rate
+        self.fail_copy_regions  = set(fail_copy_regions)
+        self.visibility_delay   = visibility_delay
+        self.snapshots_per_image = snapshots_per_image
+        self.rng                = rng or random.Random()
+
+        self.calls      = Counter()  # { (region, operation): count }
+        self.call_time  = Counter()  # { (region, operation): seconds spent inside calls }
+        self.throttled  = Counter()  # { (region, operation): injected throttling errors }
+        # { (region, ami_id): seconds from a copy becoming available to it being made public }
+        self.publish_lag = {}
+
+        # { region: { ami_id: image } }; images carry private '_'-prefixed bookkeeping keys
+        self._images        = {}
+        # { region: { snapshot_id: public } }
+        self._snapshots     = {}
+        # { (region, ClientToken): ami_id } of copies made with a token
+        self._copy_tokens   = {}
+        self._ids           = itertools.count(1)
+        self._lock          = threading.RLock()
+
+    def client(self, region):
+        return FakeEC2(self, region)
+
+    def add_image(self, region, description='', name=None, state='available', public=False, ready_at=None):
+        """
+        Registers an image directly, e.g. the source AMI, an existing copy, or unrelated
+        images that discovery has to page through.
+
+        Returns:
+            str: the new image ID
+        """
+        with self._lock:
+            ami_id = f"ami-{next(self._ids):017x}"
+            snapshots = [f"snap-{next(self._ids):017x}" for _ in range(self.snapshots_per_image)]
+            for snap_id in snapshots:
+                self._snapshots.setdefault(region, {})[snap_id] = public
+            self._images.setdefault(region, {})[ami_id] = {
+                'ImageId': ami_id,
+                'Name': name or ami_id,
+                'Description': description,
+                'Public': public,
+                'BlockDeviceMappings': [
+                    {'DeviceName': f"/dev/sd{chr(ord('a') + i)}", 'Ebs': {'SnapshotId': snap_id}}
+                    for i, snap_id in enumerate(snapshots)
+                ],
+                '_state': state,
+                '_created_at': self.clock.now(),
+                '_ready_at': ready_at,
+            }
+            return ami_id
+
+    def image(self, region, ami_id):
+        """
+        Current describe_images view of one image, or None. Does not count as an API call.
+        """
+        with self._lock:
+            image = self._images.get(region, {}).get(ami_id)
+            return self._describe(image) if image else None
+
+    def report(self):
+        """
+        Prints API calls and time spent in them per region and operation.
+        """
+        print(f"Fake EC2: {sum(self.calls.values())} call(s), {sum(self.throttled.values())} throttled")
+        for region, operation in sorted(self.calls):
+            key = (region, operation)
+            print(f"   {region:<16} {operation:<28} {self.calls[key]:>5} call(s) {self.call_time[key]:8.1f}s"
+                  + (f"  {self.throttled[key]} throttled" if self.throttled[key] else ""))
+
+    # --- internals used by FakeEC2 ---
+
+    def _call(self, region, operation, handler, **kwargs):
+        key = (region, operation)
+        start = self.clock.now()
+        if self.call_latency:
+            self.clock.sleep(self.call_latency)
+        try:
+            with self._lock:
+                self.calls[key] += 1
+                throttled = self.throttle_rate and self.rng.random() < self.throttle_rate
+                if throttled:
+                    self.throttled[key] += 1
+            if throttled:
+                raise FakeClientError('RequestLimitExceeded', 'Request limit exceeded.', operation)
+            with self._lock:
+                return handler(region, **kwargs)
+        finally:
+            with self._lock:
+                self.call_time[key] += self.clock.now() - start
+
+    def _latency(self, region):
+        latency = self.copy_latency
+        if isinstance(latency, dict):
+            latency = latency.get(region, latency.get('default', 0))
+        return latency + (self.rng.uniform(0, self.copy_jitter) if self.copy_jitter else 0)
+
+    def _state(self, image):
+        if image['_state'] == 'pending' and image['_ready_at'] is not None and self.clock.now() >= image['_ready_at']:
+            image['_state'] = image.get('_final_state', 'available')
+        return image['_state']
+
+    def _describe(self, image):
+        state = self._state(image)
+        described = {k: v for k, v in image.items() if not k.startswith('_')}
+        described['State'] = state
+        if state == 'failed':
+            described['StateReason'] = {'Code': 'Client.FakeFailure', 'Message': 'Injected copy failure'}
+        return described
+
+    def _describe_images(self, region, ImageIds=None, Owners=None, Filters=None, MaxResults=None, NextToken=None):
+        images = self._images.get(region, {})
+        now = self.clock.now()
+
+        if ImageIds is not None:
+            found = []
+            for ami_id in ImageIds:
+                image = images.get(ami_id)
+                if image is None or now - image['_created_at'] < self.visibility_delay:
+                    raise FakeClientError('InvalidAMIID.NotFound', f"The image id '[{ami_id}]' does not exist", 'DescribeImages')
+                found.append(self._describe(image))
+            return {'Images': found}
+
+        matching = [image for _, image in sorted(images.items()) if self._matches(image, Filters or [])]
+        start = int(NextToken or 0)
+        size = min(MaxResults or self.max_page_size, self.max_page_size)
+        page = {'Images': [self._describe(image) for image in matching[start:start + size]]}
+        if start + size < len(matching):
+            page['NextToken'] = str(start + size)
+        return page
+
+    @staticmethod
+    def _matches(image, filters):
+        fields = {'description': 'Description', 'name': 'Name'}
+        for f in filters:
+            field = fields.get(f['Name'])
+            if field is None:
+                continue
+            if not any(fnmatch.fnmatchcase(image.get(field, ''), pattern) for pattern in f['Values']):
+                return False
+        return True
+
+    def _copy_image(self, region, SourceImageId, SourceRegion, Name, Description='', ClientToken=None):
+        # Like EC2, a repeated token returns the copy it started
+        if ClientToken and (region, ClientToken) in self._copy_tokens:
+            return {'ImageId': self._copy_tokens[(region, ClientToken)]}
+        if region in self.fail_copy_regions:
+            raise FakeClientError('UnauthorizedOperation', f"Copying into {region} is not allowed", 'CopyImage')
+        if SourceImageId not in self._images.get(SourceRegion, {}):
+            raise FakeClientError('InvalidAMIID.NotFound', f"The image id '[{SourceImageId}]' does not exist", 'CopyImage')
+
+        ami_id = self.add_image(region, description=Description, name=Name, state='pending',
+                                ready_at=self.clock.now() + self._latency(region))
+        if self.copy_failure_rate and self.rng.random() < self.copy_failure_rate:
+            self._images[region][ami_id]['_final_state'] = 'failed'
+        if ClientToken:
+            self._copy_tokens[(region, ClientToken)] = ami_id
+        return {'ImageId': ami_id}
+
+    def _modify_image_attribute(self, region, ImageId, LaunchPermission):
+        image = self._images.get(region, {}).get(ImageId)
+        if image is None:
+            raise FakeClientError('InvalidAMIID.NotFound', f"The image id '[{ImageId}]' does not exist", 'ModifyImageAttribute')
+        if self._state(image) != 'available':
+            raise FakeClientError('IncorrectState', f"Image {ImageId} is not available", 'ModifyImageAttribute')
+        image['Public'] = any(p.get('Group') == 'all' for p in LaunchPermission.get('Add', []))
+        if image['_ready_at'] is not None:
+            self.publish_lag[(region, ImageId)] = self.clock.now() - image['_ready_at']
+        return {}
+
+    def _describe_snapshots(self, region, SnapshotIds, RestorableByUserIds=None):
+        snapshots = self._snapshots.get(region, {})
+        public_only = RestorableByUserIds == ['all']
+        return {'Snapshots': [
+            {'SnapshotId': snap_id}
+            for snap_id in SnapshotIds
+            if snap_id in snapshots and (snapshots[snap_id] or not public_only)
+        ]}
+
+    def _modify_snapshot_attribute(self, region, SnapshotId, CreateVolumePermission):
+        snapshots = self._snapshots.get(region, {})
+        if SnapshotId not in snapshots:
+            raise FakeClientError('InvalidSnapshot.NotFound', f"The snapshot '{SnapshotId}' does not exist", 'ModifySnapshotAttribute')
+        snapshots[SnapshotId] = any(p.get('Group') == 'all' for p in CreateVolumePermission.get('Add', []))
+        return {}
+
+class FakeEC2:
+    """
+    EC2 client for one region of a FakeAWS. Supports the calls the distribution engine makes.
+    """
+
+    def __init__(self, aws, region):
+        self._aws       = aws
+        self._region    = region
+
+    def describe_images(self, **kwargs):
+        return self._aws._call(self._region, 'describe_images', self._aws._describe_images, **kwargs)
+
+    def copy_image(self, **kwargs):
+        return self._aws._call(self._region, 'copy_image', self._aws._copy_image, **kwargs)
+
+    def modify_image_attribute(self, **kwargs):
+        return self._aws._call(self._region, 'modify_image_attribute', self._aws._modify_image_attribute, **kwargs)
+
+    def describe_snapshots(self, **kwargs):
+        return self._aws._call(self._region, 'describe_snapshots', self._aws._describe_snapshots, **kwargs)
+
+    def modify_snapshot_attribute(self, **kwargs):
+        return self._aws._call(self._region, 'modify_snapshot_attribute', self._aws._modify_snapshot_attribute, **kwargs)
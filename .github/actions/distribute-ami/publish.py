@@ -0,0 +1,126 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+# DescribeSnapshots accepts at most this many SnapshotIds per call
+MAX_IDS_PER_CALL = 200
+
+PUBLIC = [{"Group": "all"}]
+
+def snapshot_ids(image):
+    """
+    EBS snapshot IDs backing an image, from its BlockDeviceMappings.
+    """
+    return [
+        mapping['Ebs']['SnapshotId']
+        for mapping in image.get('BlockDeviceMappings', [])
+        if 'Ebs' in mapping and 'SnapshotId' in mapping['Ebs']
+    ]
+
+class Publisher:
+    """
+    Makes AMIs and their snapshots public in every region.
+
+    The image dicts that discovery and polling already fetched are reused, so snapshot
+    IDs usually cost no extra describe call. Current permissions are checked first and
+    resources that are already public are left alone. Modify calls run concurrently;
+    give the clients a throttle.Throttle to rate limit them. Every resource touched
+    is recorded in changes.
+    """
+
+    def __init__(self, clients, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        Args:
+            clients:    a clients.ClientPool, or a { region: ec2 client } dict
+        """
+        self.clients        = clients
+        # [{ 'region', 'resource': 'image'|'snapshot', 'id', 'action': 'published'|'already public' }]
+        self.changes        = []
+
+        self._pool          = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._lock          = threading.Lock()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def describe_image(self, region, ami_id):
+        images = self.clients.get(region).describe_images(ImageIds=[ami_id])['Images']
+        return images[0] if images else None
+
+    def publish_image(self, region, ami_id, image=None):
+        """
+        Grants public launch permission on ami_id unless it already has it.
+        image is the AMI's describe_images entry, if the caller already has one.
+
+        Returns:
+            bool: True if the permission was changed
+        """
+        image = image or self.describe_image(region, ami_id)
+        if image and image.get('Public', False):
+            self._record(region, 'image', ami_id, 'already public')
+            return False
+
+        self.clients.get(region).modify_image_attribute(
+            ImageId=ami_id,
+            LaunchPermission={"Add": PUBLIC}
+        )
+        self._record(region, 'image', ami_id, 'published')
+        return True
+
+    def publish_snapshots(self, region, ami_id, image=None):
+        """
+        Grants public create-volume permission on every snapshot behind ami_id that lacks it.
+
+        Returns:
+            list: snapshot IDs whose permission was changed
+        """
+        image = image or self.describe_image(region, ami_id)
+        if not image:
+            return []
+
+        ids = snapshot_ids(image)
+        already_public = self._public_snapshots(region, ids)
+        for snap_id in already_public:
+            self._record(region, 'snapshot', snap_id, 'already public')
+
+        ec2 = self.clients.get(region)
+        to_publish = [snap_id for snap_id in ids if snap_id not in already_public]
+        futures = [
+            self._pool.submit(
+                ec2.modify_snapshot_attribute,
+                SnapshotId=snap_id,
+                CreateVolumePermission={"Add": PUBLIC}
+            )
+            for snap_id in to_publish
+        ]
+        for f in futures:
+            f.result()
+
+        for snap_id in to_publish:
+            self._record(region, 'snapshot', snap_id, 'published')
+        return to_publish
+
+    def _public_snapshots(self, region, ids):
+        """
+        Subset of ids that anyone can already create volumes from, in one call per 200 snapshots.
+        """
+        public = set()
+        ec2 = self.clients.get(region)
+        for i in range(0, len(ids), MAX_IDS_PER_CALL):
+            response = ec2.describe_snapshots(SnapshotIds=ids[i:i + MAX_IDS_PER_CALL], RestorableByUserIds=['all'])
+            public.update(s['SnapshotId'] for s in response.get('Snapshots', []))
+        return public
+
+    def _record(self, region, resource, resource_id, action):
+        with self._lock:
+            self.changes.append({'region': region, 'resource': resource, 'id': resource_id, 'action': action})
+
+    def report(self):
+        """
+        Prints every resource whose permissions were changed, and how many were already public.
+        """
+        published = [c for c in self.changes if c['action'] == 'published']
+        print(f"Published {len(published)} resource(s); {len(self.changes) - len(published)} already public.")
+        for change in sorted(published, key=lambda c: (c['region'], c['resource'], c['id'])):
+            print(f"   {change['region']:<16} {change['resource']:<9} {change['id']}")
@@ -0,0 +1,219 @@
+import threading
+# Clocks are shared with deploy-cfn's smoke tests; re-exported as scheduler.SystemClock etc.
+from clock import SystemClock, SimulatedClock
+import aws_errors
+
+# Poll timing. A region is polled after INITIAL_DELAY, then backs off by
+# BACKOFF_FACTOR up to MAX_DELAY while none of its images change state.
+DEFAULT_INITIAL_DELAY   = 15
+DEFAULT_MAX_DELAY       = 60
+DEFAULT_BACKOFF_FACTOR  = 1.5
+DEFAULT_TIMEOUT         = 1800  # Same 30 min budget as the old 45 x 40s waiter
+
+# DescribeImages accepts at most this many ImageIds per call
+MAX_IDS_PER_CALL = 100
+
+# How long the loop waits for new work while copies are still being started
+IDLE_WAIT = 0.5
+
+FAILED_STATES = ('invalid', 'deregistered', 'failed', 'error')
+
+# Marks the thread a PollScheduler loop runs on, see on_poll_thread()
+_poll_thread = threading.local()
+
+def on_poll_thread():
+    """
+    Whether the calling thread is running a PollScheduler loop. A throttle does not retry
+    calls made there, since a failed poll is simply repeated on the region's next poll.
+    """
+    return getattr(_poll_thread, 'active', False)
+
+class PollScheduler:
+    """
+    Waits for copied images in every region from a single loop.
+
+    Pending images are polled with one batched describe_images call per region.
+    As soon as an image is available on_ready(region, ami_id, image) is called, so its
+    region can be published while other regions are still copying. Every time an
+    image completes, the other regions are polled again soon, since copies started
+    together tend to finish together.
+    """
+
+    def __init__(
+            self,
+            clients,
+            on_ready,
+            on_failed,
+            clock           = None,
+            initial_delay   = DEFAULT_INITIAL_DELAY,
+            max_delay       = DEFAULT_MAX_DELAY,
+            backoff_factor  = DEFAULT_BACKOFF_FACTOR,
+            timeout         = DEFAULT_TIMEOUT
+        ):
+        """
+        Args:
+            clients:    a clients.ClientPool, or a { region: ec2 client } dict
+            on_ready:   callback(region, ami_id, image), called from the scheduler loop with the
+                        describe_images entry of the now available image
+            on_failed:  callback(region, ami_id, reason), called from the scheduler loop when the
+                        image fails or times out; metrics[region][ami_id]['result'] tells which
+            clock:      object with now() and sleep(seconds). Defaults to SystemClock.
+        """
+        self.clients        = clients
+        self.on_ready       = on_ready
+        self.on_failed      = on_failed
+        self.clock          = clock or SystemClock()
+        self.initial_delay  = initial_delay
+        self.max_delay      = max_delay
+        self.backoff_factor = backoff_factor
+        self.timeout        = timeout
+
+        # { region: { ami_id: started_at } }
+        self._pending   = {}
+        # { region: { 'delay': float, 'due': float } }
+        self._schedule  = {}
+        # { region: { ami_id: { 'started_at', 'ready_at', 'duration', 'polls', 'result' } } }
+        # result is one of 'pending', 'available', 'failed', 'timeout'
+        self.metrics    = {}
+
+        self._lock      = threading.Lock()
+        self._wake      = threading.Event()
+
+    def add(self, region, ami_id):
+        """
+        Starts waiting for ami_id in region. Safe to call from any thread, including while run() is looping.
+        """
+        now = self.clock.now()
+        with self._lock:
+            self._pending.setdefault(region, {})[ami_id] = now
+            self.metrics.setdefault(region, {})[ami_id] = {
+                'started_at': now,
+                'ready_at': None,
+                'duration': None,
+                'polls': 0,
+                'result': 'pending',
+            }
+            if region not in self._schedule:
+                self._schedule[region] = {'delay': self.initial_delay, 'due': now + self.initial_delay}
+        self._wake.set()
+
+    def wake(self):
+        """
+        Makes an idle run() loop check producers_done() again straight away, e.g. when a producer finishes.
+        """
+        self._wake.set()
+
+    def run(self, producers_done=lambda: True):
+        """
+        Polls until nothing is pending and producers_done() returns True,
+        i.e. no more images will be added.
+        """
+        _poll_thread.active = True
+        try:
+            self._run(producers_done)
+        finally:
+            _poll_thread.active = False
+
+    def _run(self, producers_done):
+        while True:
+            with self._lock:
+                idle = not self._pending
+
+            if idle:
+                if producers_done():
+                    return
+                # Wait for a producer to add work, without advancing a simulated clock
+                self._wake.wait(IDLE_WAIT)
+                self._wake.clear()
+                continue
+
+            now = self.clock.now()
+            with self._lock:
+                due_regions = [r for r, s in self._schedule.items() if s['due'] <= now]
+                next_due    = min(s['due'] for s in self._schedule.values())
+
+            if not due_regions:
+                self.clock.sleep(next_due - now)
+                continue
+
+            for region in due_regions:
+                self._poll_region(region)
+
+    def _poll_region(self, region):
+        with self._lock:
+            ami_ids = list(self._pending.get(region, {}))
+
+        ready, failed = [], []
+        for i in range(0, len(ami_ids), MAX_IDS_PER_CALL):
+            batch = ami_ids[i:i + MAX_IDS_PER_CALL]
+            try:
+                images = self.clients.get(region).describe_images(ImageIds=batch)['Images']
+            except Exception as e:
+                # New copies can briefly be unknown to DescribeImages; either way, try again next poll
+                if aws_errors.error_code(e) != 'InvalidAMIID.NotFound':
+                    print(f"[{region}] Polling failed, will retry: {e}")
+                images = []
+
+            for image in images:
+                image_state = image.get('State')
+                if image_state == 'available':
+                    ready.append(image)
+                elif image_state in FAILED_STATES:
+                    reason = image.get('StateReason', {}).get('Message', image_state)
+                    failed.append((image['ImageId'], reason))
+
+        now = self.clock.now()
+        with self._lock:
+            for ami_id in ami_ids:
+                self.metrics[region][ami_id]['polls'] += 1
+
+            for image in ready:
+                self._finish(region, image['ImageId'], 'available', now)
+            for ami_id, _ in failed:
+                self._finish(region, ami_id, 'failed', now)
+
+            for ami_id, started_at in list(self._pending.get(region, {}).items()):
+                if now - started_at > self.timeout:
+                    self._finish(region, ami_id, 'timeout', now)
+                    failed.append((ami_id, f"timed out after {int(now - started_at)}s"))
+
+            schedule = self._schedule.get(region)
+            if schedule:
+                if ready or failed:
+                    schedule['delay'] = self.initial_delay
+                else:
+                    schedule['delay'] = min(schedule['delay'] * self.backoff_factor, self.max_delay)
+                schedule['due'] = now + schedule['delay']
+
+            # Something just finished: pull the other regions' next poll forward
+            if ready:
+                for other, other_schedule in self._schedule.items():
+                    if other != region:
+                        other_schedule['due'] = min(other_schedule['due'], now + self.initial_delay)
+
+        # Callbacks run outside the lock so they may add() more work
+        for image in ready:
+            self.on_ready(region, image['ImageId'], image)
+        for ami_id, reason in failed:
+            self.on_failed(region, ami_id, reason)
+
+    def _finish(self, region, ami_id, result, now):
+        metric = self.metrics[region][ami_id]
+        metric['ready_at']  = now
+        metric['duration']  = now - metric['started_at']
+        metric['result']    = result
+
+        del self._pending[region][ami_id]
+        if not self._pending[region]:
+            del self._pending[region]
+            del self._schedule[region]
+
+    def report(self):
+        """
+        Prints per-region copy durations.
+        """
+        print("Copy durations:")
+        for region in sorted(self.metrics):
+            for ami_id, metric in self.metrics[region].items():
+                duration = f"{metric['duration']:.0f}s" if metric['duration'] is not None else '-'
+                print(f"   {region:<16} {ami_id:<24} {metric['result']:<10} {duration:>8}  ({metric['polls']} polls)")
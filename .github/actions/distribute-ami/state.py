@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import threading
+
+STATE_FILE_VERSION = 1
+
+# Per-region fields that are persisted between runs
+PERSISTED_FIELDS = ('stage', 'ami_id', 'copied', 'available', 'ami_public', 'snapshots_public')
+
+class StateCache:
+    """
+    Durable record of distribution progress, keyed by source AMI, region and flavor.
+
+    Every update is flushed to disk straight away (temp file + rename), so a job
+    that dies half way leaves behind an accurate picture of what was finished.
+    With no path the cache lives in memory only.
+    """
+
+    def __init__(self, path=None, ttl=None):
+        """
+        Args:
+            path:   JSON state file. Created on first update if missing.
+            ttl:    Seconds a record is trusted for. Older records must be revalidated
+                    against EC2 before use. None trusts records forever.
+        """
+        self.path       = path
+        self.ttl        = ttl
+        self._lock      = threading.Lock()
+        self._records   = self._load()
+
+    @staticmethod
+    def key(src_ami, region, flavor):
+        return f"{src_ami}|{region}|{flavor}"
+
+    def get(self, src_ami, region, flavor):
+        """
+        Returns a copy of the stored record, or None.
+        """
+        with self._lock:
+            record = self._records.get(self.key(src_ami, region, flavor))
+            return dict(record) if record else None
+
+    def update(self, src_ami, region, flavor, fields):
+        """
+        Stores the persisted subset of fields for one region and flushes the file.
+        """
+        with self._lock:
+            record = self._records.setdefault(self.key(src_ami, region, flavor), {})
+            record.update({k: fields[k] for k in PERSISTED_FIELDS if k in fields})
+            record['updated_at'] = time.time()
+            self._save()
+
+    def is_fresh(self, record):
+        if self.ttl is None:
+            return True
+        return time.time() - record.get('updated_at', 0) <= self.ttl
+
+    def invalidate(self, src_ami=None, region=None, flavor=None):
+        """
+        Drops every record matching the given fields. Fields left as None match anything.
+
+        Returns:
+            int: number of records removed
+        """
+        wanted = (src_ami, region, flavor)
+        with self._lock:
+            matches = [
+                key for key in self._records
+                if all(w is None or w == part for w, part in zip(wanted, key.split('|')))
+            ]
+            for key in matches:
+                del self._records[key]
+            if matches:
+                self._save()
+        return len(matches)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"::warning::Ignoring unreadable state file {self.path}: {e}")
+            return {}
+
+        if data.get('version') != STATE_FILE_VERSION:
+            print(f"::warning::Ignoring state file {self.path} with unsupported version {data.get('version')}")
+            return {}
+
+        return data.get('records', {})
+
+    def _save(self):
+        if not self.path:
+            return
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_FILE_VERSION, 'records': self._records}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
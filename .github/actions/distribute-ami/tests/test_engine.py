@@ -0,0 +1,158 @@
+import random
+import pytest
+import clients
+import discovery
+import engine
+import fake_ec2
+import publish
+import scheduler
+import state
+import throttle
+
+SRC_REGION  = 'us-east-1'
+REGIONS     = ['eu-west-1', 'ap-south-1']
+
+@pytest.fixture
+def aws():
+    return fake_ec2.FakeAWS(clock=scheduler.SimulatedClock(), copy_latency=300, rng=random.Random(0))
+
+def distribute(aws, src_ami, cache=None, regions=REGIONS):
+    return engine.distribute(
+        clients         = clients.ClientPool(factory=aws.client),
+        src_ami         = src_ami,
+        src_region      = SRC_REGION,
+        dest_regions    = regions,
+        image_name      = 'R2025a-linux',
+        cache           = cache,
+        flavor          = 'linux',
+        clock           = aws.clock
+    )
+
+def is_public(aws, region, ami_id):
+    image = aws.image(region, ami_id)
+    snapshots = publish.snapshot_ids(image)
+    public = aws.client(region).describe_snapshots(SnapshotIds=snapshots, RestorableByUserIds=['all'])['Snapshots']
+    return image['Public'] and len(public) == len(snapshots)
+
+def test_copies_and_publishes_every_region(aws):
+    src_ami = aws.add_image(SRC_REGION)
+    region_map, states = distribute(aws, src_ami)
+
+    assert list(region_map) == [SRC_REGION] + REGIONS
+    assert region_map[SRC_REGION] == {'AMI': src_ami}
+    for s in states:
+        assert s['stage'] == engine.STAGE_DONE
+        assert s['copied']
+        assert is_public(aws, s['region'], s['ami_id'])
+
+def test_existing_copy_is_reused(aws):
+    src_ami = aws.add_image(SRC_REGION)
+    existing = aws.add_image('eu-west-1', description=discovery.copy_description(src_ami, SRC_REGION))
+    region_map, states = distribute(aws, src_ami)
+
+    assert region_map['eu-west-1'] == {'AMI': existing}
+    assert not states[0]['copied']
+    assert aws.calls[('eu-west-1', 'copy_image')] == 0
+    assert aws.calls[('ap-south-1', 'copy_image')] == 1
+
+def test_prepare_region_copies_then_waits(aws):
+    src_ami = aws.add_image(SRC_REGION)
+    ec2 = aws.client('eu-west-1')
+    index = discovery.CopyIndex(ec2, [(src_ami, SRC_REGION)])
+
+    prepared = engine.prepare_region(ec2, index, 'eu-west-1', src_ami, SRC_REGION, 'R2025a-linux')
+    assert prepared['stage'] == engine.STAGE_WAIT
+    assert prepared['copied']
+    assert aws.image('eu-west-1', prepared['ami_id'])['State'] == 'pending'
+
+def test_publish_region_publishes_image_and_snapshots(aws):
+    ami_id = aws.add_image('eu-west-1')
+    region_state = engine.new_region_state('eu-west-1')
+    region_state.update(stage=engine.STAGE_PUBLISH_AMI, ami_id=ami_id, available=True)
+
+    publisher = publish.Publisher(clients.ClientPool(factory=aws.client))
+    try:
+        published = engine.publish_region(publisher, region_state, 'ami-source')
+    finally:
+        publisher.close()
+
+    assert published['stage'] == engine.STAGE_DONE
+    assert is_public(aws, 'eu-west-1', ami_id)
+
+def test_failed_copy_is_reported_and_left_out(aws):
+    aws.fail_copy_regions = {'ap-south-1'}
+    src_ami = aws.add_image(SRC_REGION)
+    region_map, states = distribute(aws, src_ami)
+
+    assert 'ap-south-1' not in region_map
+    failed = states[1]
+    assert failed['stage'] == engine.STAGE_FAILED
+    assert failed['error'].startswith('copy: ')
+    assert states[0]['stage'] == engine.STAGE_DONE
+
+def test_rerun_resumes_from_state_cache(aws, tmp_path):
+    path = str(tmp_path / 'state.json')
+    src_ami = aws.add_image(SRC_REGION)
+    first_map, _ = distribute(aws, src_ami, cache=state.StateCache(path))
+    calls = sum(aws.calls.values())
+
+    second_map, states = distribute(aws, src_ami, cache=state.StateCache(path))
+    assert second_map == first_map
+    assert all(s['stage'] == engine.STAGE_DONE for s in states)
+    assert sum(aws.calls.values()) == calls
+
+def test_interrupted_region_resumes_at_its_stage(aws):
+    src_ami = aws.add_image(SRC_REGION)
+    # Copied and available, but stopped before publishing; not findable by discovery
+    ami_id = aws.add_image('eu-west-1')
+    cache = state.StateCache()
+    cache.update(src_ami, 'eu-west-1', 'linux', {
+        'stage': engine.STAGE_PUBLISH_AMI, 'ami_id': ami_id, 'copied': True, 'available': True,
+    })
+
+    region_map, states = distribute(aws, src_ami, cache=cache, regions=['eu-west-1'])
+    assert region_map['eu-west-1'] == {'AMI': ami_id}
+    assert aws.calls[('eu-west-1', 'copy_image')] == 0
+    assert is_public(aws, 'eu-west-1', ami_id)
+    assert cache.get(src_ami, 'eu-west-1', 'linux')['stage'] == engine.STAGE_DONE
+
+def test_stale_record_of_a_missing_image_starts_over(aws):
+    src_ami = aws.add_image(SRC_REGION)
+    # A negative ttl makes every record stale
+    cache = state.StateCache(ttl=-1)
+    cache.update(src_ami, 'eu-west-1', 'linux', {'stage': engine.STAGE_DONE, 'ami_id': 'ami-gone'})
+
+    region_map, states = distribute(aws, src_ami, cache=cache, regions=['eu-west-1'])
+    assert states[0]['stage'] == engine.STAGE_DONE
+    assert region_map['eu-west-1']['AMI'] != 'ami-gone'
+    assert aws.calls[('eu-west-1', 'copy_image')] == 1
+
+def test_retried_copy_does_not_copy_twice(aws):
+    src_ami = aws.add_image(SRC_REGION)
+    lost = []
+
+    def factory(region):
+        ec2 = aws.client(region)
+        copy_image = ec2.copy_image
+
+        def lose_first_response(**kwargs):
+            response = copy_image(**kwargs)
+            if not lost:
+                lost.append(response['ImageId'])
+                raise ConnectionError('Connection reset by peer')
+            return response
+        ec2.copy_image = lose_first_response
+        return ec2
+
+    api_throttle = throttle.Throttle(clock=aws.clock, rng=random.Random(0))
+    region_map, _ = engine.distribute(
+        clients         = clients.ClientPool(factory=factory, throttle=api_throttle),
+        src_ami         = src_ami,
+        src_region      = SRC_REGION,
+        dest_regions    = ['eu-west-1'],
+        image_name      = 'R2025a-linux',
+        clock           = aws.clock
+    )
+
+    assert region_map['eu-west-1'] == {'AMI': lost[0]}
+    assert len(aws.client('eu-west-1').describe_images()['Images']) == 1
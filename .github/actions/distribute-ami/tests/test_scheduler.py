@@ -0,0 +1,70 @@
+import random
+import fake_ec2
+import scheduler
+
+REGION = 'eu-west-1'
+
+def make_scheduler(aws, **kwargs):
+    events = {'ready': [], 'failed': []}
+    poller = scheduler.PollScheduler(
+        {REGION: aws.client(REGION)},
+        on_ready    = lambda region, ami_id, image: events['ready'].append(ami_id),
+        on_failed   = lambda region, ami_id, reason: events['failed'].append((ami_id, reason)),
+        clock       = aws.clock,
+        **kwargs
+    )
+    return poller, events
+
+def copy(aws):
+    src_ami = aws.add_image('us-east-1')
+    return aws.client(REGION).copy_image(SourceImageId=src_ami, SourceRegion='us-east-1', Name='copy')['ImageId']
+
+def test_polls_back_off_until_available():
+    aws = fake_ec2.FakeAWS(clock=scheduler.SimulatedClock(), copy_latency=100)
+    ami_id = copy(aws)
+    poller, events = make_scheduler(aws, initial_delay=10, max_delay=40, backoff_factor=2)
+
+    poller.add(REGION, ami_id)
+    poller.run()
+
+    # Polled at 10, 30, 70 and 110s: the delay doubles up to max_delay
+    metric = poller.metrics[REGION][ami_id]
+    assert events['ready'] == [ami_id]
+    assert metric['result'] == 'available'
+    assert metric['polls'] == 4
+    assert metric['duration'] == 110
+
+def test_failed_copy_is_reported():
+    aws = fake_ec2.FakeAWS(clock=scheduler.SimulatedClock(), copy_latency=100, copy_failure_rate=1.0,
+                           rng=random.Random(0))
+    ami_id = copy(aws)
+    poller, events = make_scheduler(aws, initial_delay=10)
+
+    poller.add(REGION, ami_id)
+    poller.run()
+
+    assert events['ready'] == []
+    assert events['failed'] == [(ami_id, 'Injected copy failure')]
+    assert poller.metrics[REGION][ami_id]['result'] == 'failed'
+
+def test_copy_times_out():
+    aws = fake_ec2.FakeAWS(clock=scheduler.SimulatedClock())
+    ami_id = aws.add_image(REGION, state='pending')
+    poller, events = make_scheduler(aws, initial_delay=10, max_delay=10, timeout=50)
+
+    poller.add(REGION, ami_id)
+    poller.run()
+
+    assert poller.metrics[REGION][ami_id]['result'] == 'timeout'
+    assert events['failed'][0][1].startswith('timed out after')
+
+def test_unknown_image_is_polled_again():
+    aws = fake_ec2.FakeAWS(clock=scheduler.SimulatedClock(), copy_latency=30, visibility_delay=15)
+    ami_id = copy(aws)
+    poller, events = make_scheduler(aws, initial_delay=10, max_delay=10)
+
+    poller.add(REGION, ami_id)
+    poller.run()
+
+    assert events['ready'] == [ami_id]
+    assert poller.metrics[REGION][ami_id]['polls'] == 3
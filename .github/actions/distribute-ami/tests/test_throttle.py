@@ -0,0 +1,65 @@
+import random
+import pytest
+import fake_ec2
+import scheduler
+import throttle
+
+def failing(code):
+    def call():
+        raise fake_ec2.FakeClientError(code, 'Failed', 'DescribeImages')
+    return call
+
+def make_throttle(**kwargs):
+    return throttle.Throttle(clock=scheduler.SimulatedClock(), rng=random.Random(0), **kwargs)
+
+def test_retries_stop_when_the_budget_is_spent():
+    api_throttle = make_throttle(retry_budget=3)
+
+    with pytest.raises(fake_ec2.FakeClientError):
+        api_throttle.call('eu-west-1', 'describe_images', failing('RequestLimitExceeded'))
+    assert api_throttle.retry_budget == 0
+    assert api_throttle.retries[('eu-west-1', 'describe_images')] == 3
+    assert api_throttle.throttle_events[('eu-west-1', 'describe_images')] == 4
+
+    # Later calls get no retries at all
+    with pytest.raises(fake_ec2.FakeClientError):
+        api_throttle.call('eu-west-1', 'copy_image', failing('RequestLimitExceeded'))
+    assert api_throttle.throttle_events[('eu-west-1', 'copy_image')] == 1
+    assert api_throttle.retries[('eu-west-1', 'copy_image')] == 0
+
+def test_retries_stop_at_max_attempts():
+    api_throttle = make_throttle(retry_budget=50, max_attempts=3)
+
+    with pytest.raises(fake_ec2.FakeClientError):
+        api_throttle.call('eu-west-1', 'describe_images', failing('InternalError'))
+    assert api_throttle.retries[('eu-west-1', 'describe_images')] == 2
+    assert api_throttle.retry_budget == 48
+
+def test_transient_failures_are_retried():
+    api_throttle = make_throttle()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError('Connection reset by peer')
+        return 'ok'
+
+    assert api_throttle.call('eu-west-1', 'describe_images', flaky) == 'ok'
+    assert api_throttle.retries[('eu-west-1', 'describe_images')] == 2
+
+def test_other_errors_are_not_retried():
+    api_throttle = make_throttle()
+
+    with pytest.raises(fake_ec2.FakeClientError):
+        api_throttle.call('eu-west-1', 'copy_image', failing('UnauthorizedOperation'))
+    assert sum(api_throttle.retries.values()) == 0
+    assert api_throttle.retry_budget == throttle.DEFAULT_RETRY_BUDGET
+
+def test_token_bucket_paces_calls():
+    clock = scheduler.SimulatedClock()
+    bucket = throttle.TokenBucket(rate=2.0, burst=2, clock=clock)
+
+    waits = [bucket.acquire() for _ in range(4)]
+    assert waits == [0.0, 0.0, 0.5, 0.5]
+    assert clock.now() == 1.0
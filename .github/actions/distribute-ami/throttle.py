@@ -0,0 +1,169 @@
+import random
+import threading
+from collections import Counter
+import scheduler
+import aws_errors
+
+# Steady-state calls per second and burst size for each (region, operation) bucket.
+# Conservative compared to the EC2 account limits, since several distribution jobs
+# may share one account.
+DEFAULT_RATE    = 5.0
+DEFAULT_BURST   = 10
+DEFAULT_RATES   = {
+    'describe_images': (10.0, 20),
+    'describe_snapshots': (10.0, 20),
+}
+
+# Retries shared by every call in the run. Once spent, throttling errors are raised.
+DEFAULT_RETRY_BUDGET    = 50
+DEFAULT_MAX_ATTEMPTS    = 8
+DEFAULT_BASE_DELAY      = 1.0
+DEFAULT_MAX_DELAY       = 30.0
+
+# Client attributes that are not API calls and are passed through untouched
+PASSTHROUGH = ('meta', 'exceptions', 'get_paginator', 'get_waiter', 'can_paginate', 'close')
+
+class TokenBucket:
+    def __init__(self, rate, burst, clock):
+        self.rate   = rate
+        self.burst  = burst
+        self.clock  = clock
+        self._tokens    = float(burst)
+        self._last      = clock.now()
+        self._lock      = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes one token, sleeping until one is available.
+
+        Returns:
+            float: seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock.now()
+                self._tokens    = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last      = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            self.clock.sleep(wait)
+            waited += wait
+
+class Throttle:
+    """
+    Client-side rate limiting and retries for EC2 calls.
+
+    Each (region, operation) pair has its own token bucket. Throttling and transient
+    errors (see aws_errors.is_retryable) are retried with full-jitter exponential backoff, drawing
+    on one retry budget shared by the whole run, so a throttled account cannot turn into
+    an unbounded retry storm. Throttle events are counted per (region, operation).
+
+    Calls made on a scheduler.PollScheduler's loop are not retried: the failed poll is
+    repeated on the region's next poll, and a backoff sleep there would stall every region.
+    """
+
+    def __init__(
+            self,
+            rates           = None,
+            default_rate    = DEFAULT_RATE,
+            default_burst   = DEFAULT_BURST,
+            retry_budget    = DEFAULT_RETRY_BUDGET,
+            max_attempts    = DEFAULT_MAX_ATTEMPTS,
+            base_delay      = DEFAULT_BASE_DELAY,
+            max_delay       = DEFAULT_MAX_DELAY,
+            clock           = None,
+            rng             = None
+        ):
+        """
+        Args:
+            rates:  { operation: (calls_per_second, burst) } overriding DEFAULT_RATES
+            clock:  object with now() and sleep(seconds); a scheduler.SimulatedClock makes waits instant
+            rng:    random.Random used for jitter, for reproducible tests
+        """
+        self.rates          = {**DEFAULT_RATES, **(rates or {})}
+        self.default_rate   = default_rate
+        self.default_burst  = default_burst
+        self.retry_budget   = retry_budget
+        self.max_attempts   = max_attempts
+        self.base_delay     = base_delay
+        self.max_delay      = max_delay
+        self.clock          = clock or scheduler.SystemClock()
+        self.rng            = rng or random.Random()
+
+        self.throttle_events    = Counter()  # { (region, operation): count }
+        self.retries            = Counter()  # { (region, operation): count }
+        self.wait_time          = Counter()  # { (region, operation): seconds spent waiting for a token }
+
+        self._buckets   = {}
+        self._lock      = threading.Lock()
+
+    def wrap(self, client, region):
+        return ThrottledClient(client, region, self)
+
+    def call(self, region, operation, method, **kwargs):
+        attempt = 0
+        while True:
+            waited = self._bucket(region, operation).acquire()
+            if waited:
+                with self._lock:
+                    self.wait_time[(region, operation)] += waited
+
+            try:
+                return method(**kwargs)
+            except Exception as e:
+                if not aws_errors.is_retryable(e):
+                    raise
+
+                attempt += 1
+                with self._lock:
+                    if aws_errors.is_throttling(e):
+                        self.throttle_events[(region, operation)] += 1
+                    if scheduler.on_poll_thread() or attempt >= self.max_attempts or self.retry_budget <= 0:
+                        raise
+                    self.retry_budget -= 1
+                    self.retries[(region, operation)] += 1
+
+                # Full jitter: uniform over [0, capped exponential]
+                self.clock.sleep(self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def _bucket(self, region, operation):
+        key = (region, operation)
+        with self._lock:
+            if key not in self._buckets:
+                rate, burst = self.rates.get(operation, (self.default_rate, self.default_burst))
+                self._buckets[key] = TokenBucket(rate, burst, self.clock)
+            return self._buckets[key]
+
+    def report(self):
+        """
+        Prints throttle events, retries and rate-limit waits per region and operation.
+        """
+        keys = sorted(set(self.throttle_events) | set(self.retries) | set(self.wait_time))
+        print(f"API throttling: {sum(self.throttle_events.values())} throttle event(s), "
+              f"{sum(self.retries.values())} retr(ies), {self.retry_budget} retries left in budget")
+        for region, operation in keys:
+            key = (region, operation)
+            print(f"   {region:<16} {operation:<28} throttled {self.throttle_events[key]:>3}  "
+                  f"retried {self.retries[key]:>3}  waited {self.wait_time[key]:6.1f}s")
+
+class ThrottledClient:
+    """
+    Wraps an EC2 client so every API call goes through a Throttle.
+    """
+
+    def __init__(self, client, region, throttle):
+        self._client    = client
+        self._region    = region
+        self._throttle  = throttle
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name in PASSTHROUGH or name.startswith('_') or not callable(attr):
+            return attr
+
+        def call(**kwargs):
+            return self._throttle.call(self._region, name, attr, **kwargs)
+        return call
@@ -0,0 +1,342 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from unittest import mock
+
+if __name__ == "__main__":
+    # The shared modules are only on sys.path when run through the shared CLI
+    sys.exit("Run this through the shared CLI: python .github/actions/shared/cli.py bench-release --help")
+
+import processor
+import release
+import toplevel
+import utils
+
+# Stages timed by run_stages, in order
+STAGES = ('parse_args', 'jinja_setup', 'toplevel', 'release_parse', 'release_render', 'write', 'rewrite')
+
+# A stage may be this much slower (or use this much more memory) than its baseline before it
+# counts as a regression. Disk writes on shared CI runners easily vary by a third between runs.
+DEFAULT_TOLERANCE = 0.5
+
+# Stages faster than this are too noisy to compare
+MIN_COMPARABLE_SECONDS = 0.01
+
+# Settings that change the work done; results are only comparable when these match
+FIXTURE_SETTINGS = ('releases', 'regions', 'parameters', 'policy_statements', 'workers', 'parallel_mode')
+
+RELEASE_README = """# MATLAB {{ version }} on Amazon Web Services
+
+## Supported Regions
+| Region | Launch |
+|---|---|
+{% for region in regions %}| {{ region }} | [Launch]({{ template_url }}?region={{ region }}) |
+{% endfor %}
+## Parameters
+| Parameter | Description |
+|---|---|
+{% for parameter in parameters %}| {{ parameter.label }} | {{ parameter.description }} |
+{% endfor %}"""
+
+TOPLEVEL_README = """# MATLAB on Amazon Web Services
+| Release | Other OS | Removal |
+|---|---|---|
+{% for release in releases %}| [{{ release.label }}](releases/{{ release.dir }}) | [link]({{ release.dual_url }}) | {{ release.removal_month }} {{ release.removal_year }} |
+{% endfor %}
+See also {{ dual_url }}.
+"""
+
+PERMISSION_README = """# Permissions
+## Full provisioning policy
+```json
+{{ full_provisioning_policy }}
+```
+## Restricted provisioning policy
+```json
+{{ restricted_provisioning_policy }}
+```
+## Execution policy
+```json
+{{ execution_policy }}
+```
+```json
+{{ execution_policy_trust }}
+```
+"""
+
+LICENSE_README = "Copyright (c) {{ current_year }} The MathWorks, Inc.\n"
+
+def version_names(count):
+    """
+    count distinct versions, newest first: R2025b, R2025a, R2024b, ...
+    """
+    return [f"R{2025 - i // 2}{'b' if i % 2 == 0 else 'a'}" for i in range(count)]
+
+def generate_fixture(root, releases=20, regions=30, parameters=40, policy_statements=200):
+    """
+    Writes a synthetic source tree and artifact directory under root.
+
+    Returns:
+        dict: { 'source_path', 'artifact_path', 'versions' }
+    """
+    source_path     = os.path.join(root, 'src')
+    artifact_path   = os.path.join(root, 'artifacts')
+    permissions_dir = os.path.join(source_path, 'internal', 'permissions')
+    os.makedirs(os.path.join(source_path, 'toplevel'), exist_ok=True)
+    os.makedirs(permissions_dir, exist_ok=True)
+    os.makedirs(artifact_path, exist_ok=True)
+
+    templates = {
+        'README.md': RELEASE_README,
+        os.path.join('toplevel', 'README.md'): TOPLEVEL_README,
+        os.path.join('toplevel', 'permission.md'): PERMISSION_README,
+        os.path.join('toplevel', 'LICENSE.md'): LICENSE_README,
+    }
+    for name, content in templates.items():
+        with open(os.path.join(source_path, name), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    services = ('ec2', 'iam', 's3', 'cloudformation', 'logs', 'ssm')
+    provisioning_policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Sid": f"Statement{i}",
+                "Effect": "Allow",
+                "Action": [f"{services[(i + j) % len(services)]}:Action{i}x{j}" for j in range(10)]
+                          + (toplevel.ADMIN_LEVEL_ACTIONS if i % 10 == 0 else []),
+                "Resource": "*",
+            }
+            for i in range(policy_statements)
+        ],
+    }
+    policies = {
+        'provisioning_policy': provisioning_policy,
+        'execution_policy': {
+            "Version": "2012-10-17",
+            "Statement": [{"Effect": "Allow", "Action": ["s3:GetObject", "logs:PutLogEvents"], "Resource": "*"}],
+        },
+        'execution_policy_trust': {
+            "Version": "2012-10-17",
+            "Statement": [{"Effect": "Allow", "Principal": {"Service": "ec2.amazonaws.com"}, "Action": "sts:AssumeRole"}],
+        },
+    }
+    for name, document in policies.items():
+        with open(os.path.join(permissions_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+
+    versions = version_names(releases)
+    for version in versions:
+        cf_template = {
+            "AWSTemplateFormatVersion": "2010-09-09",
+            "Parameters": {
+                f"Parameter{i}": {"Type": "String", "Description": f"Description of parameter {i} for {version}. " * 3}
+                for i in range(parameters)
+            },
+            "Mappings": {
+                "RegionMap": {f"region-{i}": {"AMI": f"ami-{i:017x}"} for i in range(regions)}
+            },
+            "Resources": {},
+        }
+        with open(os.path.join(artifact_path, f"{version}-release-template.json"), 'w', encoding='utf-8') as f:
+            json.dump(cf_template, f, indent=2)
+
+    return {'source_path': source_path, 'artifact_path': artifact_path, 'versions': versions}
+
+def run_stages(fixture, output_path, bytecode_cache_dir, workers=1, parallel_mode='thread', trace_memory=False):
+    """
+    Runs the processor pipeline one stage at a time against fixture.
+
+    Returns:
+        dict: { stage: { 'seconds': float, 'peak_bytes': int or None } }
+    """
+    results = {}
+
+    def _stage(name, fn):
+        if trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        value = fn()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        results[name] = {'seconds': seconds, 'peak_bytes': peak}
+        return value
+
+    argv = [
+        '--target-versions', json.dumps(fixture['versions']),
+        '--source-path', fixture['source_path'],
+        '--artifact-path', fixture['artifact_path'],
+        '--s3-bucket-url', 'https://example-bucket.s3.amazonaws.com',
+        '--dual-repo-url', 'https://github.com/example/dual-repo',
+        '--output-path', output_path,
+    ]
+    args = _stage('parse_args', lambda: processor.setup_args(argv))
+    versions = utils.deserialize_target_versions(args.target_versions)
+
+    def _jinja_setup():
+        env = utils.create_template_env(args.source_path, bytecode_cache_dir)
+        errors = utils.precompile_templates(env, processor.RENDERED_TEMPLATES)
+        if errors:
+            raise RuntimeError(f"Fixture templates failed to compile: {errors}")
+        return env
+    template_env = _stage('jinja_setup', _jinja_setup)
+
+    toplevel_files = _stage('toplevel', lambda: processor.process_toplevel(None, template_env, versions, args, None).result())
+
+    def _parse():
+        return {
+            version: utils.parse_template_json(os.path.join(args.artifact_path, f"{version}-release-template.json"))
+            for version in versions
+        }
+    _stage('release_parse', _parse)
+
+    def _render():
+        executor = utils.create_executor(parallel_mode, workers, args.source_path, bytecode_cache_dir)
+        # Process workers build their own environment (see utils.init_worker)
+        env = None if executor and parallel_mode == 'process' else template_env
+        try:
+            release_data, errors = release.process_files(
+                template_env                    = env,
+                target_versions                 = versions,
+                artifact_dir                    = args.artifact_path,
+                s3_bucket_url                   = args.s3_bucket_url,
+                release_readme_template_path    = processor.RELEASE_README_TEMPLATE,
+                executor                        = executor
+            )
+        finally:
+            if executor:
+                executor.shutdown()
+        if errors:
+            raise RuntimeError(f"Releases failed to render: {errors}")
+        return release_data
+    release_data = _stage('release_render', _render)
+
+    structure = processor.toplevel_structure(toplevel_files)
+    structure['releases'] = {r['version']: processor.release_files(r) for r in release_data}
+
+    # write_to_disk reports every file; keep the benchmark output readable
+    with mock.patch('builtins.print'):
+        _stage('write', lambda: utils.write_to_disk(output_path, structure))
+        _stage('rewrite', lambda: utils.write_to_disk(output_path, structure))
+
+    return results
+
+def run_benchmark(fixture, repeat=3, workers=1, parallel_mode='thread'):
+    """
+    Times each stage repeat times, keeping the fastest, then runs once more under
+    tracemalloc for memory peaks (tracing slows everything down, so it is kept out of the timings).
+    Every run writes to a fresh output directory and compiles into an empty bytecode
+    cache, so jinja_setup measures compilation rather than cache hits.
+    """
+    def _run(trace_memory):
+        output_path         = tempfile.mkdtemp(prefix='bench-output-')
+        bytecode_cache_dir  = tempfile.mkdtemp(prefix='bench-bytecode-')
+        try:
+            return run_stages(fixture, output_path, bytecode_cache_dir, workers, parallel_mode, trace_memory)
+        finally:
+            shutil.rmtree(output_path, ignore_errors=True)
+            shutil.rmtree(bytecode_cache_dir, ignore_errors=True)
+
+    timings = [_run(trace_memory=False) for _ in range(max(1, repeat))]
+
+    tracemalloc.start()
+    try:
+        memory = _run(trace_memory=True)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        stage: {
+            'seconds': min(t[stage]['seconds'] for t in timings),
+            'peak_bytes': memory[stage]['peak_bytes'],
+        }
+        for stage in STAGES
+    }
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Returns:
+        list: descriptions of stages that are slower or use more memory than baseline allows
+    """
+    regressions = []
+    for stage in STAGES:
+        current, previous = results.get(stage), baseline.get(stage)
+        if not current or not previous:
+            continue
+        if previous['seconds'] >= MIN_COMPARABLE_SECONDS and current['seconds'] > previous['seconds'] * (1 + tolerance):
+            regressions.append(f"{stage}: {current['seconds'] * 1000:.1f}ms vs baseline {previous['seconds'] * 1000:.1f}ms")
+        if previous.get('peak_bytes') and current['peak_bytes'] > previous['peak_bytes'] * (1 + tolerance):
+            regressions.append(f"{stage}: peak {current['peak_bytes'] / 1024:.0f}KiB vs baseline {previous['peak_bytes'] / 1024:.0f}KiB")
+    return regressions
+
+def report(results, baseline=None):
+    print(f"{'Stage':<16} {'Time':>10} {'Peak memory':>14}" + (f" {'Baseline':>10}" if baseline else ""))
+    for stage in STAGES:
+        result = results[stage]
+        line = f"{stage:<16} {result['seconds'] * 1000:8.1f}ms {result['peak_bytes'] / 1024:11.0f}KiB"
+        if baseline and stage in baseline:
+            line += f" {baseline[stage]['seconds'] * 1000:8.1f}ms"
+        print(line)
+
+def setup_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark processor.py stages against a synthetic fixture. Runs offline.')
+    parser.add_argument('--releases',           type=int,   default=200,    help='Number of releases in the fixture')
+    parser.add_argument('--regions',            type=int,   default=30,     help='Regions in each CloudFormation template')
+    parser.add_argument('--parameters',         type=int,   default=40,     help='Parameters in each CloudFormation template')
+    parser.add_argument('--policy-statements',  type=int,   default=200,    help='Statements in the provisioning policy')
+    parser.add_argument('--repeat',             type=int,   default=5,      help='Timed runs per stage; the fastest is kept')
+    parser.add_argument('--workers',            type=int,   default=1,      help='Render workers for the release_render stage')
+    parser.add_argument('--parallel-mode',      choices=['thread', 'process'], default='thread')
+    parser.add_argument('--fixture-dir',        required=False, help='Keep the generated fixture here instead of a temp directory')
+    parser.add_argument('--output',             required=False, help='Write results here as JSON')
+    parser.add_argument('--baseline',           required=False, help='Results JSON of an earlier run to compare against; regressions exit 1')
+    parser.add_argument('--tolerance',          type=float, default=DEFAULT_TOLERANCE, help='Allowed slowdown or memory growth over the baseline, as a fraction')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = setup_args(argv)
+
+    fixture_root = args.fixture_dir or tempfile.mkdtemp(prefix='bench-fixture-')
+    try:
+        fixture = generate_fixture(
+            fixture_root,
+            releases            = args.releases,
+            regions             = args.regions,
+            parameters          = args.parameters,
+            policy_statements   = args.policy_statements
+        )
+        results = run_benchmark(fixture, repeat=args.repeat, workers=args.workers, parallel_mode=args.parallel_mode)
+    finally:
+        if not args.fixture_dir:
+            shutil.rmtree(fixture_root, ignore_errors=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        mismatched = [k for k in FIXTURE_SETTINGS if stored['config'].get(k) != getattr(args, k)]
+        if mismatched:
+            print(f"::error::Baseline {args.baseline} was recorded with different {', '.join(mismatched)}")
+            sys.exit(1)
+        baseline = stored['stages']
+
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline', 'fixture_dir')},
+                       'stages': results}, f, indent=2)
+        print(f"Results written to: {args.output}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"::error::Performance regression in {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No stage regressed by more than {args.tolerance:.0%}.")
@@ -0,0 +1,161 @@
+import json
+import hashlib
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterable, List
+
+POLICY_VERSIONS = ('2012-10-17', '2008-10-17')
+EFFECTS         = ('Allow', 'Deny')
+STATEMENT_KEYS  = ('Sid', 'Effect', 'Principal', 'NotPrincipal', 'Action', 'NotAction', 'Resource', 'NotResource', 'Condition')
+
+# { path: { 'mtime_ns', 'size', 'sha256', 'document' } }, shared by every store in the process
+_document_cache = {}
+_cache_lock     = threading.Lock()
+
+class PermissionsError(ValueError):
+    pass
+
+class UnknownPolicyError(PermissionsError, KeyError):
+    """
+    Raised by PermissionsStore lookups, so `in` and .get() work as on any Mapping.
+    """
+
+    # KeyError would print the message quoted
+    __str__ = PermissionsError.__str__
+
+def validate_policy(document) -> List[str]:
+    """
+    Checks document against the structure of an IAM policy (identity or trust policy).
+
+    Returns:
+        list: problems found, empty if the document is valid
+    """
+    if not isinstance(document, dict):
+        return ["document is not a JSON object"]
+
+    problems = []
+    if document.get('Version') not in POLICY_VERSIONS:
+        problems.append(f"Version must be one of {', '.join(POLICY_VERSIONS)}, got {document.get('Version')!r}")
+
+    statements = document.get('Statement')
+    if isinstance(statements, dict):
+        statements = [statements]
+    if not isinstance(statements, list) or not statements:
+        return problems + ["Statement must be a statement object or a non-empty list of them"]
+
+    for i, statement in enumerate(statements):
+        where = f"Statement[{i}]"
+        if not isinstance(statement, dict):
+            problems.append(f"{where} is not a JSON object")
+            continue
+
+        unknown = [k for k in statement if k not in STATEMENT_KEYS]
+        if unknown:
+            problems.append(f"{where} has unknown key(s) {', '.join(unknown)}")
+        if statement.get('Effect') not in EFFECTS:
+            problems.append(f"{where}.Effect must be Allow or Deny, got {statement.get('Effect')!r}")
+
+        for first, second in (('Action', 'NotAction'), ('Resource', 'NotResource'), ('Principal', 'NotPrincipal')):
+            if first in statement and second in statement:
+                problems.append(f"{where} cannot have both {first} and {second}")
+        if 'Action' not in statement and 'NotAction' not in statement:
+            problems.append(f"{where} needs Action or NotAction")
+
+        for key in ('Action', 'NotAction', 'Resource', 'NotResource'):
+            value = statement.get(key)
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else value
+            if not isinstance(values, list) or not all(isinstance(v, str) and v for v in values):
+                problems.append(f"{where}.{key} must be a string or a list of non-empty strings")
+
+        if 'Condition' in statement and not isinstance(statement['Condition'], dict):
+            problems.append(f"{where}.Condition must be an object")
+
+    return problems
+
+def load_document(path: Path):
+    """
+    Parses the JSON document at path, reusing the cached parse while the file's
+    mtime and size are unchanged, or when its content hash still matches.
+    Callers share the returned object and must not modify it.
+    """
+    stat = path.stat()
+    with _cache_lock:
+        cached = _document_cache.get(path)
+    if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+        return cached['document']
+
+    data    = path.read_bytes()
+    digest  = hashlib.sha256(data).hexdigest()
+    if cached and cached['sha256'] == digest:
+        document = cached['document']
+    else:
+        try:
+            document = json.loads(data.decode('utf-8'))
+        except UnicodeDecodeError:
+            raise PermissionsError(f"{path.name} is not valid UTF-8")
+        except json.JSONDecodeError as e:
+            raise PermissionsError(f"{path.name} is not a valid JSON file. {e}")
+
+        problems = validate_policy(document)
+        if problems:
+            raise PermissionsError(f"{path.name} is not a valid IAM policy:\n   " + "\n   ".join(problems))
+
+    with _cache_lock:
+        _document_cache[path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': digest, 'document': document}
+    return document
+
+class PermissionsStore(Mapping):
+    """
+    The policy documents in a permissions directory, as { file stem: document }.
+
+    Listing the directory is cheap; a document is only read, parsed and validated
+    the first time it is looked up. Invalid or missing documents raise
+    PermissionsError naming the file and every problem found.
+    """
+
+    def __init__(self, permissions_path):
+        self.path   = Path(permissions_path)
+        self._files = {}
+        if self.path.is_dir():
+            self._files = {
+                file_path.stem: file_path
+                for file_path in sorted(self.path.iterdir())
+                if file_path.is_file() and file_path.suffix == '.json'
+            }
+
+    def __getitem__(self, name):
+        if name not in self._files:
+            raise UnknownPolicyError(
+                f"Policy '{name}' not found in {self.path} "
+                f"(available: {', '.join(self._files) or 'none'})"
+            )
+        try:
+            return load_document(self._files[name])
+        except OSError as e:
+            raise PermissionsError(f"Could not read {self._files[name]}: {e}")
+
+    def __contains__(self, name):
+        # Without reading the document, which may be invalid
+        return name in self._files
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self):
+        return len(self._files)
+
+    def require(self, names: Iterable[str]):
+        """
+        Loads and validates names up front, raising one PermissionsError that reports every failure.
+        """
+        errors = []
+        for name in names:
+            try:
+                self[name]
+            except PermissionsError as e:
+                errors.append(str(e))
+        if errors:
+            raise PermissionsError("Invalid permissions:\n" + "\n".join(errors))
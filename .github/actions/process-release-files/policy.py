@@ -0,0 +1,95 @@
+import re
+import fnmatch
+from typing import Iterable
+
+class ActionFilter:
+    """
+    Removes a set of IAM actions from policies in a single pass.
+
+    The actions are compiled once: exact names into a lowercase set, and names with
+    IAM wildcards (* and ?, e.g. 'iam:*Role*') into one case-insensitive regex.
+    IAM action names are case-insensitive, so matching always is.
+
+    apply() returns a new policy, but only the statements it changes are copied;
+    the rest are shared with the input, so neither should be mutated afterwards.
+    """
+
+    def __init__(self, actions: Iterable[str]):
+        self.actions    = list(actions)
+        self._exact     = {a.lower() for a in self.actions if not self._is_pattern(a)}
+        patterns        = [fnmatch.translate(a.lower()) for a in self.actions if self._is_pattern(a)]
+        self._pattern   = re.compile('|'.join(patterns), re.IGNORECASE) if patterns else None
+
+    @staticmethod
+    def _is_pattern(action: str) -> bool:
+        return '*' in action or '?' in action
+
+    def matches(self, action: str) -> bool:
+        if action.lower() in self._exact:
+            return True
+        return bool(self._pattern and self._pattern.match(action))
+
+    def apply(self, policy: dict) -> dict:
+        """
+        Returns policy without the filter's actions:
+          - Action: matching actions are dropped, and so is a statement left with none
+            (or that had none to begin with).
+          - NotAction on an Allow statement: the filter's actions that are not already
+            excluded are appended, so the statement stops allowing them.
+        Other statements, including Deny statements using NotAction, are kept as they are.
+        """
+        if "Statement" not in policy:
+            return policy
+
+        statements  = policy["Statement"]
+        single      = isinstance(statements, dict)
+        if single:
+            statements = [statements]
+
+        filtered_statements = []
+        changed             = False
+        for statement in statements:
+            result = self._apply_statement(statement)
+            if result is not statement:
+                changed = True
+            if result is not None:
+                filtered_statements.append(result)
+
+        if not changed:
+            return policy
+
+        policy_copy = dict(policy)
+        if single and filtered_statements:
+            policy_copy["Statement"] = filtered_statements[0]
+        else:
+            policy_copy["Statement"] = filtered_statements
+        return policy_copy
+
+    def _apply_statement(self, statement: dict):
+        """
+        Returns statement itself if unchanged, a changed copy, or None to drop it.
+        """
+        if "Action" in statement:
+            actions = statement["Action"]
+            if isinstance(actions, str):
+                return None if self.matches(actions) else statement
+            if isinstance(actions, list):
+                kept = [action for action in actions if not self.matches(action)]
+                if not kept:
+                    return None
+                if len(kept) == len(actions):
+                    return statement
+                return {**statement, "Action": kept}
+            return statement
+
+        if "NotAction" in statement and statement.get("Effect") == "Allow":
+            not_actions = statement["NotAction"]
+            if isinstance(not_actions, str):
+                not_actions = [not_actions]
+            excluded = ActionFilter(not_actions)
+            missing  = [action for action in self.actions if not excluded.matches(action)]
+            if not missing:
+                return statement
+            return {**statement, "NotAction": not_actions + missing}
+
+        return statement
@@ -1,92 +1,255 @@
 import os
+import sys
+import json
 import argparse
-import jinja2
+
+if __name__ == "__main__":
+    # The shared modules are only on sys.path when run through the shared CLI
+    sys.exit("Run this through the shared CLI: python .github/actions/shared/cli.py process-release --help")
+
+import instrumentation
 import toplevel
 import release
 import utils
-import sys
+import render_cache
+
+# Templates under --source-path that are rendered; only these (and what they include) are compiled
+RELEASE_README_TEMPLATE         = "README.md"
+TOPLEVEL_README_TEMPLATE        = os.path.join('toplevel', 'README.md')
+TOPLEVEL_PERMISSIONS_TEMPLATE   = os.path.join('toplevel', 'permission.md')
+TOPLEVEL_LICENSE_TEMPLATE       = os.path.join('toplevel', 'LICENSE.md')
+RENDERED_TEMPLATES              = (
+    RELEASE_README_TEMPLATE,
+    TOPLEVEL_README_TEMPLATE,
+    TOPLEVEL_PERMISSIONS_TEMPLATE,
+    TOPLEVEL_LICENSE_TEMPLATE,
+)
 
-def setup_args():
+def setup_args(argv=None):
     parser = argparse.ArgumentParser()
-    parser.add_argument('--target-versions',    required=True,  help='JSON string of versions')
+    parser.add_argument('--target-versions',    required=False, help='JSON string of versions')
+    parser.add_argument('--targets-file',       required=False, help='JSONL file of versions, one per line, streamed release by release; - reads stdin')
     parser.add_argument('--source-path',        required=True,  help='Path to source templates')
     parser.add_argument('--artifact-path',      required=True,  help='Path to artifacts')
     parser.add_argument('--s3-bucket-url',      required=True,  help='S3 Bucket URL')
     parser.add_argument('--dual-repo-url',      required=True,  help='Dual Repo URL')
     parser.add_argument('--output-path',        required=False, help='Destination path for generated files', default='.')
+    parser.add_argument('--change-set-file',    required=False, help='Write the added/modified/unchanged/removed file lists here as JSON')
+    parser.add_argument('--prune',              required=False, help='Delete previously generated files that are no longer produced', action='store_true')
+    parser.add_argument('--render-cache-dir',   required=False, help='Directory of rendered templates reused between runs')
+    parser.add_argument('--render-cache-mb',    required=False, help='Size in MB the render cache is pruned to after the run', type=float, default=render_cache.DEFAULT_MAX_BYTES / (1024 * 1024))
+    parser.add_argument('--bytecode-cache-dir', required=False, help='Directory compiled templates are cached in (default: Jinja\'s per-user temp directory)')
+    parser.add_argument('--trace-file',         required=False, help='Write spans and counters of the run here')
+    parser.add_argument('--trace-format',       required=False, help='Trace file format', choices=['json', 'chrome'], default='json')
+    parser.add_argument('--workers',            required=False, help='Number of parallel render workers', type=int, default=1)
+    parser.add_argument('--parallel-mode',      required=False, help='Worker pool type used when --workers > 1', choices=['thread', 'process'], default='thread')
 
-    return parser.parse_args()
+    args = parser.parse_args(argv)
 
-def main():
-    # Capture inputs
-    args = setup_args()
+    if bool(args.target_versions) == bool(args.targets_file):
+        parser.error("exactly one of --target-versions and --targets-file is required")
+
+    return args
+
+def release_files(release_result):
+    """
+    Output files of one release, as a write_to_disk structure under releases/<version>.
+    """
+    # Note: The artifact is carried as a file reference and copied into place by write_to_disk
+    # We need to decide what the output filename should be. 
+    # Based on existing logic it seems it wants to output 'aws-matlab-template.json'
+    return {
+        "README.md": release_result['readme_content'],
+        "aws-matlab-template.json": release_result['cf_template_file']
+    }
+
+def process_toplevel(executor, template_env, target_versions, args, cache):
+    """
+    Submits the top-level files for rendering. Returns a Future of (readme, permissions, license).
+    """
+    return utils.submit(
+        executor,
+        toplevel.process_files,
+        template_env            = template_env,
+        target_releases         = target_versions,
+        dual_repo_url           = args.dual_repo_url,
+        permission_files_path   = os.path.join(args.source_path, 'internal', 'permissions'),
+        readme_path             = TOPLEVEL_README_TEMPLATE,
+        permissions_readme_path = TOPLEVEL_PERMISSIONS_TEMPLATE,
+        license_readme_path     = TOPLEVEL_LICENSE_TEMPLATE,
+        render_cache            = cache
+    )
+
+def toplevel_structure(toplevel_files):
+    toplevel_readme, toplevel_permissions, toplevel_license = toplevel_files
+    return {
+        "README.md"         : toplevel_readme,
+        "permission.md"    : toplevel_permissions,
+        "LICENSE.md"        : toplevel_license,
+    }
 
+def run_batch(args, executor, template_env, cache, output_dir):
+    """
+    Renders everything, then writes it in one go. Nothing is written if anything fails.
+
+    Returns:
+        tuple: (change_set, toplevel_error, release_errors)
+    """
     # Deserialize target-versions input
     target_versions = utils.deserialize_target_versions(
         target_versions_string=args.target_versions
     )
 
+    with instrumentation.span('render'):
+        # Top-level and release files are independent, so they render side by side
+        toplevel_future = process_toplevel(executor, template_env, target_versions, args, cache)
+
+        # Process release-specific files
+        release_data, release_errors = release.process_files(
+            template_env                    = template_env,
+            target_versions                 = target_versions,
+            artifact_dir                    = args.artifact_path,
+            s3_bucket_url                   = args.s3_bucket_url,
+            release_readme_template_path    = RELEASE_README_TEMPLATE,
+            executor                        = executor,
+            render_cache                    = cache
+        )
+
+        # Process top-level files
+        try:
+            toplevel_files = toplevel_future.result()
+            toplevel_error = None
+        except Exception as e:
+            toplevel_error = e
+
+    if toplevel_error or release_errors:
+        return None, toplevel_error, release_errors
+
+    # Define required file/folder structure
+    repository_structure = toplevel_structure(toplevel_files)
+    repository_structure['releases'] = {r['version']: release_files(r) for r in release_data}
+
+    with instrumentation.span('write'):
+        change_set = utils.write_to_disk(output_dir, repository_structure, prune=args.prune)
+    return change_set, None, {}
+
+def run_streaming(args, executor, template_env, cache, output_dir):
+    """
+    Reads versions from --targets-file and writes each release as soon as it is rendered,
+    keeping only a few releases in memory at a time. The top-level files, which list
+    every release, are written last. Releases that did render are written even if
+    others fail; pruning is then skipped so the failed releases' old files survive.
+
+    Returns:
+        tuple: (change_set, toplevel_error, release_errors)
+    """
+    writer          = utils.IncrementalWriter(output_dir)
+    target_versions = []
+    release_errors  = {}
+
+    def _read_targets():
+        for version in utils.iter_target_versions(args.targets_file):
+            target_versions.append(version)
+            yield version
+
+    results = release.iter_releases(
+        template_env                    = template_env,
+        target_versions                 = _read_targets(),
+        artifact_dir                    = args.artifact_path,
+        s3_bucket_url                   = args.s3_bucket_url,
+        release_readme_template_path    = RELEASE_README_TEMPLATE,
+        executor                        = executor,
+        render_cache                    = cache,
+        window                          = 2 * max(1, args.workers)
+    )
+    with instrumentation.span('render_and_write_releases'):
+        for version, result, error in results:
+            if error:
+                release_errors[version] = error
+            elif result:
+                writer.write({"releases": {version: release_files(result)}})
+
+    with instrumentation.span('render_and_write_toplevel'):
+        try:
+            toplevel_files = process_toplevel(executor, template_env, target_versions, args, cache).result()
+            writer.write(toplevel_structure(toplevel_files))
+            toplevel_error = None
+        except Exception as e:
+            toplevel_error = e
+
+    change_set = writer.finish(prune=args.prune and not (toplevel_error or release_errors))
+    return change_set, toplevel_error, release_errors
+
+def main(argv=None):
+    # Capture inputs
+    args = setup_args(argv)
+
     # Define variables
     SRC_DIR         = args.source_path
-    PERMISSIONS_DIR = os.path.join(SRC_DIR, 'internal', 'permissions')
-    ARTIFACT_DIR    = args.artifact_path
     OUTPUT_DIR      = os.path.abspath(args.output_path)
 
     print(f"Source Directory: {SRC_DIR}")
     print(f"Output Directory: {OUTPUT_DIR}")
 
-    # Initialize jinja2
-    template_loader = jinja2.FileSystemLoader(searchpath=SRC_DIR)
-    template_env    = jinja2.Environment(loader=template_loader)
-
-    # Process top-level files
-    try:
-        toplevel_readme, toplevel_permissions, toplevel_license = toplevel.process_files(
-            template_env            = template_env,
-            target_releases         = target_versions,
-            dual_repo_url           = args.dual_repo_url,
-            permission_files_path   = PERMISSIONS_DIR,
-            readme_path             = os.path.join('toplevel', 'README.md'),
-            permissions_readme_path = os.path.join('toplevel', 'permission.md'),
-            license_readme_path     = os.path.join('toplevel', 'LICENSE.md')
-        )
-    except Exception as e:
-        print(f"Error processing top-level files: {e}")
+    # Initialize jinja2 and compile the rendered templates up front, failing before anything is rendered
+    with instrumentation.span('jinja_setup'):
+        template_env    = utils.create_template_env(SRC_DIR, args.bytecode_cache_dir)
+        compile_errors  = utils.precompile_templates(template_env, RENDERED_TEMPLATES)
+    for name, error in compile_errors.items():
+        print(f"::error::Template {name} failed to compile: {error}")
+    if compile_errors:
         sys.exit(1)
 
-    # Process release-specific files 
+    # Process workers cannot share an environment and build their own (see utils.init_worker),
+    # loading the bytecode compiled above
+    executor        = utils.create_executor(args.parallel_mode, args.workers, SRC_DIR, args.bytecode_cache_dir)
+    if executor and args.parallel_mode == 'process':
+        template_env = None
+
+    cache = None
+    if args.render_cache_dir:
+        cache = render_cache.RenderCache(args.render_cache_dir, max_bytes=int(args.render_cache_mb * 1024 * 1024))
+
+    if executor:
+        print(f"Rendering with {args.workers} {args.parallel_mode} workers")
+
+    run = run_streaming if args.targets_file else run_batch
     try:
-        release_data = release.process_files(
-            template_env                    = template_env,
-            target_versions                 = target_versions,
-            artifact_dir                    = ARTIFACT_DIR,
-            s3_bucket_url                   = args.s3_bucket_url,
-            release_readme_template_path    = "README.md" 
-        )
-    except Exception as e:
-        print(f"Error processing release files: {e}")
+        change_set, toplevel_error, release_errors = run(args, executor, template_env, cache, OUTPUT_DIR)
+    except (OSError, ValueError) as e:
+        # Unreadable or malformed --targets-file
+        print(f"::error::Could not read targets: {e}")
         sys.exit(1)
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
 
-    # Define required file/folder structure
-    repository_structure = {
-        "README.md"         : toplevel_readme,
-        "permission.md"    : toplevel_permissions,
-        "LICENSE.md"        : toplevel_license,
-        "releases"          : {}
-    }
+    # Process workers count renders and cache hits in their own memory
+    if not (executor and args.parallel_mode == 'process'):
+        utils.report_template_timings()
+        if cache:
+            cache.report()
+    if cache:
+        evicted = cache.prune()
+        if evicted:
+            print(f"Render cache: evicted {evicted} least recently used entr(ies)")
 
-    for r in release_data:
-        ver = r['version']
-        # Note: The logic in release.py reads the raw content of the artifact
-        # We need to decide what the output filename should be. 
-        # Based on existing logic it seems it wants to output 'aws-matlab-template.json'
-        repository_structure['releases'][ver] = {
-            "README.md": r['readme_content'],
-            "aws-matlab-template.json": r['cf_template_content']
-        }
-
-    utils.write_to_disk(OUTPUT_DIR, repository_structure)    
-    print("Processing complete.")
+    tracer = instrumentation.get_tracer()
+    if args.trace_file:
+        tracer.write(args.trace_file, args.trace_format)
+    tracer.write_step_summary("Release files")
 
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if change_set is not None and args.change_set_file:
+        with open(args.change_set_file, 'w', encoding='utf-8') as f:
+            json.dump(change_set, f, indent=2)
+        print(f"Change set written to: {args.change_set_file}")
+
+    # Report every failure before giving up, not just the first
+    if toplevel_error:
+        print(f"Error processing top-level files: {toplevel_error}")
+    for version, error in release_errors.items():
+        print(f"Error processing release {version}: {error}")
+    if toplevel_error or release_errors:
+        sys.exit(1)
+
+    print("Processing complete.")
@@ -1,30 +1,38 @@
 import utils
 import os
+import instrumentation
+from collections import deque
 
-def process_readme(template_env, regions, parameters, template_url, version, readme_path):
+def process_readme(template_env, regions, parameters, template_url, version, readme_path, render_cache=None):
     """
     Loads the README template and renders it with release data.
     """
-    template = template_env.get_template(readme_path)
-    
-    return template.render(
+    return utils.render_template(
+        template_env,
+        readme_path,
+        render_cache,
         regions         = regions,
         parameters      = parameters,
         template_url    = template_url,
         version         = version
     )
 
-def process_single_release(template_env, version, artifact_dir, s3_bucket_url, release_readme_template_path):
+def process_single_release(template_env, version, artifact_dir, s3_bucket_url, release_readme_template_path, render_cache=None):
     """
     Processes a single release: finds the CF template, parses it, renders the README.
+    template_env may be None inside a process-pool worker (see utils.init_worker).
     
     Returns:
         dict: {
             'version': version, 
             'readme_content': str, 
-            'cf_template_content': str, 
+            'cf_template_file': utils.SourceFile,   # the artifact itself, copied to the output as-is
         }
     """
+    with instrumentation.span(version, 'release'):
+        return _process_single_release(template_env, version, artifact_dir, s3_bucket_url, release_readme_template_path, render_cache)
+
+def _process_single_release(template_env, version, artifact_dir, s3_bucket_url, release_readme_template_path, render_cache):
     cf_filename = f"{version}-release-template.json"
     cft_path = os.path.join(artifact_dir, cf_filename)
     
@@ -32,40 +40,96 @@ def process_single_release(template_env, version, artifact_dir, s3_bucket_url, r
         print(f"Warning: Artifact for {version} not found at {cft_path}")
         return None
     
+    # The artifact is read once, here; the output copy is made from the file, not from memory
     regions, parameters = utils.parse_template_json(cft_path)
     template_url = f"{s3_bucket_url.rstrip('/')}/{version}/{cf_filename}"
     
     readme_content = process_readme(
-        template_env    = template_env,
+        template_env    = utils.get_template_env(template_env),
         regions         = regions,
         parameters      = parameters,
         template_url    = template_url,
         version         = version,
-        readme_path     = release_readme_template_path
+        readme_path     = release_readme_template_path,
+        render_cache    = render_cache
         )
 
-    # 5. Read the Raw CF Template Content (to save it later)
-    with open(cft_path, 'r', encoding='utf-8') as f:
-        cft_content = f.read()
-
     return {
         'version': version,
         'readme_content': readme_content,
-        'cf_template_content': cft_content,
+        'cf_template_file': utils.SourceFile(cft_path),
     }
 
-def process_files(template_env, target_versions, artifact_dir, s3_bucket_url, release_readme_template_path):
+def process_files(template_env, target_versions, artifact_dir, s3_bucket_url, release_readme_template_path, executor=None, render_cache=None):
+    """
+    Processes every release, on executor if one is given.
+
+    Returns:
+        tuple: (release_outputs, errors)
+            release_outputs - list of process_single_release results, in target_versions order
+            errors          - dict of { version: error message } for releases that failed
+    """
+    futures = [
+        (version, utils.submit(
+            executor,
+            process_single_release,
+            template_env,
+            version,
+            artifact_dir,
+            s3_bucket_url,
+            release_readme_template_path,
+            render_cache
+        ))
+        for version in target_versions
+    ]
+
     release_outputs = []
-    
-    for version in target_versions:
-        result = process_single_release(
-            template_env, 
-            version, 
-            artifact_dir, 
-            s3_bucket_url, 
-            release_readme_template_path
-        )
+    errors = {}
+
+    for version, future in futures:
+        try:
+            result = future.result()
+        except Exception as e:
+            errors[version] = str(e)
+            continue
         if result:
             release_outputs.append(result)
-            
-    return release_outputs
\ No newline at end of file
+
+    return release_outputs, errors
+
+def iter_releases(template_env, target_versions, artifact_dir, s3_bucket_url, release_readme_template_path, executor=None, render_cache=None, window=1):
+    """
+    Streaming counterpart of process_files: target_versions may be any iterable, read lazily.
+    At most window releases are in flight at once, so memory does not grow with the
+    number of releases.
+
+    Yields:
+        tuple: (version, result, error) in target_versions order, where result is a
+               process_single_release result (None if the artifact is missing) and
+               error the message of a release that failed, else None
+    """
+    in_flight = deque()
+
+    def _next_done():
+        version, future = in_flight.popleft()
+        try:
+            return version, future.result(), None
+        except Exception as e:
+            return version, None, str(e)
+
+    for version in target_versions:
+        in_flight.append((version, utils.submit(
+            executor,
+            process_single_release,
+            template_env,
+            version,
+            artifact_dir,
+            s3_bucket_url,
+            release_readme_template_path,
+            render_cache
+        )))
+        if len(in_flight) >= window:
+            yield _next_done()
+
+    while in_flight:
+        yield _next_done()
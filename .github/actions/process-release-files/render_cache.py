@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+import utils
+
+# Bump to invalidate every entry written by an older version of this module
+RENDER_CACHE_VERSION = 2
+
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+ENTRY_SUFFIX = '.render'
+
+class RenderCache:
+    """
+    On-disk cache of rendered templates, shared between runs.
+
+    Entries are keyed by a fingerprint of the template's source and the sources of every
+    template it pulls in (include, extends, import), the render arguments and the Jinja
+    version, so any change to one of them is a miss. Each entry is a file
+    named after its key; a hit touches the file, and prune() evicts the least recently
+    used entries until the cache fits in max_bytes.
+
+    A template that names another through a variable (e.g. include some_var) could use
+    any of them, so the sources of every template of the environment are fingerprinted for it.
+
+    Holds no open handles, so it can be passed to process-pool workers as is.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path       = Path(path)
+        self.max_bytes  = max_bytes
+        # Counted in the process doing the rendering only
+        self.hits       = 0
+        self.misses     = 0
+        # { template_name: sources of it and every template it uses }; templates do not change during a run
+        self._sources   = {}
+        self._lock      = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(template_source: str, context: dict) -> str:
+        """
+        Key for one render. context must be JSON serialisable; other values fall back to str().
+        """
+        import jinja2
+
+        digest = hashlib.sha256()
+        digest.update(f"{RENDER_CACHE_VERSION}|{jinja2.__version__}|".encode('utf-8'))
+        digest.update(template_source.encode('utf-8'))
+        digest.update(json.dumps(context, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def render(self, template_env: 'jinja2.Environment', template_name: str, **context) -> str:
+        """
+        Renders template_name with context, or returns the cached result of an identical render.
+        """
+        source = self._sources.get(template_name)
+        if source is None:
+            source = self._combined_source(template_env, template_name)
+            self._sources[template_name] = source
+        key = self.fingerprint(source, {'template': template_name, 'context': context})
+
+        content = self._read(key)
+        with self._lock:
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if content is None:
+            content = template_env.get_template(template_name).render(**context)
+            self._write(key, content)
+        return content
+
+    @staticmethod
+    def _combined_source(template_env: 'jinja2.Environment', template_name: str) -> str:
+        """
+        Sources of template_name and of every template it references, directly or through
+        others, in a stable order.
+        """
+        import jinja2.meta
+
+        sources = {}
+        pending = [template_name]
+        while pending:
+            name = pending.pop()
+            if name in sources:
+                continue
+            source, _, _ = template_env.loader.get_source(template_env, name)
+            sources[name] = source
+
+            referenced = list(jinja2.meta.find_referenced_templates(template_env.parse(source)))
+            if None in referenced:
+                # Chosen at render time, so any template may be used; other files (e.g. images) are not templates
+                referenced = template_env.list_templates(extensions=utils.TEMPLATE_EXTENSIONS)
+            pending.extend(r for r in referenced if r not in sources)
+
+        return ''.join(f"{len(name)}:{name}{len(source)}:{source}" for name, source in sorted(sources.items()))
+
+    def prune(self):
+        """
+        Deletes least recently used entries until the cache is no larger than max_bytes.
+
+        Returns:
+            int: number of entries deleted
+        """
+        entries = []
+        for entry in self.path.glob(f"*{ENTRY_SUFFIX}"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+
+        total   = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                pass
+            total   -= size
+            removed += 1
+        return removed
+
+    def report(self):
+        print(f"Render cache: {self.hits} hit(s), {self.misses} miss(es) [{self.path}]")
+
+    def _entry_path(self, key: str) -> Path:
+        return self.path / f"{key}{ENTRY_SUFFIX}"
+
+    def _read(self, key: str):
+        entry = self._entry_path(key)
+        try:
+            content = entry.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"Warning: Ignoring unreadable render cache entry {entry}: {e}")
+            return None
+
+        # Mark as recently used for prune()
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return content
+
+    def _write(self, key: str, content: str):
+        entry = self._entry_path(key)
+        # Unique per writer, so concurrent workers rendering the same thing do not collide
+        tmp_path = entry.with_name(f".{entry.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(content, encoding='utf-8')
+            os.replace(tmp_path, entry)
+        except OSError as e:
+            # A cache that cannot be written only costs a re-render next time
+            print(f"Warning: Could not write render cache entry {entry}: {e}")
@@ -0,0 +1,133 @@
+import json
+import os
+import pytest
+import permissions
+
+VALID = {'Version': '2012-10-17', 'Statement': [{'Effect': 'Allow', 'Action': 's3:GetObject', 'Resource': '*'}]}
+
+def write_policy(directory, name, document):
+    path = directory / f"{name}.json"
+    path.write_text(document if isinstance(document, str) else json.dumps(document), encoding='utf-8')
+    return path
+
+def test_valid_policy_has_no_problems():
+    assert permissions.validate_policy(VALID) == []
+
+def test_validate_policy_reports_every_problem():
+    problems = permissions.validate_policy({
+        'Version': '2020-01-01',
+        'Statement': [{'Effect': 'Permit', 'Action': 's3:*', 'NotAction': 'iam:*', 'Extra': 1}, 'oops'],
+    })
+
+    assert any(p.startswith("Version must be one of") for p in problems)
+    assert "Statement[0] has unknown key(s) Extra" in problems
+    assert "Statement[0].Effect must be Allow or Deny, got 'Permit'" in problems
+    assert "Statement[0] cannot have both Action and NotAction" in problems
+    assert "Statement[1] is not a JSON object" in problems
+
+def test_validate_policy_needs_statements():
+    assert permissions.validate_policy({'Version': '2012-10-17', 'Statement': []}) == [
+        "Statement must be a statement object or a non-empty list of them"
+    ]
+    assert permissions.validate_policy([]) == ["document is not a JSON object"]
+
+def test_store_lists_json_files_without_reading_them(tmp_path):
+    write_policy(tmp_path, 'b', VALID)
+    write_policy(tmp_path, 'a', '{ not json')
+    (tmp_path / 'notes.txt').write_text('ignored')
+
+    store = permissions.PermissionsStore(tmp_path)
+
+    assert list(store) == ['a', 'b']
+    assert len(store) == 2
+    assert 'a' in store
+    assert 'notes' not in store
+
+def test_store_loads_documents(tmp_path):
+    write_policy(tmp_path, 'policy', VALID)
+
+    assert permissions.PermissionsStore(tmp_path)['policy'] == VALID
+
+def test_unknown_policy_is_a_key_error(tmp_path):
+    write_policy(tmp_path, 'policy', VALID)
+    store = permissions.PermissionsStore(tmp_path)
+
+    assert store.get('missing') is None
+    with pytest.raises(KeyError):
+        store['missing']
+    with pytest.raises(permissions.PermissionsError, match=r"Policy 'missing' not found .*\(available: policy\)"):
+        store['missing']
+
+def test_missing_directory_is_an_empty_store(tmp_path):
+    store = permissions.PermissionsStore(tmp_path / 'missing')
+
+    assert len(store) == 0
+    with pytest.raises(permissions.UnknownPolicyError, match=r"available: none"):
+        store['policy']
+
+def test_invalid_json_names_the_file(tmp_path):
+    write_policy(tmp_path, 'broken', '{ not json')
+
+    with pytest.raises(permissions.PermissionsError, match=r"broken.json is not a valid JSON file"):
+        permissions.PermissionsStore(tmp_path)['broken']
+
+def test_invalid_policy_names_the_file_and_problems(tmp_path):
+    write_policy(tmp_path, 'bad', {'Version': '2012-10-17', 'Statement': {'Effect': 'Allow'}})
+
+    with pytest.raises(permissions.PermissionsError, match=r"bad.json is not a valid IAM policy:\n   Statement\[0\] needs Action or NotAction"):
+        permissions.PermissionsStore(tmp_path)['bad']
+
+def test_require_reports_every_failure(tmp_path):
+    write_policy(tmp_path, 'good', VALID)
+    write_policy(tmp_path, 'broken', '{ not json')
+    store = permissions.PermissionsStore(tmp_path)
+
+    store.require(['good'])
+    with pytest.raises(permissions.PermissionsError) as excinfo:
+        store.require(['good', 'broken', 'missing'])
+
+    message = str(excinfo.value)
+    assert message.startswith("Invalid permissions:\n")
+    assert "broken.json is not a valid JSON file" in message
+    assert "Policy 'missing' not found" in message
+
+def test_unchanged_file_is_parsed_once(tmp_path):
+    write_policy(tmp_path, 'policy', VALID)
+
+    first   = permissions.PermissionsStore(tmp_path)['policy']
+    second  = permissions.PermissionsStore(tmp_path)['policy']
+
+    assert second is first
+
+def test_touched_file_with_same_content_reuses_the_parse(tmp_path):
+    path = write_policy(tmp_path, 'policy', VALID)
+    first = permissions.PermissionsStore(tmp_path)['policy']
+
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert permissions.PermissionsStore(tmp_path)['policy'] is first
+
+def test_changed_file_is_parsed_again(tmp_path):
+    path = write_policy(tmp_path, 'policy', VALID)
+    first = permissions.PermissionsStore(tmp_path)['policy']
+
+    changed = {'Version': '2012-10-17', 'Statement': [{'Effect': 'Deny', 'Action': 'iam:*', 'Resource': '*'}]}
+    write_policy(tmp_path, 'policy', changed)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    second = permissions.PermissionsStore(tmp_path)['policy']
+    assert second is not first
+    assert second == changed
+
+def test_file_that_becomes_invalid_is_rejected(tmp_path):
+    path = write_policy(tmp_path, 'policy', VALID)
+    permissions.PermissionsStore(tmp_path)['policy']
+
+    write_policy(tmp_path, 'policy', '{ not json')
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    with pytest.raises(permissions.PermissionsError, match=r"not a valid JSON file"):
+        permissions.PermissionsStore(tmp_path)['policy']
@@ -0,0 +1,79 @@
+import copy
+import policy
+
+def make_policy(*statements):
+    return {'Version': '2012-10-17', 'Statement': list(statements)}
+
+def allow(action=None, not_action=None):
+    statement = {'Effect': 'Allow', 'Resource': '*'}
+    if action is not None:
+        statement['Action'] = action
+    if not_action is not None:
+        statement['NotAction'] = not_action
+    return statement
+
+def test_string_action_matches_case_insensitively():
+    original = make_policy(allow('IAM:CreateRole'), allow('ec2:RunInstances'))
+    filtered = policy.ActionFilter(['iam:createrole']).apply(original)
+
+    assert filtered['Statement'] == [allow('ec2:RunInstances')]
+
+def test_list_actions_are_filtered_and_empty_statements_dropped():
+    original = make_policy(allow(['iam:CreateRole', 's3:GetObject']), allow(['iam:CreateRole']))
+    filtered = policy.ActionFilter(['iam:CreateRole']).apply(original)
+
+    assert filtered['Statement'] == [allow(['s3:GetObject'])]
+
+def test_wildcards_match_every_action_they_cover():
+    original = make_policy(allow(['iam:CreateRole', 'iam:PassRole', 'iam:GetRolePolicy', 'iam:ListUsers']))
+    filtered = policy.ActionFilter(['iam:*Role*']).apply(original)
+
+    assert filtered['Statement'] == [allow(['iam:ListUsers'])]
+
+def test_wildcard_question_mark_matches_one_character():
+    action_filter = policy.ActionFilter(['ec2:?unInstances'])
+
+    assert action_filter.matches('ec2:RunInstances')
+    assert not action_filter.matches('ec2:RerunInstances')
+
+def test_allow_not_action_gains_the_missing_actions():
+    original = make_policy(allow(not_action='iam:CreateRole'))
+    filtered = policy.ActionFilter(['iam:createrole', 'iam:DeleteRole']).apply(original)
+
+    assert filtered['Statement'] == [allow(not_action=['iam:CreateRole', 'iam:DeleteRole'])]
+
+def test_not_action_already_excluding_everything_is_kept():
+    original = make_policy(allow(not_action=['iam:*']))
+    assert policy.ActionFilter(['iam:CreateRole']).apply(original) is original
+
+def test_deny_not_action_is_kept():
+    deny = {'Effect': 'Deny', 'NotAction': 's3:*', 'Resource': '*'}
+    original = make_policy(deny)
+
+    assert policy.ActionFilter(['iam:CreateRole']).apply(original) is original
+
+def test_single_statement_object_stays_an_object():
+    original = {'Version': '2012-10-17', 'Statement': allow(['iam:CreateRole', 's3:GetObject'])}
+    filtered = policy.ActionFilter(['iam:CreateRole']).apply(original)
+
+    assert filtered['Statement'] == allow(['s3:GetObject'])
+
+def test_input_policy_is_not_modified():
+    original = make_policy(
+        allow(['iam:CreateRole', 's3:GetObject']),
+        allow('iam:PassRole'),
+        allow(not_action=['ec2:*']),
+        allow('s3:PutObject'),
+    )
+    before = copy.deepcopy(original)
+    filtered = policy.ActionFilter(['iam:*Role', 'iam:DeleteRole']).apply(original)
+
+    assert original == before
+    assert filtered is not original
+    # Unchanged statements are shared, changed ones copied
+    assert filtered['Statement'][-1] is original['Statement'][-1]
+    assert filtered['Statement'][0] is not original['Statement'][0]
+
+def test_unchanged_policy_is_returned_as_is():
+    original = make_policy(allow('s3:GetObject'))
+    assert policy.ActionFilter(['iam:CreateRole']).apply(original) is original
@@ -0,0 +1,109 @@
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+import benchmark
+import processor
+import release
+import utils
+
+S3_BUCKET_URL = 's3://bucket'
+
+@pytest.fixture
+def fixture(tmp_path):
+    return benchmark.generate_fixture(tmp_path, releases=4, regions=2, parameters=2, policy_statements=2)
+
+@pytest.fixture
+def template_env(fixture, tmp_path):
+    return utils.create_template_env(fixture['source_path'], str(tmp_path / 'bytecode'))
+
+def stream(template_env, fixture, versions, **kwargs):
+    return list(release.iter_releases(
+        template_env                    = template_env,
+        target_versions                 = versions,
+        artifact_dir                    = fixture['artifact_path'],
+        s3_bucket_url                   = S3_BUCKET_URL,
+        release_readme_template_path    = processor.RELEASE_README_TEMPLATE,
+        **kwargs
+    ))
+
+def test_releases_are_yielded_in_order(template_env, fixture):
+    results = stream(template_env, fixture, iter(fixture['versions']))
+
+    assert [version for version, _, _ in results] == fixture['versions']
+    for version, result, error in results:
+        assert error is None
+        assert result['version'] == version
+        assert f"# MATLAB {version} on Amazon Web Services" in result['readme_content']
+        assert result['cf_template_file'].path.name == f"{version}-release-template.json"
+
+def test_matches_process_files(template_env, fixture):
+    streamed = [result for _, result, _ in stream(template_env, fixture, iter(fixture['versions']))]
+    batch, errors = release.process_files(template_env, fixture['versions'], fixture['artifact_path'], S3_BUCKET_URL, processor.RELEASE_README_TEMPLATE)
+
+    assert errors == {}
+    assert [r['readme_content'] for r in streamed] == [r['readme_content'] for r in batch]
+
+def test_missing_artifact_yields_no_result(template_env, fixture):
+    assert stream(template_env, fixture, ['R1999a']) == [('R1999a', None, None)]
+
+def test_failed_release_yields_its_error_and_the_rest_continue(template_env, fixture, monkeypatch):
+    process_single_release = release.process_single_release
+
+    def _fail_one(template_env, version, *args):
+        if version == fixture['versions'][1]:
+            raise RuntimeError("render failed")
+        return process_single_release(template_env, version, *args)
+    monkeypatch.setattr(release, 'process_single_release', _fail_one)
+
+    results = stream(template_env, fixture, fixture['versions'])
+
+    assert [(version, error) for version, _, error in results] == [
+        (version, "render failed" if version == fixture['versions'][1] else None) for version in fixture['versions']
+    ]
+    assert results[1][1] is None
+
+@pytest.mark.parametrize('window', [1, 2, 3])
+def test_targets_are_read_lazily(template_env, fixture, window):
+    read = []
+
+    def _targets():
+        for version in fixture['versions']:
+            read.append(version)
+            yield version
+
+    results = release.iter_releases(template_env, _targets(), fixture['artifact_path'], S3_BUCKET_URL,
+                                    processor.RELEASE_README_TEMPLATE, window=window)
+    first_version, _, _ = next(results)
+
+    assert first_version == fixture['versions'][0]
+    # No more than window releases are started before the first is handed back
+    assert read == fixture['versions'][:window]
+    assert [version for version, _, _ in results] == fixture['versions'][1:]
+
+def test_executor_keeps_target_order(template_env, fixture):
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = stream(template_env, fixture, iter(fixture['versions']), executor=executor, window=3)
+
+    assert [version for version, _, _ in results] == fixture['versions']
+    assert all(error is None for _, _, error in results)
+
+def test_targets_file_writes_the_same_files_as_target_versions(fixture, tmp_path, monkeypatch):
+    monkeypatch.delenv('GITHUB_STEP_SUMMARY', raising=False)
+    targets_file = tmp_path / 'targets.jsonl'
+    targets_file.write_text('\n'.join(json.dumps(version) for version in fixture['versions']) + '\n')
+
+    common = [
+        '--source-path',    fixture['source_path'],
+        '--artifact-path',  fixture['artifact_path'],
+        '--s3-bucket-url',  S3_BUCKET_URL,
+        '--dual-repo-url',  'https://example.com/dual',
+    ]
+    processor.main(common + ['--target-versions', json.dumps(fixture['versions']), '--output-path', str(tmp_path / 'batch')])
+    processor.main(common + ['--targets-file', str(targets_file), '--output-path', str(tmp_path / 'streamed')])
+
+    def _files(root):
+        return {path.relative_to(root).as_posix(): path.read_bytes() for path in root.rglob('*') if path.is_file()}
+
+    batch = _files(tmp_path / 'batch')
+    assert 'releases/R2025b/README.md' in batch
+    assert _files(tmp_path / 'streamed') == batch
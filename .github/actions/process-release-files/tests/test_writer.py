@@ -0,0 +1,149 @@
+import json
+import os
+import utils
+
+STRUCTURE = {
+    'README.md': 'top',
+    'releases': {
+        'R2025a': {'README.md': 'a'},
+        'R2024b/README.md': 'b',
+    },
+}
+
+def snapshot(directory):
+    """
+    Returns { relative path: (content, mtime_ns) } for every generated file under directory.
+    """
+    return {
+        path.relative_to(directory).as_posix(): (path.read_bytes(), path.stat().st_mtime_ns)
+        for path in directory.rglob('*') if path.is_file() and path.name != utils.MANIFEST_NAME
+    }
+
+def read_manifest(directory):
+    return json.loads((directory / utils.MANIFEST_NAME).read_text())['files']
+
+def test_first_run_adds_every_file(tmp_path):
+    change_set = utils.write_to_disk(tmp_path, STRUCTURE)
+
+    assert change_set == {
+        'added': ['README.md', 'releases/R2024b/README.md', 'releases/R2025a/README.md'],
+        'modified': [], 'unchanged': [], 'removed': [],
+    }
+    assert (tmp_path / 'releases/R2024b/README.md').read_text() == 'b'
+
+def test_rerun_leaves_files_untouched(tmp_path):
+    utils.write_to_disk(tmp_path, STRUCTURE)
+    before = snapshot(tmp_path)
+
+    change_set = utils.write_to_disk(tmp_path, STRUCTURE)
+
+    assert change_set['unchanged'] == ['README.md', 'releases/R2024b/README.md', 'releases/R2025a/README.md']
+    assert change_set['added'] == change_set['modified'] == change_set['removed'] == []
+    assert snapshot(tmp_path) == before
+
+def test_changed_content_is_modified(tmp_path):
+    utils.write_to_disk(tmp_path, STRUCTURE)
+
+    change_set = utils.write_to_disk(tmp_path, {**STRUCTURE, 'README.md': 'tip'})
+
+    assert change_set['modified'] == ['README.md']
+    assert (tmp_path / 'README.md').read_text() == 'tip'
+
+def test_writes_leave_no_temporary_files(tmp_path):
+    utils.write_to_disk(tmp_path, STRUCTURE)
+    utils.write_to_disk(tmp_path, {**STRUCTURE, 'README.md': 'changed'})
+
+    assert not [path for path in tmp_path.rglob('*') if path.name.endswith('.tmp')]
+
+def test_changed_file_is_replaced_not_rewritten(tmp_path):
+    utils.write_to_disk(tmp_path, STRUCTURE)
+    inode = (tmp_path / 'README.md').stat().st_ino
+
+    utils.write_to_disk(tmp_path, {**STRUCTURE, 'README.md': 'changed'})
+
+    # A reader holding the old file never sees it change under it
+    assert (tmp_path / 'README.md').stat().st_ino != inode
+
+def test_source_files_are_copied_and_hashed(tmp_path):
+    source = tmp_path / 'artifact.json'
+    source.write_text('{"Resources": {}}')
+    output = tmp_path / 'out'
+
+    change_set = utils.write_to_disk(output, {'R2025a': {'template.json': utils.SourceFile(source)}})
+
+    assert change_set['added'] == ['R2025a/template.json']
+    assert (output / 'R2025a/template.json').read_bytes() == source.read_bytes()
+    assert read_manifest(output) == {
+        'R2025a/template.json': {'sha256': utils.hash_file(source), 'size': source.stat().st_size},
+    }
+
+def test_manifest_holds_hashes_and_sizes_only(tmp_path):
+    utils.write_to_disk(tmp_path, STRUCTURE)
+
+    manifest = read_manifest(tmp_path)
+    assert sorted(manifest) == ['README.md', 'releases/R2024b/README.md', 'releases/R2025a/README.md']
+    assert manifest['README.md'] == {'sha256': utils.hash_file(tmp_path / 'README.md'), 'size': 3}
+
+def test_fresh_checkout_mtimes_do_not_count_as_changes(tmp_path):
+    utils.write_to_disk(tmp_path, STRUCTURE)
+    for path in tmp_path.rglob('*.md'):
+        os.utime(path, ns=(0, 0))
+
+    change_set = utils.write_to_disk(tmp_path, STRUCTURE)
+
+    assert change_set['modified'] == []
+    assert len(change_set['unchanged']) == 3
+
+def test_removed_files_are_reported_and_kept_without_prune(tmp_path):
+    utils.write_to_disk(tmp_path, STRUCTURE)
+
+    change_set = utils.write_to_disk(tmp_path, {'README.md': 'top'})
+
+    assert change_set['removed'] == ['releases/R2024b/README.md', 'releases/R2025a/README.md']
+    assert (tmp_path / 'releases/R2025a/README.md').exists()
+    # Still tracked, so a later run with prune removes them
+    assert 'releases/R2025a/README.md' in read_manifest(tmp_path)
+
+def test_prune_deletes_removed_files_and_empty_directories(tmp_path):
+    utils.write_to_disk(tmp_path, STRUCTURE)
+    (tmp_path / 'hand-written.md').write_text('not ours')
+
+    change_set = utils.write_to_disk(tmp_path, {'README.md': 'top', 'releases': {'R2024b/README.md': 'b'}}, prune=True)
+
+    assert change_set['removed'] == ['releases/R2025a/README.md']
+    assert not (tmp_path / 'releases/R2025a').exists()
+    assert (tmp_path / 'releases/R2024b/README.md').exists()
+    # Files the writer never wrote are left alone
+    assert (tmp_path / 'hand-written.md').exists()
+    assert sorted(read_manifest(tmp_path)) == ['README.md', 'releases/R2024b/README.md']
+
+def test_prune_after_a_run_without_prune(tmp_path):
+    utils.write_to_disk(tmp_path, STRUCTURE)
+    utils.write_to_disk(tmp_path, {'README.md': 'top'})
+
+    change_set = utils.write_to_disk(tmp_path, {'README.md': 'top'}, prune=True)
+
+    assert change_set['removed'] == ['releases/R2024b/README.md', 'releases/R2025a/README.md']
+    assert not (tmp_path / 'releases').exists()
+
+def test_unreadable_manifest_counts_every_file_as_added(tmp_path):
+    utils.write_to_disk(tmp_path, STRUCTURE)
+    (tmp_path / utils.MANIFEST_NAME).write_text('{ not json')
+
+    change_set = utils.write_to_disk(tmp_path, STRUCTURE, prune=True)
+
+    # The files on disk are still compared, only the removal tracking is lost
+    assert len(change_set['unchanged']) == 3
+    assert change_set['removed'] == []
+
+def test_structure_written_in_parts(tmp_path):
+    utils.write_to_disk(tmp_path, STRUCTURE)
+
+    writer = utils.IncrementalWriter(tmp_path)
+    writer.write({'releases': {'R2025a': {'README.md': 'a'}}})
+    writer.write({'README.md': 'top'})
+    change_set = writer.finish(prune=True)
+
+    assert change_set['unchanged'] == ['README.md', 'releases/R2025a/README.md']
+    assert change_set['removed'] == ['releases/R2024b/README.md']
+    assert not (tmp_path / 'releases/R2024b').exists()
@@ -1,51 +1,56 @@
 import utils
 import json  # 1. Import json
+import policy
 from datetime import datetime
 
-def process_readme(template_env, releases_data, dual_repo_url, readme_path):
+# Removed from the provisioning policy to produce the restricted variant
+ADMIN_LEVEL_ACTIONS = [
+    "iam:AttachRolePolicy",
+    "iam:CreateRole",
+    "iam:DeleteRole",
+    "iam:DeleteRolePolicy",
+    "iam:DetachRolePolicy",
+    "iam:PutRolePolicy",
+    "iam:TagRole",
+]
+ADMIN_LEVEL_FILTER = policy.ActionFilter(ADMIN_LEVEL_ACTIONS)
+
+# Policy documents the permissions template renders
+PERMISSION_DOCUMENTS = ('provisioning_policy', 'execution_policy', 'execution_policy_trust')
+
+def process_readme(template_env, releases_data, dual_repo_url, readme_path, render_cache=None):
     """
     Loads the README template and renders it with release data.
     """
-    template = template_env.get_template(readme_path)
-    
-    return template.render(
+    return utils.render_template(
+        template_env,
+        readme_path,
+        render_cache,
         releases=releases_data, 
         dual_url=dual_repo_url.rstrip('/')
     )
 
-def process_permissions(template_env, permissions_data, permissions_readme_path):
+def process_permissions(template_env, permissions_data, permissions_readme_path, render_cache=None):
     """
     Loads the permissions template and renders it.
     """
-    ADMIN_LEVEL_ACTIONS = [
-        "iam:AttachRolePolicy",
-        "iam:CreateRole",
-        "iam:DeleteRole",
-        "iam:DeleteRolePolicy",
-        "iam:DetachRolePolicy",
-        "iam:PutRolePolicy",
-        "iam:TagRole",
-    ]
-    restricted_provisioning_policy = utils.remove_actions_from_policy(
-        permissions_data['provisioning_policy'],    
-        ADMIN_LEVEL_ACTIONS
-    )
+    restricted_provisioning_policy = ADMIN_LEVEL_FILTER.apply(permissions_data['provisioning_policy'])
 
-    template = template_env.get_template(permissions_readme_path)
-    
-    return template.render(
+    return utils.render_template(
+        template_env,
+        permissions_readme_path,
+        render_cache,
         full_provisioning_policy        = json.dumps(permissions_data['provisioning_policy'], indent=4),
         restricted_provisioning_policy  = json.dumps(restricted_provisioning_policy, indent=4),
         execution_policy                = json.dumps(permissions_data['execution_policy'], indent=4),
         execution_policy_trust          = json.dumps(permissions_data['execution_policy_trust'], indent=4)
     )
 
-def process_license(template_env, year, license_readme_path):
+def process_license(template_env, year, license_readme_path, render_cache=None):
     """
     Loads the LICENSE template.
     """
-    template = template_env.get_template(license_readme_path)
-    return template.render(current_year=year)
+    return utils.render_template(template_env, license_readme_path, render_cache, current_year=year)
 
 def process_files(
         template_env, 
@@ -54,17 +59,21 @@ def process_files(
         permission_files_path, 
         readme_path, 
         permissions_readme_path, 
-        license_readme_path
+        license_readme_path,
+        render_cache=None
     ):
     """
     Orchestrates the data gathering and rendering for top-level files.
+    template_env may be None inside a process-pool worker (see utils.init_worker).
     """
+    template_env        = utils.get_template_env(template_env)
     releases_data       = utils.create_release_object(target_releases, dual_repo_url)
     permissions_data    = utils.create_permissions_object(permission_files_path)
+    permissions_data.require(PERMISSION_DOCUMENTS)
     current_year        = datetime.now().year
 
-    readme_content      = process_readme(template_env, releases_data, dual_repo_url, readme_path)
-    permissions_content = process_permissions(template_env, permissions_data, permissions_readme_path)
-    license_content     = process_license(template_env, current_year, license_readme_path)
+    readme_content      = process_readme(template_env, releases_data, dual_repo_url, readme_path, render_cache)
+    permissions_content = process_permissions(template_env, permissions_data, permissions_readme_path, render_cache)
+    license_content     = process_license(template_env, current_year, license_readme_path, render_cache)
 
     return readme_content, permissions_content, license_content
\ No newline at end of file
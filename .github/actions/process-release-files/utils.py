@@ -1,11 +1,29 @@
 import os
 import json
-import copy
 import re
 import sys
+import shutil
+import hashlib
+import threading
+import time
+import instrumentation
+import permissions
+import policy as policy_filter
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 from typing import List, Dict
 from pathlib import Path
 
+# Template environment of a process-pool worker, set by init_worker
+_worker_template_env = None
+
+# Files under source_path that are Jinja templates, by extension; all are compiled when a
+# template picks the one it includes at render time
+TEMPLATE_EXTENSIONS = ('md',)
+
+# { template_name: { 'compile_time', 'renders', 'render_time' } }, for this process
+_template_timings   = {}
+_timings_lock       = threading.Lock()
+
 def deserialize_target_versions(target_versions_string:str ) -> List[str]:
     try:
         return json.loads(target_versions_string)
@@ -54,65 +72,20 @@ def create_release_object(target_releases: List[str], dual_repo_url: str) -> Lis
 
     return releases_data
 
-def create_permissions_object(permissions_path):
-
-    permissions_object = {}
-    path_obj = Path(permissions_path)
-    
-    if not path_obj.exists() or not path_obj.is_dir():
-        return permissions_object
-
-    for file_path in path_obj.iterdir():
-        if file_path.is_file() and file_path.suffix == '.json':
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    permissions_object[file_path.stem] = json.load(f)
-            except json.JSONDecodeError as e:
-                print(f"Error: {file_path.name} is not a valid JSON file. {e}")
-            except UnicodeDecodeError:
-                print(f"Error: Could not decode {file_path.name}")
-            except PermissionError:
-                print(f"Error: No permission to read {file_path.name}")
-            except Exception as e:
-                print(f"Unknown error reading {file_path.name}: {e}")
-                
-    return permissions_object
+def create_permissions_object(permissions_path) -> permissions.PermissionsStore:
+    """
+    Policy documents in permissions_path, keyed by file stem. Each is loaded and validated
+    on first access (see permissions.PermissionsStore).
+    """
+    return permissions.PermissionsStore(permissions_path)
 
 def remove_action_from_policy(policy: dict, action_to_remove: str) -> dict:
     """Remove single action from policy. """
-
-    policy_copy = copy.deepcopy(policy)
-
-    if "Statement" not in policy_copy:
-        return policy_copy
-
-    filtered_statements = []
-    for statement in policy_copy["Statement"]:
-        if "Action" in statement:
-            if isinstance(statement["Action"], list):
-                statement["Action"] = [
-                    action
-                    for action in statement["Action"]
-                    if action.lower() != action_to_remove.lower()
-                ]
-                if statement["Action"]:
-                    filtered_statements.append(statement)
-            elif isinstance(statement["Action"], str):
-                if statement["Action"] != action_to_remove:
-                    filtered_statements.append(statement)
-        else:
-            filtered_statements.append(statement)
-
-    policy_copy["Statement"] = filtered_statements
-    return policy_copy
+    return policy_filter.ActionFilter([action_to_remove]).apply(policy)
 
 def remove_actions_from_policy(policy: dict, actions_to_remove: list) -> dict:
-    """Remove actions from policy without modifying the original."""
-    policy_copy = copy.deepcopy(policy)
-    
-    for action in actions_to_remove:
-        policy_copy = remove_action_from_policy(policy_copy, action)
-    return policy_copy
+    """Remove actions from policy without modifying the original (see policy.ActionFilter)."""
+    return policy_filter.ActionFilter(actions_to_remove).apply(policy)
 
 def parse_template_json(template_path):
     """
@@ -136,6 +109,78 @@ def parse_template_json(template_path):
         })
     return regions, params
 
+# Written to the output directory and committed with the generated files; records what the previous run wrote.
+# Holds content hashes only, no mtimes, since a fresh checkout changes every mtime.
+MANIFEST_NAME = '.release-files-manifest.json'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class SourceFile:
+    """
+    Reference to an existing file, used in a write_to_disk structure in place of its content.
+    The file is linked or copied into place, so its content never has to be held in memory.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def copy_file(source: Path, target: Path):
+    """
+    Places source at target as a hardlink, falling back to shutil.copyfile
+    (which copies in the kernel via sendfile on Linux) across filesystems.
+    Replaces target atomically.
+    """
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+def write_text_atomic(target: Path, data: bytes):
+    """
+    Writes data to a temporary file next to target and renames it into place,
+    so readers never see a half-written file.
+    """
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, target)
+
+def load_manifest(manifest_path: Path) -> dict:
+    """
+    Returns { relative_path: { 'sha256', 'size' } } from the previous run, or {}.
+    """
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except FileNotFoundError:
+        return {}
+    except (json.JSONDecodeError, OSError, AttributeError) as e:
+        print(f"Warning: Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+
+def file_changed(path: Path, new_size: int, new_hash: str):
+    """
+    Returns None if there is no file at path, else whether its content differs from new_hash.
+    A file of another size has changed without being read.
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+
+    return stat.st_size != new_size or hash_file(path) != new_hash
+
 def validate_output_directory(path: Path):
     """
     Validates that the output directory exists (or can be created) 
@@ -162,16 +207,71 @@ def validate_output_directory(path: Path):
         print(f"   Details: {e}")
         sys.exit(1)
 
-def write_to_disk(base_dir: str, structure: dict):
+class IncrementalWriter:
     """
-    Recursive function to write the virtual filesystem to disk.
-    Includes robust error handling for permissions and IO issues.
+    Writes a virtual filesystem to disk, possibly in several parts.
+
+    Files whose content hash matches what is already on disk are left untouched,
+    so their mtimes do not change. Changed files are replaced atomically.
+    A manifest of what was written is kept in the output directory, so the next run
+    can tell which files disappeared from the structure; with prune they are deleted.
+
+    Call write() once per part of the structure, as parts become ready, then finish().
     """
-    base_path = Path(base_dir).resolve()
-    
-    validate_output_directory(base_path)
 
-    def _write_recursive(current_path: Path, current_struct: dict):
+    def __init__(self, base_dir: str):
+        self.base_path      = Path(base_dir).resolve()
+
+        validate_output_directory(self.base_path)
+
+        self.manifest_path  = self.base_path / MANIFEST_NAME
+        self.old_manifest   = load_manifest(self.manifest_path)
+        self.new_manifest   = {}
+        self.change_set     = {'added': [], 'modified': [], 'unchanged': [], 'removed': []}
+
+        print(f"Writing files to: {self.base_path}...")
+
+    def write(self, structure: dict):
+        """
+        Writes structure, a { name: content or nested dict } tree relative to the output directory.
+        Includes robust error handling for permissions and IO issues.
+        """
+        self._write_recursive(self.base_path, structure)
+
+    def _write_file(self, target_path: Path, content):
+        rel_path = target_path.relative_to(self.base_path).as_posix()
+
+        if isinstance(content, SourceFile):
+            data        = None
+            new_hash    = hash_file(content.path)
+            new_size    = content.path.stat().st_size
+        else:
+            data        = content.encode('utf-8')
+            new_hash    = hashlib.sha256(data).hexdigest()
+            new_size    = len(data)
+
+        changed = file_changed(target_path, new_size, new_hash)
+
+        if changed is False:
+            self.change_set['unchanged'].append(rel_path)
+            instrumentation.count('files', change='unchanged')
+        else:
+            # IMPORTANT: This line allows the repository_structure dictionary to use slashes in keys, 
+            # rather than requiring perfect nesting in the structure itself.
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            if data is None:
+                copy_file(content.path, target_path)
+            else:
+                write_text_atomic(target_path, data)
+
+            self.change_set['added' if changed is None else 'modified'].append(rel_path)
+            instrumentation.count('files', change='added' if changed is None else 'modified')
+            instrumentation.count('written_bytes', new_size)
+            print(f"   {'Created' if changed is None else 'Updated'}: {rel_path}")
+
+        self.new_manifest[rel_path] = {'sha256': new_hash, 'size': new_size}
+
+    def _write_recursive(self, current_path: Path, current_struct: dict):
         for name, content in current_struct.items():
             target_path = current_path / name        
             try:
@@ -181,16 +281,10 @@ def write_to_disk(base_dir: str, structure: dict):
                     elif not target_path.is_dir():
                         raise NotADirectoryError(f"Path exists and is not a directory: {target_path}")
                     
-                    _write_recursive(target_path, content)
+                    self._write_recursive(target_path, content)
                 else:
                     if content is None: continue
-                    # IMPORTANT: This line allows the repository_structure dictionary to use slashes in keys, 
-                    # rather than requiring perfect nesting in the structure itself.
-                    target_path.parent.mkdir(parents=True, exist_ok=True)
-                    with open(target_path, 'w', encoding='utf-8') as f:
-                        f.write(content)
-
-                    print(f"   Created: {target_path.relative_to(base_path)}")
+                    self._write_file(target_path, content)
 
             except PermissionError:
                 print(f"ERROR: Permission denied writing: {target_path}")
@@ -201,5 +295,216 @@ def write_to_disk(base_dir: str, structure: dict):
             except OSError as e:
                 print(f"ERROR: OS Error writing {target_path}: {e}")
 
-    print(f"Writing files to: {base_path}...")
-    _write_recursive(base_path, structure)
\ No newline at end of file
+    def finish(self, prune: bool = False) -> dict:
+        """
+        Deals with files the previous run wrote and this one did not, and saves the manifest.
+
+        Returns:
+            dict: change set of relative paths, {
+                'added': [...], 'modified': [...], 'unchanged': [...], 'removed': [...]
+            }
+        """
+        base_path       = self.base_path
+        change_set      = self.change_set
+        new_manifest    = self.new_manifest
+
+        for rel_path in sorted(set(self.old_manifest) - set(new_manifest)):
+            change_set['removed'].append(rel_path)
+            if prune:
+                try:
+                    removed_path = base_path / rel_path
+                    removed_path.unlink()
+                    print(f"   Removed: {rel_path}")
+                    # Drop directories the removal left empty, e.g. a whole release
+                    parent = removed_path.parent
+                    while parent != base_path and not any(parent.iterdir()):
+                        parent.rmdir()
+                        parent = parent.parent
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"ERROR: OS Error removing {base_path / rel_path}: {e}")
+            else:
+                # Keep tracking it so a later run with prune can still remove it
+                old_entry = self.old_manifest[rel_path]
+                new_manifest[rel_path] = {key: old_entry[key] for key in ('sha256', 'size') if key in old_entry}
+
+        try:
+            write_text_atomic(self.manifest_path, json.dumps({'files': new_manifest}, indent=2, sort_keys=True).encode('utf-8'))
+        except OSError as e:
+            print(f"ERROR: OS Error writing {self.manifest_path}: {e}")
+
+        for key in change_set:
+            change_set[key].sort()
+
+        print(f"   {len(change_set['added'])} added, {len(change_set['modified'])} modified, "
+              f"{len(change_set['unchanged'])} unchanged, {len(change_set['removed'])} removed")
+        return change_set
+
+def write_to_disk(base_dir: str, structure: dict, prune: bool = False) -> dict:
+    """
+    Writes the virtual filesystem to disk in one go (see IncrementalWriter).
+
+    Returns:
+        dict: change set of relative paths, {
+            'added': [...], 'modified': [...], 'unchanged': [...], 'removed': [...]
+        }
+    """
+    writer = IncrementalWriter(base_dir)
+    writer.write(structure)
+    return writer.finish(prune=prune)
+
+def iter_target_versions(targets_file: str):
+    """
+    Yields versions from a JSONL file, one per line, read lazily; '-' reads stdin.
+    A line is either a JSON string ("R2025a") or an object with a "version" key.
+    Blank lines are skipped.
+    """
+    f = sys.stdin if targets_file == '-' else open(targets_file, 'r', encoding='utf-8')
+    try:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{targets_file}:{line_number}: invalid JSON: {e}")
+            version = entry.get('version') if isinstance(entry, dict) else entry
+            if not isinstance(version, str) or not version:
+                raise ValueError(f"{targets_file}:{line_number}: expected a version string or {{\"version\": ...}}")
+            yield version
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def create_template_env(source_path: str, bytecode_cache_dir: str = None) -> 'jinja2.Environment':
+    """
+    Template sources do not change during a run, so auto_reload is off and each template
+    is compiled once and reused for every render. Compiled bytecode is kept in
+    bytecode_cache_dir (or Jinja's default per-user temp directory), so process-pool
+    workers and later runs load it instead of compiling again.
+    """
+    # Imported here so commands that never render do not pay for loading Jinja
+    import jinja2
+
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+
+    template_loader = jinja2.FileSystemLoader(searchpath=source_path)
+    return jinja2.Environment(
+        loader          = template_loader,
+        bytecode_cache  = jinja2.FileSystemBytecodeCache(bytecode_cache_dir),
+        auto_reload     = False,
+        cache_size      = -1
+    )
+
+def precompile_templates(template_env: 'jinja2.Environment', template_names: List[str]) -> Dict[str, str]:
+    """
+    Loads template_names and every template they reference (include, extends, import), so
+    syntax errors surface before anything is rendered and renders never wait on a compile.
+    Other files under the search path are left alone.
+
+    Returns:
+        dict: { template_name: error message } for templates that failed to compile
+    """
+    import jinja2
+    import jinja2.meta
+
+    errors  = {}
+    loaded  = set()
+    pending = list(template_names)
+    while pending:
+        name = pending.pop()
+        if name in loaded or name in errors:
+            continue
+        start = time.perf_counter()
+        try:
+            template_env.get_template(name)
+            source, _, _ = template_env.loader.get_source(template_env, name)
+            referenced = list(jinja2.meta.find_referenced_templates(template_env.parse(source)))
+        except jinja2.TemplateSyntaxError as e:
+            errors[name] = f"line {e.lineno}: {e.message}"
+            continue
+        except (jinja2.TemplateError, UnicodeDecodeError) as e:
+            errors[name] = str(e)
+            continue
+        _record_timing(name, 'compile_time', time.perf_counter() - start)
+        loaded.add(name)
+
+        if None in referenced:
+            # Chosen at render time, so any template may be used
+            referenced = template_env.list_templates(extensions=TEMPLATE_EXTENSIONS)
+        pending.extend(referenced)
+    return errors
+
+def init_worker(source_path: str, bytecode_cache_dir: str = None):
+    """
+    Process-pool initializer. Jinja environments cannot be pickled, so each worker builds its own,
+    loading templates the parent already compiled from the bytecode cache on first use.
+    """
+    global _worker_template_env
+    _worker_template_env = create_template_env(source_path, bytecode_cache_dir)
+
+def get_template_env(template_env):
+    """
+    Returns template_env, or the worker's own environment when called in a process-pool worker with None.
+    """
+    return template_env if template_env is not None else _worker_template_env
+
+def create_executor(parallel_mode: str, workers: int, source_path: str, bytecode_cache_dir: str = None):
+    """
+    Creates the pool rendering runs on, or returns None when workers is 1 and rendering is serial.
+    parallel_mode is 'thread' or 'process'.
+    """
+    if workers <= 1:
+        return None
+    if parallel_mode == 'process':
+        return ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(source_path, bytecode_cache_dir))
+    return ThreadPoolExecutor(max_workers=workers)
+
+def render_template(template_env: 'jinja2.Environment', template_name: str, render_cache=None, **context) -> str:
+    """
+    Renders template_name with context, through render_cache (a render_cache.RenderCache) if one is given.
+    """
+    start = time.perf_counter()
+    with instrumentation.span(template_name, 'template'):
+        if render_cache is not None:
+            content = render_cache.render(template_env, template_name, **context)
+        else:
+            content = template_env.get_template(template_name).render(**context)
+    _record_timing(template_name, 'render_time', time.perf_counter() - start)
+    instrumentation.count('rendered_bytes', len(content), template=template_name)
+    return content
+
+def _record_timing(template_name: str, field: str, seconds: float):
+    with _timings_lock:
+        timing = _template_timings.setdefault(template_name, {'compile_time': 0.0, 'renders': 0, 'render_time': 0.0})
+        timing[field] += seconds
+        if field == 'render_time':
+            timing['renders'] += 1
+
+def report_template_timings():
+    """
+    Prints compile time, render count and total render time per template, as seen by this process.
+    """
+    print("Template timings:")
+    with _timings_lock:
+        for name, timing in sorted(_template_timings.items()):
+            print(f"   {name:<32} compile {timing['compile_time'] * 1000:8.1f}ms  "
+                  f"{timing['renders']:>4} render(s) {timing['render_time'] * 1000:8.1f}ms")
+
+def submit(executor, fn, *args, **kwargs) -> Future:
+    """
+    Submits fn to executor. Without an executor fn runs immediately, and its result
+    (or exception) is returned in an already completed Future, so callers handle both modes alike.
+    """
+    if executor is not None:
+        return executor.submit(fn, *args, **kwargs)
+
+    future = Future()
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
@@ -0,0 +1,67 @@
+import functools
+
+# Error codes of calls that may succeed if made again, across the AWS APIs the actions use
+THROTTLE_CODES = (
+    'RequestLimitExceeded',
+    'Throttling',
+    'ThrottlingException',
+    'RequestThrottled',
+    'TooManyRequestsException',
+)
+TRANSIENT_CODES = (
+    'InternalError',
+    'InternalFailure',
+    'ServiceUnavailable',
+    'Unavailable',
+)
+
+# Responses with this HTTP status or above are retried whatever their error code
+TRANSIENT_STATUS = 500
+
+class FakeClientError(Exception):
+    """
+    Shaped like botocore's ClientError, so error_code() and is_retryable() treat it the same.
+    Raised by the fake AWS services the actions are tested against.
+    """
+
+    def __init__(self, code, message, operation):
+        super().__init__(f"An error occurred ({code}) when calling the {operation} operation: {message}")
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+def error_code(e):
+    """
+    AWS error code of a botocore ClientError (or a FakeClientError), else None.
+    """
+    return getattr(e, 'response', {}).get('Error', {}).get('Code')
+
+def is_throttling(e):
+    return error_code(e) in THROTTLE_CODES
+
+@functools.lru_cache(maxsize=None)
+def network_errors():
+    """
+    Exceptions raised when a request never got a response: botocore's connection and
+    read-timeout errors (when botocore is installed) and their builtin counterparts.
+    """
+    errors = (ConnectionError, TimeoutError)
+    try:
+        from botocore.exceptions import ConnectionError as BotocoreConnectionError, HTTPClientError
+    except ImportError:
+        return errors
+    return errors + (BotocoreConnectionError, HTTPClientError)
+
+def is_retryable(e):
+    """
+    Whether a failed call may succeed if made again: throttling, transient error codes,
+    5xx responses, and connection errors and read timeouts.
+
+    A call that is not idempotent may have taken effect before such an error; give it a
+    client token before retrying it.
+    """
+    code = error_code(e)
+    if code in THROTTLE_CODES or code in TRANSIENT_CODES:
+        return True
+    status = getattr(e, 'response', {}).get('ResponseMetadata', {}).get('HTTPStatusCode')
+    if isinstance(status, int) and status >= TRANSIENT_STATUS:
+        return True
+    return isinstance(e, network_errors())
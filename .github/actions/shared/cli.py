@@ -0,0 +1,60 @@
+import os
+import sys
+import argparse
+import importlib
+
+# Modules shared by every action, e.g. instrumentation and clock, live next to this file
+SHARED_DIR  = os.path.dirname(os.path.abspath(__file__))
+# Parent of every action directory
+ACTIONS_DIR = os.path.dirname(SHARED_DIR)
+
+# { command: (action directory, module with main(argv), help) }
+COMMANDS = {
+    'distribute':       ('distribute-ami',          'distribute',   'Copy source AMIs to regions and make them public'),
+    'process-release':  ('process-release-files',   'processor',    'Render release READMEs and top-level files'),
+    'validate-flavor':  ('deploy-cfn',              'flavors',      'Check flavors against flavor-mappings.json'),
+    'build-params':     ('deploy-cfn',              'params',       'Build create-stack parameters for flavors and regions'),
+    'smoke-test':       ('deploy-cfn',              'smoke',        'Deploy and tear down stacks for a flavor x region matrix in parallel'),
+    'bench-distribute': ('distribute-ami',          'benchmark',    'Benchmark the distribution engine against a simulated EC2'),
+    'bench-release':    ('process-release-files',   'benchmark',    'Benchmark processor.py stages against a synthetic fixture'),
+}
+
+def add_paths(action_dir):
+    """
+    Puts shared/ and an action's directory on sys.path, so its modules import both by name.
+    """
+    for path in (SHARED_DIR, os.path.join(ACTIONS_DIR, action_dir)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+def load_command(command):
+    """
+    Imports the module implementing command. Only that action's modules are loaded,
+    and heavy dependencies (boto3, jinja2) are imported by them on first use, not here.
+
+    This and the tests' conftest.py are the only places sys.path is set up, both through
+    add_paths(). Run action modules through this script.
+    """
+    action_dir, module_name, _ = COMMANDS[command]
+    add_paths(action_dir)
+    return importlib.import_module(module_name)
+
+def setup_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog        = 'cli.py',
+        description = 'Single entry point for the Python actions. Arguments after the command are passed to it; '
+                      'run "<command> --help" for them.'
+    )
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+    for command, (_, _, help_text) in COMMANDS.items():
+        # The command's own parser handles --help and every other argument
+        commands.add_parser(command, help=help_text, add_help=False)
+    return parser.parse_known_args(argv)
+
+def main(argv=None):
+    args, command_argv = setup_args(argv)
+    module = load_command(args.command)
+    module.main(command_argv)
+
+if __name__ == "__main__":
+    main()
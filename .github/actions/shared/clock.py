@@ -0,0 +1,26 @@
+import time
+import threading
+
+class SystemClock:
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class SimulatedClock:
+    """
+    Clock for tests and benchmarks: sleeping advances time instantly.
+    """
+
+    def __init__(self, start=0.0):
+        self._now   = start
+        self._lock  = threading.Lock()
+
+    def now(self):
+        with self._lock:
+            return self._now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self._now += max(0.0, seconds)
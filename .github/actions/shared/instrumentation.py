@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import threading
+import contextlib
+from collections import Counter
+
+# Spans of a category shown in the step summary, slowest first
+SUMMARY_TOP_SPANS = 10
+
+class Tracer:
+    """
+    Collects timed spans and counters for one run.
+
+    Spans have a name and a category (e.g. 'stage', 'region', 'release', 'template')
+    so the slowest regions or templates can be picked out. Counters carry optional
+    labels, e.g. count('api_calls', operation='copy_image', region='eu-west-1').
+    Safe to use from several threads. Process-pool workers have their own tracer,
+    whose data is not collected.
+    """
+
+    def __init__(self):
+        self.origin     = time.perf_counter()
+        self.spans      = []
+        self.counters   = Counter()  # { (name, ((label, value), ...)): value }
+        self._lock      = threading.Lock()
+
+    def now(self):
+        return time.perf_counter() - self.origin
+
+    @contextlib.contextmanager
+    def span(self, name, category='stage', **args):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.record_span(name, start, self.now(), category, **args)
+
+    def record_span(self, name, start, end, category='stage', **args):
+        """
+        Records a span whose start and end (seconds since the tracer was created) were measured elsewhere.
+        """
+        with self._lock:
+            self.spans.append({
+                'name': name,
+                'category': category,
+                'start': start,
+                'duration': end - start,
+                'thread': threading.get_ident(),
+                'args': args,
+            })
+
+    def count(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'spans': list(self.spans),
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+            }
+
+    def to_chrome_trace(self):
+        """
+        Trace Event Format, viewable in chrome://tracing or https://ui.perfetto.dev.
+        """
+        pid = os.getpid()
+        with self._lock:
+            events = [
+                {
+                    'name': span['name'],
+                    'cat': span['category'],
+                    'ph': 'X',
+                    'ts': span['start'] * 1e6,
+                    'dur': span['duration'] * 1e6,
+                    'pid': pid,
+                    'tid': span['thread'],
+                    'args': span['args'],
+                }
+                for span in self.spans
+            ]
+            end = self.now() * 1e6
+            for (name, labels), value in sorted(self.counters.items()):
+                label = ','.join(f"{k}={v}" for k, v in labels)
+                events.append({'name': name, 'ph': 'C', 'ts': end, 'pid': pid, 'args': {label or name: value}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path, trace_format='json'):
+        """
+        Writes the trace to path as plain JSON or, with trace_format='chrome', Chrome trace events.
+        """
+        data = self.to_chrome_trace() if trace_format == 'chrome' else self.to_dict()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2 if trace_format == 'json' else None)
+        print(f"Trace written to: {path}")
+
+    def summary_markdown(self, title):
+        """
+        Markdown tables of the slowest spans per category and every counter.
+        """
+        with self._lock:
+            spans = list(self.spans)
+            counters = sorted(self.counters.items())
+
+        lines = [f"### {title}", ""]
+
+        categories = sorted({span['category'] for span in spans})
+        for category in categories:
+            in_category = sorted((s for s in spans if s['category'] == category), key=lambda s: -s['duration'])
+            total = sum(s['duration'] for s in in_category)
+            lines += [
+                f"**{category}** ({len(in_category)} span(s), {total:.3f}s total)",
+                "",
+                "| Name | Duration (s) | Details |",
+                "|---|---:|---|",
+            ]
+            for span in in_category[:SUMMARY_TOP_SPANS]:
+                details = ', '.join(f"{k}={v}" for k, v in span['args'].items())
+                lines.append(f"| {span['name']} | {span['duration']:.3f} | {details} |")
+            lines.append("")
+
+        if counters:
+            lines += ["| Counter | Labels | Value |", "|---|---|---:|"]
+            for (name, labels), value in counters:
+                lines.append(f"| {name} | {', '.join(f'{k}={v}' for k, v in labels)} | {value} |")
+            lines.append("")
+
+        return "\n".join(lines) + "\n"
+
+    def write_step_summary(self, title):
+        """
+        Appends the summary to $GITHUB_STEP_SUMMARY, if running in GitHub Actions.
+        """
+        path = os.environ.get('GITHUB_STEP_SUMMARY')
+        if not path:
+            return
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(self.summary_markdown(title))
+        except OSError as e:
+            print(f"::warning::Could not write step summary: {e}")
+
+# The run's tracer. Modules record into it through the functions below.
+_tracer = Tracer()
+
+def get_tracer():
+    return _tracer
+
+def reset():
+    """
+    Starts a fresh tracer, e.g. between benchmark runs.
+    """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+def span(name, category='stage', **args):
+    return _tracer.span(name, category, **args)
+
+def record_span(name, start, end, category='stage', **args):
+    _tracer.record_span(name, start, end, category, **args)
+
+def now():
+    return _tracer.now()
+
+def count(name, value=1, **labels):
+    _tracer.count(name, value, **labels)